@@ -1,11 +1,23 @@
-from typing import Any
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from typing import Optional, Union
+from aiogram import Bot
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, Message
 from datetime import datetime, timezone
-from app.infrastructure.database.models.user import UserModel
+from app.domain.entities.models.user import User
 from app.infrastructure.database.models.subscribe import SubscriptionModel, PlanName
 from app.infrastructure.repositories.user_use_repositories import UserUseRepositories
 from app.infrastructure.repositories.subscription_use_repositories import SubscriptionUseRepositories
+from app.infrastructure.database.routing import db_router
+from app.infrastructure.redis.redis_client import redis_client
+from app.infrastructure.redis.token_quota import token_quota, format_quota
+from app.infrastructure.redis.view_cache import lk_view_key
+from app.config import settings
 from app.infrastructure.logging.setup_logger import logger
+from app.infrastructure.metrics.pipeline import timed_use_case
+from app.interfaces.telegram.services.message_sender import respond
+from app.interfaces.telegram.services.bot_info import bot_info
+
+# Кэш без подписки живёт сутки; с подпиской — до смены «Осталось дней»
+LK_VIEW_TTL = 24 * 3600
 
 
 class LkUseCase:
@@ -13,84 +25,82 @@ class LkUseCase:
         self.user_repo = user_repo
         self.subscription_repo = subscription_repo
 
-    async def execute(self, update: Any, context: Any) -> None:
-        user = await UserModel.get_or_none(telegram_id=update.effective_user.id)
+    @timed_use_case("lk")
+    async def execute(self, event: Union[Message, CallbackQuery], bot: Bot, user: Optional[User] = None) -> None:
+        """Личный кабинет одним сообщением. ``user`` обычно уже загружен UserLoaderMiddleware."""
+        if user is None:
+            user = await self.user_repo.get_user_by_telegram_id(event.from_user.id)
         if not user:
-            await update.message.reply_text("Пожалуйста, сначала запустите бота командой /start")
+            await respond(event, "Пожалуйста, сначала запустите бота командой /start")
             return
         now = datetime.now(timezone.utc)
         if user.is_banned or (user.banned_until and user.banned_until > now):
             ban_msg = "Вы забанены. Обратитесь к администратору."
             if user.banned_until and user.banned_until > now:
                 ban_msg = f"Вы временно забанены до {user.banned_until.strftime('%d.%m.%Y %H:%M')}."
-            if update.callback_query:
-                await update.callback_query.edit_message_text(ban_msg)
-            else:
-                await update.message.reply_text(ban_msg)
+            await respond(event, ban_msg)
             return
 
-        active_sub = await SubscriptionModel.filter(
-            user=user,
-            is_active=True,
-            end_date__gte=now
-        ).order_by("-end_date").select_related("plan").first()
+        view = await redis_client.get_cache(lk_view_key(user.telegram_id))
+        if not view:
+            view, ttl = await self._render(bot, user, now)
+            await redis_client.set_cache(lk_view_key(user.telegram_id), view, ttl=ttl)
+
+        # Остаток квоты меняется с каждым ответом, поэтому в кэш вида не попадает
+        quota = format_quota(
+            await token_quota.check(
+                user.telegram_id, user.subscription_level, len(user.referrals or []), enforce=False
+            )
+        )
+        text = view["text"] + (f"\n{quota}" if quota else "") + view.get("referral", "")
+
+        buttons = []
+        if view["has_subscription"]:
+            buttons.append([InlineKeyboardButton(text="🔄 Продлить подписку", callback_data="renew_sub")])
+        buttons.append([InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_main_menu")])
+        reply_markup = InlineKeyboardMarkup(inline_keyboard=buttons)
+        await respond(event, text, reply_markup=reply_markup, parse_mode="HTML")
+
+    async def _render(self, bot: Bot, user: User, now: datetime) -> tuple[dict, int]:
+        """Собирает текст кабинета за один проход. Возвращает (view, ttl кэша)."""
+        active_sub = await db_router.read(
+            lambda db: SubscriptionModel.filter(
+                user_id=user.telegram_id,
+                is_active=True,
+                end_date__gte=now
+            ).using_db(db).order_by("-end_date").select_related("plan").first(),
+            user.telegram_id,
+        )
 
         status = "Free"
         days = 0
         until = "не активна"
+        ttl = LK_VIEW_TTL
         if active_sub and active_sub.plan:
             status = f"⭐️ PRO" if active_sub.plan.name == PlanName.PRO else f"👑 VIP"
-            days = (active_sub.end_date - now).days
+            remaining = active_sub.end_date - now
+            days = remaining.days
             until = active_sub.end_date.strftime("%d.%m.%Y")
+            # Значение «Осталось дней» меняется через остаток от суток
+            ttl = max(60, int(remaining.total_seconds()) % LK_VIEW_TTL)
 
+        referral_link = await bot_info.referral_link(bot, user.telegram_id)
+        referrals = user.referrals or []
+        referrals_text = "\n".join([f"- <code>{uid}</code>" for uid in referrals]) if referrals else "Пока никого не пригласили."
         text = (
             f"<b>👤 Личный кабинет @{user.username or user.telegram_id}</b>\n\n"
             f"💎 <b>Статус:</b> {status}\n"
             f"⏳ <b>Осталось дней:</b> {days}\n"
             f"📅 <b>Подписка до:</b> {until}"
         )
-        buttons = []
-        if active_sub and active_sub.plan:
-            buttons.append([InlineKeyboardButton(text="🔄 Продлить подписку", callback_data="renew_sub")])
-        buttons.append([InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_main_menu")])
-        reply_markup = InlineKeyboardMarkup(inline_keyboard=buttons)
-        if update.callback_query:
-            try:
-                await update.callback_query.edit_message_text(text=text, reply_markup=reply_markup, parse_mode="HTML")
-            except Exception as e:
-                if "Message is not modified" not in str(e):
-                    raise
-        else:
-            await update.message.reply_text(text, reply_markup=reply_markup, parse_mode="HTML")
-
-        # Добавляем блок про рефералов
-        bot_username = (await context.bot.get_me()).username
-        referral_link = f"https://t.me/{bot_username}?start=ref_{user.telegram_id}"
-        referrals = user.referrals or []
-        referrals_text = "\n".join([f"- <code>{uid}</code>" for uid in referrals]) if referrals else "Пока никого не пригласили."
-        referral_block = (
-            f"\n\n<b>Приведи друга и получи +5 сообщений!</b>\n"
+        referral = (
+            f"\n\n<b>Приведи друга и получи +{settings.token_quota_referral_bonus} токенов к квоте!</b>\n"
             f"Твоя ссылка: <code>{referral_link}</code>\n"
-            f"Скопируйте и отправьте эту ссылку другу, чтобы получить +5 сообщений!\n"
+            f"Скопируйте и отправьте эту ссылку другу, чтобы увеличить квоту!\n"
             f"<i>Бонус начисляется только если друг впервые запускает бота по вашей ссылке.</i>\n"
             f"<i>Если друг уже запускал бота, пусть отправит команду</i> <code>/start ref_{user.telegram_id}</code> <i>вручную.</i>\n"
             f"Приглашено: {len(referrals)}\n"
             f"{referrals_text}"
         )
-        text += referral_block
-
-        # Формируем reply_markup без кнопки 'Приведи друга'
-        buttons = []
-        if active_sub and active_sub.plan:
-            buttons.append([InlineKeyboardButton(text="🔄 Продлить подписку", callback_data="renew_sub")])
-        buttons.append([InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_main_menu")])
-        reply_markup = InlineKeyboardMarkup(inline_keyboard=buttons)
-
-        if update.callback_query:
-            try:
-                await update.callback_query.edit_message_text(text=text, reply_markup=reply_markup, parse_mode="HTML")
-            except Exception as e:
-                if "Message is not modified" not in str(e):
-                    raise
-        else:
-            await update.message.reply_text(text, reply_markup=reply_markup, parse_mode="HTML")
\ No newline at end of file
+        logger.info(f"[LK] Кабинет {user.telegram_id} отрендерен, ttl={ttl}")
+        return {"text": text, "referral": referral, "has_subscription": bool(active_sub and active_sub.plan)}, ttl
@@ -1,22 +1,40 @@
-from typing import Any
-from datetime import datetime
+import asyncio
+from datetime import datetime, timezone
+from typing import Optional
+from aiogram import Bot
+from aiogram.types import Message as TgMessage
 from app.infrastructure.repositories.user_use_repositories import UserUseRepositories
 from app.infrastructure.repositories.message_use_repo import MessageUseRepo
 from app.infrastructure.repositories.subscription_use_repositories import SubscriptionUseRepositories
 from app.infrastructure.openai.get_answer_by_gpt_openai import GetAnswerByGPTUseRepo
 from app.infrastructure.database.models.chat import ChatModel
-from app.infrastructure.database.models.message import MessageModel
 from app.domain.entities.models.chat import Chat
 from app.domain.entities.models.messages import Message
+from app.domain.entities.models.user import User
 from app.domain.services.subscription_service import SubscriptionService
-from app.interfaces.telegram.services.message_sender import MessageSender
+from app.domain.services.message_classifier import message_classifier
+from app.interfaces.telegram.services.message_sender import ChunkedReply, MessageSender
+from app.interfaces.telegram.services.keyboard_manager import KeyboardManager
+from app.interfaces.telegram.services.bot_info import bot_info
 from app.application.use_cases.lk_use_case import LkUseCase
 from app.infrastructure.redis.fsm_manager import fsm_manager, FSMState
+from app.infrastructure.redis.token_quota import token_quota, format_wait
+from app.infrastructure.services.generations import GenerationCancelled, generation_registry
+from app.infrastructure.services.task_runner import task_runner
+from app.infrastructure.scenarios.scenario_engine import scenario_engine
+from app.config import settings
 from app.infrastructure.logging.setup_logger import logger
+from app.infrastructure.metrics.pipeline import record_fast_reply, timed_use_case
 # from app.infrastructure.triggers.trigger_loader import TriggersLoader  # ТРИГГЕРЫ ОТКЛЮЧЕНЫ
 # from app.infrastructure.triggers.trigger_matcher import TriggerMatcher  # ТРИГГЕРЫ ОТКЛЮЧЕНЫ
-import json
-from pathlib import Path
+
+
+# Данные FSM кэшируются в памяти процесса, поэтому задача не уходит в стойкую очередь
+@task_runner.task("fsm.remember_response", durable=False)
+async def remember_response(user_id: int, response_text: str) -> None:
+    """Добавить ответ ИИ в историю беседы FSM и запомнить его как последний."""
+    await fsm_manager.add_to_conversation_history(user_id, response_text, is_user=False)
+    await fsm_manager.update_user_data(user_id, {"last_response": response_text})
 
 
 class MessageUseCase:
@@ -29,36 +47,31 @@ class MessageUseCase:
         self.subscription_service = SubscriptionService()
         self.message_sender = MessageSender()
 
-    async def execute(self, update: Any, context: Any) -> None:
-        user_id = update.effective_chat.id
-        user_text = update.message.text.strip() if update.message and update.message.text else ""
+    @timed_use_case("message")
+    async def execute(self, message: TgMessage, bot: Bot, user: Optional[User]) -> None:
+        """Обработка текста. Пользователь уже загружен UserLoaderMiddleware."""
+        user_id = message.chat.id
+        user_text = message.text.strip() if message.text else ""
 
         if not user_text:
-            await self.message_sender.send_error(update, "Пожалуйста, отправьте текстовое сообщение")
+            await self.message_sender.send_error(message, "Пожалуйста, отправьте текстовое сообщение")
             return
 
         if user_text in ("/lk", "📱 Личный кабинет"):
-            await LkUseCase(self.user_repo, self.subscription_repo).execute(update, context)
+            await LkUseCase(self.user_repo, self.subscription_repo).execute(message, bot, user)
             return
 
-        user = await self.user_repo.get_user_by_telegram_id(user_id)
         if not user:
-            await self.message_sender.send_error(update, "Сначала зарегистрируйтесь с помощью команды /start")
+            await self.message_sender.send_error(message, "Сначала зарегистрируйтесь с помощью команды /start")
             return
         
         # Проверка бана
-        now = datetime.utcnow()
+        now = datetime.now(timezone.utc)
         if user.is_banned or (user.banned_until and user.banned_until > now):
             ban_msg = "Вы забанены. Обратитесь к администратору."
             if user.banned_until and user.banned_until > now:
                 ban_msg = f"Вы временно забанены до {user.banned_until.strftime('%d.%m.%Y %H:%M')}."
-            await self.message_sender.send_error(update, ban_msg)
-            return
-
-        # Не реагировать на сообщения админа при работе с админ-панелью
-        if user.is_admin and any(flag in context.user_data for flag in [
-            "admin_add_subscription", "admin_remove_subscription", "admin_search_user", "admin_manage_user", "edit_price_plan_id"
-        ]):
+            await self.message_sender.send_error(message, ban_msg)
             return
 
         # Получаем текущее FSM состояние пользователя
@@ -67,39 +80,19 @@ class MessageUseCase:
         # Обработка в зависимости от FSM состояния
         if current_fsm_state == FSMState.IDLE:
             # Обычная обработка сообщения
-            await self._handle_normal_message(update, context, user, user_text)
+            await self._handle_normal_message(message, bot, user, user_text)
         else:
             # Обработка в контексте FSM
-            await self._handle_fsm_message(update, context, user, user_text, current_fsm_state)
+            await self._handle_fsm_message(message, bot, user, user_text, current_fsm_state)
 
-    async def _handle_normal_message(self, update: Any, context: Any, user, user_text: str):
+    async def _handle_normal_message(self, message: TgMessage, bot: Bot, user, user_text: str):
         """Обработка обычного сообщения (без FSM)"""
-        # Проверка лимита сообщений для free-пользователей
-        if user.subscription_level == "free":
-            if user.used_messages >= user.message_limit:
-                from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
-                bot_username = (await context.bot.get_me()).username
-                referral_link = f"https://t.me/{bot_username}?start=ref_{user.telegram_id}"
-                text = (
-                    "Ваш лимит бесплатных сообщений исчерпан.\n\n"
-                    "Вы можете приобрести PRO или пригласить друга и получить +5 сообщений!\n\n"
-                    f"<b>Приведи друга и получи +5 сообщений!</b>\n"
-                    f"Твоя ссылка: <code>{referral_link}</code>\n"
-                    "Скопируйте и отправьте эту ссылку другу, чтобы получить бонус!"
-                )
-                keyboard = [
-                    [InlineKeyboardButton(text="Получить PRO", callback_data="upgrade_pro")]
-                ]
-                await update.message.reply_text(
-                    text,
-                    reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard),
-                    parse_mode="HTML"
-                )
-                return
-        plan, message_count = await self.subscription_repo.check_subscription_status_by_user(user)
-        trigger = self.subscription_service.get_upsell_trigger(plan, len(user_text), message_count)
+        if not await self._check_quota(message, bot, user):
+            return
+        plan = await self.subscription_repo.check_subscription_status_by_user(user)
+        trigger = self.subscription_service.get_upsell_trigger(plan, len(user_text))
         if trigger:
-            await self.message_sender.send_upsell_offer(update, context, trigger)
+            await self.message_sender.send_upsell_offer(message, trigger)
             return
 
         # --- Поиск и сохранение триггера в FSM ---
@@ -114,32 +107,14 @@ class MessageUseCase:
         await fsm_manager.update_user_data(user.telegram_id, {"trigger_id": None})
         # --- END ---
 
-        # --- Пример старта сценария по ключевому слову ---
-        # СЦЕНАРИИ ОТКЛЮЧЕНЫ
-        # SCENARIOS_PATH = Path(__file__).parent.parent.parent / "core" / "triggers" / "scenarios.json"
-        # with open(SCENARIOS_PATH, "r", encoding="utf-8") as f:
-        #     scenarios = json.load(f)
-        # scenario_started = False
-        # if "знакомство" in user_text.lower():
-        #     scenario = next((s for s in scenarios if s["name"].startswith("Сценарий знакомства")), None)
-        #     if scenario:
-        #         await fsm_manager.update_user_data(user.telegram_id, {"scenario_id": scenario["id"]})
-        #         scenario_started = True
-        # elif "мотивация" in user_text.lower():
-        #     scenario = next((s for s in scenarios if s["name"].startswith("Сценарий мотивации")), None)
-        #     if scenario:
-        #         await fsm_manager.update_user_data(user.telegram_id, {"scenario_id": scenario["id"]})
-        #         scenario_started = True
-        # else:
-        #     await fsm_manager.update_user_data(user.telegram_id, {"scenario_id": None})
-        # --- END ---
-
-        # Можно добавить вывод шага сценария, если он только что стартовал
-        # if scenario_started:
-        #     await update.message.reply_text(scenario["steps"][0]["text"])
-        #     return
-        
-        await fsm_manager.update_user_data(user.telegram_id, {"scenario_id": None})
+        # --- Сценарии: скриптовые шаги отвечаем без обращения к OpenAI ---
+        if settings.scenarios_enabled:
+            scripted_reply = await scenario_engine.handle(user.telegram_id, user_text)
+            if scripted_reply:
+                await message.answer(scripted_reply)
+                return
+        else:
+            await fsm_manager.update_user_data(user.telegram_id, {"scenario_id": None})
 
         # Создание или получение Chat
         chat_model, _ = await ChatModel.get_or_create(user_id=user.telegram_id, defaults={'id': user.telegram_id})
@@ -152,43 +127,102 @@ class MessageUseCase:
         )
 
         # Сохранение сообщения пользователя
-        await MessageModel.create(
-            chat=chat_model,
-            content=user_text,
-            is_from_user=True,
-            created_at=datetime.now()
-        )
+        await self.message_repo.save_message(chat_model.id, user_text, is_from_user=True)
 
         # Получение истории
         history = await self.message_repo.get_history_messages(user=user, max_last_messages=20)
         if not history:
-            await self.message_sender.send_error(update, f"Не удалось получить историю сообщений для {user.telegram_id}")
+            await self.message_sender.send_error(message, f"Не удалось получить историю сообщений для {user.telegram_id}")
             return
 
         # Отправка ответа
-        thinking_message = await update.message.reply_text("Думаю...")
-        response_text = await self.gpt_repo.get_answer_from_get_triggers(history, user.telegram_id) or "Извините, не удалось обработать ваш запрос."
-        await MessageModel.create(
-            chat=chat_model,
-            content=response_text,
-            is_from_user=False,
-            created_at=datetime.now()
-        )
+        response_text = await self._generate_reply(message, bot, user, history)
+        if response_text is None:
+            return
+        await self.message_repo.save_message(chat_model.id, response_text, is_from_user=False)
 
-        await context.bot.edit_message_text(
-            text=response_text,
-            chat_id=user.telegram_id,
-            message_id=thinking_message.message_id
-        )
+    async def _generate_reply(self, message: TgMessage, bot: Bot, user, history: list) -> Optional[str]:
+        """Ответ GPT в сообщение-заглушку «Думаю...» с кнопкой «Остановить».
+
+        Длинный ответ уходит частями по 4096 символов ещё во время генерации
+        (``ChunkedReply``). Короткий (brief) ответ ждём до
+        ``settings.gpt_fast_reply_window`` секунд: успел — уходит одним
+        сообщением без заглушки и её правки.
+        Новое сообщение в чате или кнопка отменяют генерацию. Частичный ответ
+        по ``settings.gpt_cancelled_output`` либо остаётся в чате и истории
+        (``store``), либо удаляется (``discard``, тогда возвращается ``None``).
+        """
+        reply = ChunkedReply(bot, user.telegram_id)
+        generation = asyncio.ensure_future(generation_registry.run(
+            user.telegram_id,
+            self.gpt_repo.get_answer_from_get_triggers(
+                history, user.telegram_id, user.subscription_level, on_delta=reply.feed
+            ),
+        ))
+        user_text = next((msg.content for msg in reversed(history) if msg.is_from_user), "")
+        brief = message_classifier.classify(user_text).reply_type == "brief"
+        if brief and settings.gpt_fast_reply_window > 0:
+            try:
+                await asyncio.wait({generation}, timeout=settings.gpt_fast_reply_window)
+            except asyncio.CancelledError:
+                generation.cancel()
+                raise
+            # Отменённую за окно генерацию в долю попаданий не считаем
+            if not generation.done() or generation.exception() is None:
+                record_fast_reply(generation.done())
+
+        thinking_message = None
+        if not generation.done():
+            thinking_message = await message.answer(
+                "Думаю...", reply_markup=KeyboardManager.get_stop_generation_keyboard()
+            )
+        # Части длиннее 4096 символов уходят, пока генерация продолжается
+        reply.start(thinking_message.message_id if thinking_message else None)
+        try:
+            response_text = await generation
+        except GenerationCancelled:
+            if settings.gpt_cancelled_output != "store" or not reply.text:
+                await reply.discard()
+                return None
+            await reply.finish(tail=" …")
+            return reply.text
+        except asyncio.CancelledError:
+            await reply.abort()
+            raise
 
-        # Увеличиваем used_messages для free-пользователей
+        if not response_text:
+            await reply.abort()
+            response_text = "Извините, не удалось обработать ваш запрос."
+            await reply.send_text(response_text)
+            return response_text
+        await reply.finish()
+        return response_text
+
+    async def _check_quota(self, message: TgMessage, bot: Bot, user) -> bool:
+        """Проверка квоты токенов перед запросом к OpenAI. False — ответ об исчерпании уже отправлен."""
+        status = await token_quota.check(user.telegram_id, user.subscription_level, len(user.referrals or []))
+        if status is None or status.allowed:
+            return True
+        from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+        text = f"Квота токенов исчерпана. Она обновится через {format_wait(status.retry_after)}."
+        keyboard = []
         if user.subscription_level == "free":
-            user_model = await self.user_repo.get_user_model_by_telegram_id(user.telegram_id)
-            if user_model:
-                user_model.used_messages = getattr(user_model, 'used_messages', 0) + 1
-                await user_model.save(update_fields=["used_messages"])
+            referral_link = await bot_info.referral_link(bot, user.telegram_id)
+            text += (
+                "\n\nВы можете приобрести PRO или пригласить друга и увеличить квоту!\n\n"
+                f"<b>Приведи друга и получи +{settings.token_quota_referral_bonus} токенов!</b>\n"
+                f"Твоя ссылка: <code>{referral_link}</code>\n"
+                "Скопируйте и отправьте эту ссылку другу, чтобы получить бонус!"
+            )
+            keyboard = [[InlineKeyboardButton(text="Получить PRO", callback_data="upgrade_pro")]]
+        await message.answer(
+            text,
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard) if keyboard else None,
+            parse_mode="HTML"
+        )
+        return False
 
-    async def _handle_fsm_message(self, update: Any, context: Any, user, user_text: str, fsm_state: FSMState):
+    async def _handle_fsm_message(self, message: TgMessage, bot: Bot, user, user_text: str, fsm_state: FSMState):
         """Обработка сообщения в контексте FSM"""
         user_id = user.telegram_id
         
@@ -203,13 +237,13 @@ class MessageUseCase:
             # Проверяем, нужен ли дополнительный контекст
             if len(user_text) < 10:  # Короткий вопрос
                 await fsm_manager.transition_to(user_id, "need_context")
-                await update.message.reply_text(
+                await message.answer(
                     "Расскажите больше о вашей ситуации, чтобы я мог дать более точный ответ."
                 )
                 return
             
             # Обрабатываем вопрос
-            await self._process_ai_response(update, context, user, user_text)
+            await self._process_ai_response(message, bot, user, user_text)
             
         elif fsm_state == FSMState.WAITING_FOR_CONTEXT:
             # Пользователь предоставил контекст
@@ -220,88 +254,75 @@ class MessageUseCase:
             question = (await fsm_manager.get_user_data(user_id)).get("current_question", "")
             full_question = f"{question}\n\nКонтекст: {user_text}"
             
-            await self._process_ai_response(update, context, user, full_question)
+            await self._process_ai_response(message, bot, user, full_question)
             
         elif fsm_state == FSMState.WAITING_FOR_FOLLOW_UP:
             # Пользователь задал уточняющий вопрос
             if user_text.lower() in ["спасибо", "хорошо", "понятно", "ок"]:
                 await fsm_manager.transition_to(user_id, "conversation_end")
-                await update.message.reply_text("Рад был помочь! Если у вас появятся новые вопросы, обращайтесь.")
+                await message.answer("Рад был помочь! Если у вас появятся новые вопросы, обращайтесь.")
             else:
                 await fsm_manager.transition_to(user_id, "follow_up_received")
-                await self._process_ai_response(update, context, user, user_text)
+                await self._process_ai_response(message, bot, user, user_text)
                 
         elif fsm_state == FSMState.WAITING_FOR_CONFIRMATION:
             # Пользователь подтверждает или отклоняет ответ
             if user_text.lower() in ["да", "да", "подтверждаю", "верно"]:
                 await fsm_manager.transition_to(user_id, "confirmed")
-                await update.message.reply_text("Отлично! Что-то еще?")
+                await message.answer("Отлично! Что-то еще?")
             else:
                 await fsm_manager.transition_to(user_id, "rejected")
-                await update.message.reply_text("Понял, давайте попробуем по-другому. Задайте ваш вопрос:")
+                await message.answer("Понял, давайте попробуем по-другому. Задайте ваш вопрос:")
                 
         else:
             # Неожиданное состояние - сбрасываем в обычный режим
             await fsm_manager.reset_user_state(user_id)
-            await self._handle_normal_message(update, context, user, user_text)
+            await self._handle_normal_message(message, bot, user, user_text)
 
-    async def _process_ai_response(self, update: Any, context: Any, user, question: str):
+    async def _process_ai_response(self, message: TgMessage, bot: Bot, user, question: str):
         """Обработка ответа ИИ с FSM"""
         user_id = user.telegram_id
-        
+
+        if not await self._check_quota(message, bot, user):
+            return
+
         # Создание или получение Chat
         chat_model, _ = await ChatModel.get_or_create(user_id=user_id, defaults={'id': user_id})
         
         # Сохранение сообщения пользователя
-        await MessageModel.create(
-            chat=chat_model,
-            content=question,
-            is_from_user=True,
-            created_at=datetime.now()
-        )
+        await self.message_repo.save_message(chat_model.id, question, is_from_user=True)
 
         # Получение истории
         history = await self.message_repo.get_history_messages(user=user, max_last_messages=20)
         if not history:
-            await self.message_sender.send_error(update, f"Не удалось получить историю сообщений для {user_id}")
+            await self.message_sender.send_error(message, f"Не удалось получить историю сообщений для {user_id}")
             return
 
         # Отправка ответа
-        thinking_message = await update.message.reply_text("Думаю...")
-        response_text = await self.gpt_repo.get_answer_from_get_triggers(history, user_id) or "Извините, не удалось обработать ваш запрос."
-        
+        response_text = await self._generate_reply(message, bot, user, history)
+        if response_text is None:
+            return
+
         # Сохраняем ответ
-        await MessageModel.create(
-            chat=chat_model,
-            content=response_text,
-            is_from_user=False,
-            created_at=datetime.now()
-        )
+        await self.message_repo.save_message(chat_model.id, response_text, is_from_user=False)
+
+        # История FSM нужна только для контекста беседы — пишем её после ответа
+        await task_runner.defer("fsm.remember_response", user_id=user_id, response_text=response_text)
 
-        # Добавляем ответ в историю FSM
-        await fsm_manager.add_to_conversation_history(user_id, response_text, is_user=False)
-        await fsm_manager.update_user_data(user_id, {"last_response": response_text})
-        
         # Переходим в состояние ожидания уточнений
         await fsm_manager.transition_to(user_id, "response_ready")
 
-        await context.bot.edit_message_text(
-            text=response_text,
-            chat_id=user_id,
-            message_id=thinking_message.message_id
-        )
-
-    async def start_conversation_mode(self, update: Any, context: Any, user_id: int):
+    async def start_conversation_mode(self, message: TgMessage, user_id: int):
         """Начать режим беседы с FSM"""
         await fsm_manager.set_user_state(user_id, FSMState.WAITING_FOR_QUESTION)
-        await update.message.reply_text(
+        await message.answer(
             "Отлично! Теперь я буду вести с вами более структурированную беседу. "
             "Задайте ваш вопрос, и я помогу разобраться в ситуации."
         )
 
-    async def end_conversation_mode(self, update: Any, context: Any, user_id: int):
+    async def end_conversation_mode(self, message: TgMessage, user_id: int):
         """Завершить режим беседы"""
         await fsm_manager.reset_user_state(user_id)
-        await update.message.reply_text(
+        await message.answer(
             "Режим беседы завершен. Теперь я буду отвечать в обычном режиме."
         )
\ No newline at end of file
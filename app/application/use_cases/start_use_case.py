@@ -1,7 +1,8 @@
-from typing import Any
+from aiogram.types import Message
 from app.domain.entities.models.user import User
 from app.infrastructure.repositories.user_use_repositories import UserUseRepositories
 from app.infrastructure.logging.setup_logger import logger
+from app.infrastructure.metrics.pipeline import timed_use_case
 from app.interfaces.telegram.services.keyboard_manager import KeyboardManager
 from app.interfaces.telegram.services.message_sender import MessageSender
 
@@ -12,14 +13,15 @@ class StartUseCase:
         self.keyboard_manager = KeyboardManager()
         self.message_sender = MessageSender()
 
-    async def execute(self, update: Any, context: Any) -> None:
-        user_info = update.effective_user
+    @timed_use_case("start")
+    async def execute(self, message: Message, args: list[str]) -> None:
+        user_info = message.from_user
         # Обработка реферальной ссылки
         invited_by = None
-        logger.info(f"ARGS: {context.args}")
-        if context.args and len(context.args) > 0 and context.args[0].startswith('ref_'):
+        logger.info(f"ARGS: {args}")
+        if args and args[0].startswith('ref_'):
             try:
-                invited_by = int(context.args[0][4:])
+                invited_by = int(args[0][4:])
                 if invited_by == user_info.id:
                     invited_by = None  # нельзя пригласить самого себя
             except Exception:
@@ -28,13 +30,13 @@ class StartUseCase:
         user, created = await self.user_repo.create_or_update_user(user_info, invited_by=invited_by)
 
         # Проверка бана
-        from datetime import datetime
-        now = datetime.utcnow()
+        from datetime import datetime, timezone
+        now = datetime.now(timezone.utc)
         if user.is_banned or (user.banned_until and user.banned_until > now):
             ban_msg = "Вы забанены. Обратитесь к администратору."
             if user.banned_until and user.banned_until > now:
                 ban_msg = f"Вы временно забанены до {user.banned_until.strftime('%d.%m.%Y %H:%M')}."
-            await update.message.reply_text(ban_msg)
+            await message.answer(ban_msg)
             return
 
         logger.info(
@@ -44,4 +46,4 @@ class StartUseCase:
         )
 
         reply_markup = self.keyboard_manager.get_lk_inline_keyboard()
-        await self.message_sender.send_welcome_message(update, created, reply_markup)
\ No newline at end of file
+        await self.message_sender.send_welcome_message(message, created, reply_markup)
\ No newline at end of file
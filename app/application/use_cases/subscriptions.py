@@ -2,9 +2,10 @@ import logging
 from datetime import datetime, timedelta
 from decimal import Decimal
 
-from app.infrastructure.database.models.subscribe import (SubscriptionModel,
-                                                          SubscriptionPlanModel)
+from app.infrastructure.database.models.subscribe import PlanName, SubscriptionModel
 from app.infrastructure.database.models.user import UserModel
+from app.infrastructure.redis.view_cache import invalidate_lk_view
+from app.infrastructure.services.plan_catalogue import plan_catalogue
 
 logger = logging.getLogger(__name__)
 
@@ -48,7 +49,7 @@ async def activate_subscription_for_user(user_id: int, plan_id: int, payment_id:
     """
 
     user = await UserModel.get_or_none(telegram_id=user_id)  # ищем по telegram_id
-    plan = await SubscriptionPlanModel.get_or_none(id=plan_id)
+    plan = plan_catalogue.get(plan_id)
 
     if not user or not plan:
         logger.error(
@@ -61,13 +62,12 @@ async def activate_subscription_for_user(user_id: int, plan_id: int, payment_id:
         await SubscriptionModel.filter(
             user=user, is_active=True, end_date__gte=datetime.utcnow()
         )
-        .prefetch_related("plan")
         .first()
     )
 
     start_date = datetime.utcnow()
     # Если есть активная подписка, продлеваем ее
-    if existing_subscription and existing_subscription.plan.name == plan.name:
+    if existing_subscription and existing_subscription.plan_id == plan.id:
         start_date = existing_subscription.end_date
         logger.info(
             f"Продление подписки {plan.name} для пользователя {user_id} с {start_date}."
@@ -82,7 +82,7 @@ async def activate_subscription_for_user(user_id: int, plan_id: int, payment_id:
     # Создаем новую запись о подписке
     await SubscriptionModel.create(
         user=user,
-        plan=plan,
+        plan_id=plan.id,
         start_date=start_date,
         end_date=end_date,
         is_active=True,
@@ -91,9 +91,10 @@ async def activate_subscription_for_user(user_id: int, plan_id: int, payment_id:
     )
 
     # Обновляем статус пользователя
-    user.subscription_level = plan.name
+    user.subscription_level = PlanName(plan.name)
     await user.save()
+    await invalidate_lk_view(user.telegram_id)
 
     logger.info(
-        f"Подписка '{plan.name.value}' для пользователя {user.telegram_id} успешно активирована до {end_date}."
+        f"Подписка '{plan.name}' для пользователя {user.telegram_id} успешно активирована до {end_date}."
     )
@@ -0,0 +1,165 @@
+"""Бенчмарк массового импорта: COPY + upsert пачками против построчного ORM.
+
+Генерирует синтетических пользователей, чаты, подписки и сообщения в
+NDJSON, загружает их через ``app.cli.bulk_io.import_file`` и печатает
+строк/с по каждой сущности. Для сравнения небольшая выборка пишется через
+``Model.create`` по одной строке. Сгенерированные строки лежат в отдельном
+диапазоне id и удаляются в конце.
+
+Запускать только на отдельной (scratch) базе: нужна схема и хотя бы один
+тарифный план (создаётся при старте бота).
+
+Запуск: python -m app.benchmarks.bulk_io [--users 20000] [--messages 200000] [--orm-sample 500]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+from tortoise import Tortoise
+
+from app.cli.bulk_io import import_file
+from app.infrastructure.database.models.chat import ChatModel
+from app.infrastructure.database.models.message import MessageModel
+from app.infrastructure.database.models.subscribe import SubscriptionModel, SubscriptionPlanModel
+from app.infrastructure.database.models.user import UserModel
+from app.infrastructure.database.setup_db import DATABASE_URL, TORTOISE_ORM
+
+# Диапазоны id, не пересекающиеся с реальными данными
+USER_BASE = 9_000_000_000_000
+CHAT_BASE = 9_000_000_000_000
+SUBSCRIPTION_BASE = 2_000_000_000
+MESSAGE_BASE = 2_000_000_000
+
+
+def write_ndjson(path: str, rows) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False, default=str))
+            f.write("\n")
+
+
+def generate(directory: str, users: int, messages: int, plan_id: int, rng: random.Random) -> dict:
+    now = datetime.now(timezone.utc)
+    paths = {name: os.path.join(directory, f"{name}.ndjson") for name in ("users", "chats", "subscriptions", "messages")}
+    write_ndjson(paths["users"], (
+        {
+            "telegram_id": USER_BASE + i,
+            "username": f"bench_{i}",
+            "first_name": "Bench",
+            # Часть пригласивших идёт позже в файле — проверяем отложенные ссылки
+            "invited_by_id": USER_BASE + rng.randrange(users) if i % 10 == 0 else None,
+            "referrals": [],
+            "created_at": (now - timedelta(days=i % 365)).isoformat(),
+        }
+        for i in range(users)
+    ))
+    write_ndjson(paths["chats"], ({"id": CHAT_BASE + i, "user_id": USER_BASE + i} for i in range(users)))
+    write_ndjson(paths["subscriptions"], (
+        {
+            "id": SUBSCRIPTION_BASE + i,
+            "user_id": USER_BASE + i,
+            "plan_id": plan_id,
+            "end_date": (now + timedelta(days=30)).isoformat(),
+            "payment_amount": "4.99",
+        }
+        for i in range(users)
+    ))
+    write_ndjson(paths["messages"], (
+        {
+            "id": MESSAGE_BASE + i,
+            "chat_id": CHAT_BASE + rng.randrange(users),
+            "content": "Сегодня опять всё не так, не знаю, как быть " * 3,
+            "is_from_user": i % 2 == 0,
+            "created_at": (now - timedelta(seconds=i)).isoformat(),
+        }
+        for i in range(messages)
+    ))
+    return paths
+
+
+async def orm_rows_per_second(sample: int, plan_id: int) -> dict:
+    """Построчная запись через ORM — так импорт выглядел раньше."""
+    now = datetime.now(timezone.utc)
+    base = USER_BASE + 5_000_000_000
+    results = {}
+
+    started = time.perf_counter()
+    for i in range(sample):
+        await UserModel.create(telegram_id=base + i, username=f"orm_{i}")
+    results["users"] = sample / (time.perf_counter() - started)
+
+    chat = await ChatModel.create(id=base, user_id=base)
+    started = time.perf_counter()
+    for i in range(sample):
+        await MessageModel.create(id=MESSAGE_BASE + 100_000_000 + i, chat_id=chat.id, content="orm", is_from_user=True)
+    results["messages"] = sample / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for i in range(sample):
+        await SubscriptionModel.create(
+            id=SUBSCRIPTION_BASE + 100_000_000 + i, user_id=base + i, plan_id=plan_id, end_date=now
+        )
+    results["subscriptions"] = sample / (time.perf_counter() - started)
+    return results
+
+
+async def cleanup(conn: asyncpg.Connection) -> None:
+    await conn.execute("DELETE FROM messages WHERE id >= $1", MESSAGE_BASE)
+    await conn.execute("DELETE FROM subscriptions WHERE id >= $1", SUBSCRIPTION_BASE)
+    await conn.execute("DELETE FROM chats WHERE id >= $1", CHAT_BASE)
+    await conn.execute("UPDATE users SET invited_by_id = NULL WHERE telegram_id >= $1", USER_BASE)
+    await conn.execute("DELETE FROM users WHERE telegram_id >= $1", USER_BASE)
+    # Импорт сдвинул последовательности к синтетическим id — возвращаем обратно
+    for table in ("messages", "subscriptions"):
+        await conn.execute(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 1))"
+        )
+
+
+async def run(args: argparse.Namespace) -> None:
+    await Tortoise.init(config=TORTOISE_ORM)
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        plan = await SubscriptionPlanModel.first()
+        if plan is None:
+            raise SystemExit("Нет тарифных планов: запустите бота на этой базе хотя бы раз")
+        await cleanup(conn)
+
+        with tempfile.TemporaryDirectory() as directory:
+            paths = generate(directory, args.users, args.messages, plan.id, random.Random(42))
+            print(f"{'сущность':<14} {'строк':>9} {'COPY, строк/с':>15}")
+            copy_rates = {}
+            for entity in ("users", "chats", "subscriptions", "messages"):
+                started = time.perf_counter()
+                rows = await import_file(conn, entity, paths[entity], "ndjson", args.batch_size)
+                copy_rates[entity] = rows / (time.perf_counter() - started)
+                print(f"{entity:<14} {rows:>9} {copy_rates[entity]:>15.0f}")
+
+        orm_rates = await orm_rows_per_second(args.orm_sample, plan.id)
+        print(f"\n{'сущность':<14} {'ORM, строк/с':>13} {'ускорение':>10}")
+        for entity, rate in orm_rates.items():
+            print(f"{entity:<14} {rate:>13.0f} {copy_rates[entity] / rate:>9.1f}x")
+    finally:
+        await cleanup(conn)
+        await conn.close()
+        await Tortoise.close_connections()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк массового импорта через COPY")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--orm-sample", type=int, default=500)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
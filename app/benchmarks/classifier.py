@@ -0,0 +1,74 @@
+"""Бенчмарк классификатора режима/типа ответа.
+
+Сравнивает прежний цикл ``kw in user_text.lower()`` по каждой фразе
+с одной скомпилированной регуляркой ``MessageClassifier`` на сообщениях ~4 КБ.
+
+Запуск: python -m app.benchmarks.classifier [--iterations 20000]
+"""
+
+import argparse
+import random
+import timeit
+
+from app.domain.services.message_classifier import (
+    HARD_KEYWORDS,
+    SELF_BLAME_KEYWORDS,
+    MessageClassifier,
+)
+
+FILLER_WORDS = (
+    "сегодня", "опять", "думаю", "почему", "вообще", "не", "знаю", "как", "быть",
+    "мне", "кажется", "что", "всё", "идёт", "не", "так", "и", "я", "устала",
+)
+
+
+def legacy_detect(user_text: str) -> tuple[str, str]:
+    """Прежняя реализация detect_mode_and_reply_type."""
+    for kw in HARD_KEYWORDS + SELF_BLAME_KEYWORDS:
+        if kw in user_text.lower():
+            mode = "hard"
+            break
+    else:
+        mode = "soft"
+    text_len = len(user_text.strip())
+    is_caps = user_text.isupper() and text_len > 5
+    is_brief = text_len < 20 or user_text.count("!") > 2 or is_caps
+    return mode, "brief" if is_brief else "long"
+
+
+def make_message(size: int, keyword: str | None, rng: random.Random) -> str:
+    words = []
+    while sum(len(w) + 1 for w in words) < size:
+        words.append(rng.choice(FILLER_WORDS))
+    if keyword:
+        words.insert(len(words) - 3, keyword)
+    return " ".join(words)[:size + len(keyword or "")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк классификатора сообщений")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--size", type=int, default=4096)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    classifier = MessageClassifier()
+    cases = {
+        "без ключевых слов": make_message(args.size, None, rng),
+        "ключевое слово в конце": make_message(args.size, "он контролирует", rng),
+    }
+
+    for name, text in cases.items():
+        result = classifier.classify(text)
+        assert legacy_detect(text) == (result.mode, result.reply_type)
+        legacy = timeit.timeit(lambda: legacy_detect(text), number=args.iterations)
+        compiled = timeit.timeit(lambda: classifier.classify(text), number=args.iterations)
+        print(
+            f"{name:<24} legacy: {legacy / args.iterations * 1e6:8.1f} мкс  "
+            f"compiled: {compiled / args.iterations * 1e6:8.1f} мкс  "
+            f"x{legacy / compiled:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
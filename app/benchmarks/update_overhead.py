@@ -0,0 +1,72 @@
+"""Накладные расходы на апдейт: PTB-адаптеры против нативных aiogram-объектов.
+
+Для каждого апдейта измеряется то, что раньше делал каждый хендлер:
+создание ``PTBUpdateAdapter``/``PTBContextAdapter``, обращения к
+``effective_chat``/``message``/``effective_user`` и конвертация клавиатуры
+через ``_convert_reply_markup``. Нативный путь читает те же поля напрямую.
+
+Запуск: python -m app.benchmarks.update_overhead [--iterations 200000]
+"""
+
+import argparse
+import timeit
+from types import SimpleNamespace
+
+from aiogram import Bot
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message
+
+from app.interfaces.telegram.compat import PTBContextAdapter, PTBUpdateAdapter, _convert_reply_markup
+
+SAMPLE_MESSAGE = {
+    "message_id": 1,
+    "date": 1700000000,
+    "chat": {"id": 42, "type": "private"},
+    "from": {"id": 42, "is_bot": False, "first_name": "Test"},
+    "text": "Привет! Мне нужна помощь",
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк накладных расходов на апдейт")
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+
+    bot = Bot(token="42:TEST")
+    message = Message.model_validate(SAMPLE_MESSAGE)
+    aio_markup = InlineKeyboardMarkup(
+        inline_keyboard=[[InlineKeyboardButton(text="📱 Личный кабинет", callback_data="open_lk")]]
+    )
+    ptb_like_markup = SimpleNamespace(
+        inline_keyboard=[[SimpleNamespace(text="📱 Личный кабинет", callback_data="open_lk", url=None)]]
+    )
+
+    def adapter_path(markup):
+        update = PTBUpdateAdapter(message=message, callback_query=None, bot=bot)
+        context = PTBContextAdapter(bot, None, message.from_user.id)
+        return (
+            update.effective_chat.id,
+            update.message.text,
+            update.effective_user.id,
+            context.user_data,
+            _convert_reply_markup(markup),
+        )
+
+    def native_path(markup):
+        return message.chat.id, message.text, message.from_user.id, markup
+
+    cases = {
+        "aiogram-клавиатура": aio_markup,
+        "PTB-клавиатура": ptb_like_markup,
+    }
+    for name, markup in cases.items():
+        adapter = timeit.timeit(lambda: adapter_path(markup), number=args.iterations)
+        native = timeit.timeit(lambda: native_path(aio_markup), number=args.iterations)
+        print(
+            f"{name:<20} adapters: {adapter / args.iterations * 1e6:7.2f} мкс  "
+            f"native: {native / args.iterations * 1e6:7.2f} мкс  "
+            f"x{adapter / native:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Заполнение MessageModel.topic найденными триггерами.
+
+Сообщения пользователей читаются пачками по возрастанию id, сопоставляются
+с триггерами через ``TriggerMatcher.match_batch`` и обновляются одним UPDATE
+на каждый найденный топик. Последний обработанный id сохраняется в Redis,
+поэтому прерванный запуск продолжается с того же места.
+
+Запуск:
+    python -m app.cli.backfill_topics --batch-size 5000
+    python -m app.cli.backfill_topics --reset   # начать сначала
+"""
+
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+
+from tortoise import Tortoise
+
+from app.infrastructure.database.models.message import MessageModel
+from app.infrastructure.database.setup_db import TORTOISE_ORM
+from app.infrastructure.logging.setup_logger import logger
+from app.infrastructure.redis.redis_client import redis_client
+from app.infrastructure.triggers.trigger_loader import TriggersLoader
+from app.infrastructure.triggers.trigger_matcher import TriggerMatcher
+
+CHECKPOINT_KEY = "backfill:topics:last_id"
+CHECKPOINT_TTL = 30 * 86400
+TOPIC_MAX_LENGTH = 100
+
+
+async def backfill_topics(batch_size: int, threshold: int, reset: bool) -> None:
+    await Tortoise.init(config=TORTOISE_ORM)
+    await redis_client.connect()
+    try:
+        if reset:
+            await redis_client.delete_cache(CHECKPOINT_KEY)
+        last_id = int(await redis_client.get_cache(CHECKPOINT_KEY) or 0)
+        matcher = TriggerMatcher(TriggersLoader().TRIGGERS)
+
+        processed = 0
+        tagged = 0
+        started = time.monotonic()
+        logger.info(f"[BACKFILL] Старт с id > {last_id}, batch_size={batch_size}")
+
+        while True:
+            rows = await (
+                MessageModel.filter(id__gt=last_id, is_from_user=True, topic__isnull=True)
+                .order_by("id")
+                .limit(batch_size)
+                .values_list("id", "content")
+            )
+            if not rows:
+                break
+
+            ids = [row[0] for row in rows]
+            # Пачка целиком помещается в один чанк матчера
+            matches = next(matcher.match_batch((row[1] for row in rows), threshold=threshold, chunk_size=len(rows)))
+
+            by_topic: dict[str, list[int]] = defaultdict(list)
+            for message_id, trigger in zip(ids, matches):
+                if trigger:
+                    by_topic[trigger["trigger"][:TOPIC_MAX_LENGTH]].append(message_id)
+
+            for topic, topic_ids in by_topic.items():
+                await MessageModel.filter(id__in=topic_ids).update(topic=topic)
+
+            last_id = ids[-1]
+            await redis_client.set_cache(CHECKPOINT_KEY, last_id, ttl=CHECKPOINT_TTL)
+
+            processed += len(ids)
+            tagged += sum(len(v) for v in by_topic.values())
+            elapsed = time.monotonic() - started
+            logger.info(
+                f"[BACKFILL] id<={last_id}: обработано {processed}, размечено {tagged} "
+                f"({processed / elapsed if elapsed else 0:.0f} сообщ./с)"
+            )
+
+        logger.info(f"[BACKFILL] Готово: обработано {processed}, размечено {tagged}")
+    finally:
+        await redis_client.disconnect()
+        await Tortoise.close_connections()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Заполнить MessageModel.topic по триггерам")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--threshold", type=int, default=80)
+    parser.add_argument("--reset", action="store_true", help="Игнорировать сохранённый прогресс")
+    args = parser.parse_args()
+    asyncio.run(backfill_topics(args.batch_size, args.threshold, args.reset))
+
+
+if __name__ == "__main__":
+    main()
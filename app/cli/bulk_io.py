@@ -0,0 +1,387 @@
+"""Массовый импорт/экспорт пользователей, подписок и истории через COPY.
+
+Экспорт: ``COPY (SELECT ...) TO STDOUT`` пишет в файл потоком (CSV или NDJSON),
+без загрузки таблицы в память.
+
+Импорт: файл читается потоком, пачками по ``--batch-size`` строк. Каждая
+пачка загружается бинарным ``COPY`` во временную staging-таблицу и
+переносится в целевую одним ``INSERT ... ON CONFLICT DO UPDATE`` в одной
+транзакции. После коммита число обработанных записей сохраняется в
+чекпоинт-файл, поэтому прерванный импорт продолжается с того же места.
+
+Порядок импорта: users -> chats -> subscriptions -> messages (внешние ключи).
+Ссылка users.invited_by_id на ещё не загруженного пользователя откладывается
+и проставляется в конце импорта.
+
+Запуск:
+    python -m app.cli.bulk_io export users users.ndjson
+    python -m app.cli.bulk_io export messages messages.csv --format csv
+    python -m app.cli.bulk_io import users users.ndjson --batch-size 10000
+    python -m app.cli.bulk_io import messages messages.csv --restart   # без чекпоинта
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import asyncpg
+from tortoise import Tortoise, fields
+
+from app.infrastructure.database.setup_db import DATABASE_URL, TORTOISE_ORM
+from app.infrastructure.logging.setup_logger import logger
+
+ENTITIES = {
+    "users": "app.infrastructure.database.models.user.UserModel",
+    "chats": "app.infrastructure.database.models.chat.ChatModel",
+    "subscriptions": "app.infrastructure.database.models.subscribe.SubscriptionModel",
+    "messages": "app.infrastructure.database.models.message.MessageModel",
+}
+
+# Необязательные ссылки, которые могут указывать на строку из следующих пачек
+DEFERRED_REFS = {
+    "users": {"invited_by_id": ("users", "telegram_id")},
+}
+
+PENDING_TABLE = "bulk_io_pending_refs"
+
+
+def _parse_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("t", "true", "1", "yes")
+
+
+def _parse_datetime(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    parsed = datetime.fromisoformat(str(value))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _parse_json(value: Any) -> str:
+    # В CSV jsonb приходит строкой, в NDJSON — уже разобранным значением
+    return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+
+def _converter(field_obj: fields.Field) -> Callable[[Any], Any]:
+    if isinstance(field_obj, fields.BooleanField):
+        return _parse_bool
+    if isinstance(field_obj, (fields.IntField, fields.BigIntField, fields.SmallIntField)):
+        return int
+    if isinstance(field_obj, fields.DatetimeField):
+        return _parse_datetime
+    if isinstance(field_obj, fields.DecimalField):
+        return lambda v: Decimal(str(v))
+    if isinstance(field_obj, fields.JSONField):
+        return _parse_json
+    return str
+
+
+@dataclass
+class TableSpec:
+    """Колонки и ключ таблицы, выведенные из модели Tortoise."""
+
+    table: str
+    pk: str
+    columns: List[str]
+    converters: Dict[str, Callable[[Any], Any]]
+    defaults: Dict[str, Callable[[], Any]]
+    deferred: Dict[str, Tuple[str, str]] = field(default_factory=dict)
+
+    @classmethod
+    def from_model(cls, entity: str, model) -> "TableSpec":
+        meta = model._meta
+        columns, converters, defaults = [], {}, {}
+        for name, column in meta.fields_db_projection.items():
+            field_obj = meta.fields_map[name]
+            columns.append(column)
+            converters[column] = _converter(field_obj)
+            if getattr(field_obj, "auto_now", False) or getattr(field_obj, "auto_now_add", False):
+                defaults[column] = lambda: datetime.now(timezone.utc)
+            elif field_obj.default is not None:
+                default = field_obj.default
+                if isinstance(field_obj, fields.JSONField):
+                    defaults[column] = lambda d=default: _parse_json(d() if callable(d) else d)
+                else:
+                    defaults[column] = default if callable(default) else (lambda d=default: d)
+        return cls(meta.db_table, meta.db_pk_column, columns, converters, defaults, DEFERRED_REFS.get(entity, {}))
+
+    def to_record(self, row: Dict[str, Any]) -> tuple:
+        if row.get(self.pk) in (None, ""):
+            # Upsert идёт по первичному ключу, строки без него не сопоставить
+            raise ValueError(f"{self.table}: в записи нет значения ключа {self.pk}")
+        values = []
+        for column in self.columns:
+            raw = row.get(column)
+            if raw is None or raw == "":
+                default = self.defaults.get(column)
+                values.append(default() if default else None)
+            else:
+                values.append(self.converters[column](raw))
+        return tuple(values)
+
+
+def load_spec(entity: str) -> TableSpec:
+    if not Tortoise.apps:
+        Tortoise.init_models(TORTOISE_ORM["apps"]["models"]["models"], "models")
+    module_path, class_name = ENTITIES[entity].rsplit(".", 1)
+    model = getattr(__import__(module_path, fromlist=[class_name]), class_name)
+    return TableSpec.from_model(entity, model)
+
+
+def read_rows(path: str, fmt: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def batched(rows: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Checkpoint:
+    """Файл с числом уже импортированных записей."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            return int(json.load(f).get("rows_done", 0))
+
+    def save(self, rows_done: int) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"rows_done": rows_done, "updated_at": datetime.now(timezone.utc).isoformat()}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+async def primary_key_columns(conn: asyncpg.Connection, table: str) -> List[str]:
+    """Колонки первичного ключа в БД. У партиционированной messages это (id, created_at)."""
+    return [
+        row["attname"]
+        for row in await conn.fetch(
+            "SELECT a.attname FROM pg_index i "
+            "JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey) "
+            "WHERE i.indrelid = $1::regclass AND i.indisprimary",
+            table,
+        )
+    ]
+
+
+def build_upsert_sql(spec: TableSpec, stage: str, conflict: List[str]) -> str:
+    cols = ", ".join(_quote(c) for c in spec.columns)
+    select_cols = []
+    for column in spec.columns:
+        if column in spec.deferred:
+            ref_table, ref_column = spec.deferred[column]
+            # Ссылка на ещё не загруженную строку пока NULL, см. PENDING_TABLE
+            select_cols.append(
+                f"CASE WHEN EXISTS (SELECT 1 FROM {_quote(ref_table)} r WHERE r.{_quote(ref_column)} = s.{_quote(column)}) "
+                f"OR EXISTS (SELECT 1 FROM {stage} r WHERE r.{_quote(ref_column)} = s.{_quote(column)}) "
+                f"THEN s.{_quote(column)} END"
+            )
+        else:
+            select_cols.append(f"s.{_quote(column)}")
+    updates = ", ".join(f"{_quote(c)} = EXCLUDED.{_quote(c)}" for c in spec.columns if c not in conflict)
+    return (
+        f"INSERT INTO {_quote(spec.table)} ({cols}) SELECT {', '.join(select_cols)} FROM {stage} s "
+        f"ON CONFLICT ({', '.join(_quote(c) for c in conflict)}) DO UPDATE SET {updates}"
+    )
+
+
+async def _ensure_pending_table(conn: asyncpg.Connection) -> None:
+    await conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {PENDING_TABLE} ("
+        "tbl TEXT NOT NULL, col TEXT NOT NULL, row_pk BIGINT NOT NULL, ref BIGINT NOT NULL, "
+        "PRIMARY KEY (tbl, col, row_pk))"
+    )
+
+
+async def _save_pending_refs(conn: asyncpg.Connection, spec: TableSpec, stage: str) -> None:
+    for column, (ref_table, ref_column) in spec.deferred.items():
+        await conn.execute(
+            f"INSERT INTO {PENDING_TABLE} (tbl, col, row_pk, ref) "
+            f"SELECT $1, $2, s.{_quote(spec.pk)}, s.{_quote(column)} FROM {stage} s "
+            f"WHERE s.{_quote(column)} IS NOT NULL AND NOT EXISTS "
+            f"(SELECT 1 FROM {_quote(ref_table)} r WHERE r.{_quote(ref_column)} = s.{_quote(column)}) "
+            f"ON CONFLICT (tbl, col, row_pk) DO UPDATE SET ref = EXCLUDED.ref",
+            spec.table,
+            column,
+        )
+
+
+async def _resolve_pending_refs(conn: asyncpg.Connection, spec: TableSpec) -> None:
+    for column, (ref_table, ref_column) in spec.deferred.items():
+        async with conn.transaction():
+            status = await conn.execute(
+                f"UPDATE {_quote(spec.table)} t SET {_quote(column)} = p.ref FROM {PENDING_TABLE} p "
+                f"WHERE p.tbl = $1 AND p.col = $2 AND t.{_quote(spec.pk)} = p.row_pk "
+                f"AND EXISTS (SELECT 1 FROM {_quote(ref_table)} r WHERE r.{_quote(ref_column)} = p.ref)",
+                spec.table,
+                column,
+            )
+            await conn.execute(f"DELETE FROM {PENDING_TABLE} WHERE tbl = $1 AND col = $2", spec.table, column)
+        logger.info(f"[BULK_IO] {spec.table}.{column}: отложенные ссылки проставлены ({status})")
+
+
+async def _sync_sequence(conn: asyncpg.Connection, spec: TableSpec) -> None:
+    """После вставки явных id сдвигаем serial-последовательность за максимум."""
+    sequence = await conn.fetchval("SELECT pg_get_serial_sequence($1, $2)", spec.table, spec.pk)
+    if sequence:
+        await conn.execute(
+            f"SELECT setval($1, COALESCE((SELECT MAX({_quote(spec.pk)}) FROM {_quote(spec.table)}), 1))", sequence
+        )
+
+
+async def import_file(
+    conn: asyncpg.Connection,
+    entity: str,
+    path: str,
+    fmt: str,
+    batch_size: int = 5000,
+    checkpoint: Optional[Checkpoint] = None,
+) -> int:
+    """Импортировать файл в таблицу сущности. Возвращает число записей за этот запуск."""
+    spec = load_spec(entity)
+    stage = f"_stage_{spec.table}"
+    await conn.execute(
+        f"CREATE TEMP TABLE IF NOT EXISTS {stage} (LIKE {_quote(spec.table)} INCLUDING DEFAULTS)"
+    )
+    if spec.deferred:
+        await _ensure_pending_table(conn)
+    upsert_sql = build_upsert_sql(spec, stage, await primary_key_columns(conn, spec.table) or [spec.pk])
+
+    skip = checkpoint.load() if checkpoint else 0
+    if skip:
+        logger.info(f"[BULK_IO] {entity}: продолжаем с записи {skip}")
+    rows_done = skip
+    imported = 0
+    started = time.monotonic()
+
+    rows = read_rows(path, fmt)
+    for _ in range(skip):
+        if next(rows, None) is None:
+            break
+
+    for batch in batched(rows, batch_size):
+        records = [spec.to_record(row) for row in batch]
+        async with conn.transaction():
+            await conn.copy_records_to_table(stage, records=records, columns=spec.columns)
+            if spec.deferred:
+                await _save_pending_refs(conn, spec, stage)
+            await conn.execute(upsert_sql)
+            await conn.execute(f"TRUNCATE {stage}")
+        rows_done += len(records)
+        imported += len(records)
+        if checkpoint:
+            checkpoint.save(rows_done)
+        elapsed = time.monotonic() - started
+        logger.info(
+            f"[BULK_IO] {entity}: {rows_done} записей ({imported / elapsed if elapsed else 0:.0f} строк/с)"
+        )
+
+    if spec.deferred:
+        await _resolve_pending_refs(conn, spec)
+    await _sync_sequence(conn, spec)
+    if checkpoint:
+        checkpoint.clear()
+    return imported
+
+
+async def export_table(conn: asyncpg.Connection, entity: str, path: str, fmt: str) -> int:
+    """Выгрузить таблицу сущности потоком через COPY TO STDOUT. Возвращает число строк."""
+    spec = load_spec(entity)
+    cols = ", ".join(_quote(c) for c in spec.columns)
+    query = f"SELECT {cols} FROM {_quote(spec.table)} ORDER BY {_quote(spec.pk)}"
+    rows = 0
+    started = time.monotonic()
+
+    with open(path, "wb") as f:
+        async def sink(chunk: bytes) -> None:
+            nonlocal rows
+            f.write(chunk)
+            rows += chunk.count(b"\n")
+
+        if fmt == "csv":
+            await conn.copy_from_query(query, output=sink, format="csv", header=True)
+            rows = max(rows - 1, 0)
+        else:
+            # CSV-режим с символами-разделителями, которых нет в JSON: строка выходит как есть,
+            # без экранирования обратных слэшей текстового формата COPY
+            await conn.copy_from_query(
+                f"SELECT row_to_json(t)::text FROM ({query}) t",
+                output=sink,
+                format="csv",
+                quote="\x01",
+                delimiter="\x02",
+            )
+
+    elapsed = time.monotonic() - started
+    logger.info(f"[BULK_IO] {entity}: выгружено {rows} строк в {path} ({rows / elapsed if elapsed else 0:.0f} строк/с)")
+    return rows
+
+
+def _detect_format(path: str, fmt: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    return "csv" if path.endswith(".csv") else "ndjson"
+
+
+async def run(args: argparse.Namespace) -> None:
+    fmt = _detect_format(args.path, args.format)
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        if args.command == "export":
+            await export_table(conn, args.entity, args.path, fmt)
+        else:
+            checkpoint = Checkpoint(args.checkpoint or f"{args.path}.checkpoint.json")
+            if args.restart:
+                checkpoint.clear()
+            await import_file(conn, args.entity, args.path, fmt, args.batch_size, checkpoint)
+    finally:
+        await conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Массовый импорт/экспорт через COPY")
+    parser.add_argument("command", choices=("import", "export"))
+    parser.add_argument("entity", choices=tuple(ENTITIES))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("ndjson", "csv"), help="По умолчанию — по расширению файла")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--checkpoint", help="Файл чекпоинта (по умолчанию <path>.checkpoint.json)")
+    parser.add_argument("--restart", action="store_true", help="Игнорировать сохранённый прогресс")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
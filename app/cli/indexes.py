@@ -0,0 +1,31 @@
+"""Построение функциональных и trigram-индексов, см. app/infrastructure/database/indexes.py.
+
+Идемпотентно: уже построенные индексы пропускаются, поэтому команду можно
+запускать при каждом развёртывании.
+
+Запуск:
+    python -m app.cli.indexes
+"""
+
+import asyncio
+
+import asyncpg
+
+from app.infrastructure.database.indexes import ensure_indexes
+from app.infrastructure.database.setup_db import DATABASE_URL
+
+
+async def run() -> None:
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        await ensure_indexes(conn)
+    finally:
+        await conn.close()
+
+
+def main() -> None:
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
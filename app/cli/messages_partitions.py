@@ -0,0 +1,52 @@
+"""Обслуживание месячных партиций ``messages`` и архива истории.
+
+Запуск:
+    python -m app.cli.messages_partitions migrate   # перевести существующую таблицу на партиции
+    python -m app.cli.messages_partitions ensure    # создать партиции на ближайшие месяцы
+    python -m app.cli.messages_partitions archive   # выгрузить холодные партиции в архив
+    python -m app.cli.messages_partitions status    # партиции и число строк в них
+"""
+
+import argparse
+import asyncio
+
+import asyncpg
+
+from app.infrastructure.database.partitions import ensure_partitions, list_partitions, migrate_to_partitioned
+from app.infrastructure.database.setup_db import DATABASE_URL
+from app.infrastructure.services.message_archive import message_archiver
+
+
+async def status(conn: asyncpg.Connection) -> None:
+    for name, upper in await list_partitions(conn):
+        rows = await conn.fetchval(f"SELECT COUNT(*) FROM {name}")
+        print(f"{name:<24} до {upper.isoformat():<28} строк: {rows}")
+    archived = await conn.fetchrow(
+        "SELECT COUNT(DISTINCT period_start) AS months, COALESCE(SUM(message_count), 0) AS rows FROM message_archives"
+    )
+    print(f"В архиве: месяцев {archived['months']}, строк {archived['rows']}")
+
+
+async def run(command: str) -> None:
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        if command == "migrate":
+            await migrate_to_partitioned(conn)
+        elif command == "ensure":
+            await ensure_partitions(conn)
+        elif command == "archive":
+            await message_archiver.run_once(conn)
+        else:
+            await status(conn)
+    finally:
+        await conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Партиции и архив таблицы messages")
+    parser.add_argument("command", choices=("migrate", "ensure", "archive", "status"))
+    asyncio.run(run(parser.parse_args().command))
+
+
+if __name__ == "__main__":
+    main()
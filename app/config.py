@@ -10,7 +10,6 @@ class Settings(BaseSettings):
     telegram_bot_token: str
     openai_api_key: str
     webhook_url: str
-    FREE_MESSAGE_LIMIT: int = 20
 
     # Настройки базы данных
     db_host: str = "db"
@@ -19,12 +18,91 @@ class Settings(BaseSettings):
     db_pass: str = "postgres"
     db_name: str = "neuze_bot"
 
+    # Пул соединений Postgres
+    db_pool_min_size: int = 1
+    db_pool_max_size: int = 10
+    db_pool_acquire_timeout: float = 10.0
+    db_statement_timeout_ms: int = 30000
+    db_statement_cache_size: int = 100
+    db_connect_attempts: int = 30
+
+    # Реплика для чтений (пусто — всё читается с primary)
+    db_replica_host: Optional[str] = None
+    db_replica_port: int = 5432
+    db_replica_max_lag: float = 2.0
+    db_replica_check_interval: float = 5.0
+    db_read_your_writes_window: float = 5.0
+
     # Настройки Redis
     redis_host: str = "redis"
     redis_port: int = 6379
     redis_db: int = 0
     redis_password: Optional[str] = None
 
+    # Интервал обновления профиля бота (get_me), секунды
+    bot_info_refresh_interval: int = 3600
+
+    # Лимиты исходящих запросов к Telegram
+    telegram_global_rate: float = 30.0
+    telegram_chat_rate: float = 1.0
+    telegram_chat_burst: float = 3.0
+    telegram_group_rate_per_minute: float = 20.0
+    telegram_max_retries: int = 3
+
+    # Рассылки из админ-панели
+    broadcast_workers: int = 20
+    broadcast_page_size: int = 500
+
+    # Партиции сообщений по месяцам и архив холодных месяцев
+    messages_hot_months: int = 3
+    messages_archive_dir: str = "archive/messages"
+    messages_archive_interval: int = 86400
+
+    # Отложенная запись сообщений через Redis Stream
+    message_write_behind: bool = False
+    message_flush_batch_size: int = 500
+    message_flush_interval: float = 0.5
+
+    # Фоновые задачи после ответа: воркеры, повторы, ожидание при остановке, очередь в Redis Stream
+    task_runner_concurrency: int = 4
+    task_runner_queue_size: int = 1000
+    task_runner_max_retries: int = 3
+    task_runner_drain_timeout: float = 10.0
+    task_runner_durable: bool = False
+    task_runner_poll_interval: float = 0.5
+
+    # Учёт расхода OpenAI: интервал сброса счётчиков из Redis в Postgres, секунды
+    openai_usage_flush_interval: float = 60.0
+
+    # Частичный ответ GPT при отмене новым сообщением или кнопкой: discard — удалить, store — сохранить
+    gpt_cancelled_output: str = "discard"
+    # Сколько секунд ждать короткий (brief) ответ, прежде чем показать «Думаю...»; 0 — не ждать
+    gpt_fast_reply_window: float = 1.5
+
+    # Антифлуд: сообщений за окно по планам, автобан после повторных превышений
+    flood_window_seconds: float = 10.0
+    flood_limit_free: int = 5
+    flood_limit_pro: int = 10
+    flood_limit_vip: int = 15
+    flood_strikes_to_ban: int = 3
+    flood_strike_window: int = 600
+    flood_ban_minutes: int = 30
+
+    # Квоты токенов OpenAI по планам: «окно_в_секундах:токенов» через запятую, пусто — без ограничений
+    token_quota_free: str = "3600:8000,86400:30000"
+    token_quota_pro: str = "3600:60000,86400:400000"
+    token_quota_vip: str = ""
+    # Прибавка к каждому окну за приглашённого друга
+    token_quota_referral_bonus: int = 5000
+
+    # Трассировка: none (только trace id в логах), console или file
+    tracing_exporter: str = "none"
+    tracing_file: str = "traces.jsonl"
+    tracing_sample_ratio: float = 1.0
+
+    # Сценарии диалогов (core/triggers/scenarios.json)
+    scenarios_enabled: bool = False
+
     # Настройки YouMoney
     yoomoney_shop_id: str
     yoomoney_secret_key: str
@@ -1,9 +1,11 @@
 from dataclasses import dataclass
+from decimal import Decimal
 
 @dataclass
 class SubscriptionPlan:
+    id: int
     name: str
     description: str
-    price_usd: float
+    price_usd: Decimal
     duration_days: int
-    is_active: bool
\ No newline at end of file
+    is_active: bool
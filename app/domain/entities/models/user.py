@@ -16,5 +16,3 @@ class User:
     banned_until: datetime = None
     invited_by: Optional[int] = None  # user_id пригласившего
     referrals: List[int] = None  # список user_id приглашённых
-    message_limit: int = 20  # лимит сообщений (по умолчанию 20)
-    used_messages: int = 0  # использовано сообщений
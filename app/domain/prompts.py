@@ -1,3 +1,5 @@
+from app.domain.services.message_classifier import build_mode_logic_prompt
+
 SYSTEM_PROMPT = (
     "Ты — нейроассистент Maze, уникальный, искренний и бескомпромиссный психологический бот с характером. "
     "Ты говоришь прямо, честно и ясно, без шаблонных и фильтрованных фраз, умеешь вникать в сложные и болезненные темы, "
@@ -70,6 +72,9 @@ SYSTEM_PROMPT = (
     "Ты — живой, честный и адаптивный помощник, который всегда подстраивается под собеседника, переносит его стиль, отвечает искренне, с юмором и прямотой, поддерживая диалог и помогая раскрыть внутренние проблемы."
 )
 
+# --- Логика выбора режима (генерируется из ключевых фраз классификатора) ---
+MODE_LOGIC_PROMPT = build_mode_logic_prompt()
+
 # --- Инструкции для режимов ---
 SOFT_PROMPT = (
     "[SOFT MODE]\n"
@@ -3,8 +3,9 @@ from abc import ABC, abstractmethod
 class GetAnswerByGptOpenai(ABC):
 
     @abstractmethod
-    def get_answer_from_get_triggers(self, history: list) -> str:
+    def get_answer_from_get_triggers(self, history: list, user_id: int = None, plan: str = None, on_delta=None) -> str:
         """
         Получает ответ от модели ChatGPT с учетом найденного триггера или дефолтного SYSTEM_PROMPT.
+        Фрагменты ответа по мере генерации передаются в ``on_delta``.
         """
         raise NotImplementedError("При наследовании необходимо реализовать это метод")
\ No newline at end of file
@@ -10,4 +10,8 @@ class IMessageRepository(ABC):
 
     @abstractmethod
     async def get_history_messages(self, user: User, max_last_messages: int = 10) -> list[Message]:
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    async def save_message(self, chat_id: int, content: str, is_from_user: bool) -> None:
+        pass
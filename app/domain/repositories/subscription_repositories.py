@@ -5,7 +5,7 @@ from app.domain.entities.models.user import User
 class ISubscriptionRepository(ABC):
 
     @abstractmethod
-    async def check_subscription_status_by_user(self, user: User) -> tuple[str, int]:
+    async def check_subscription_status_by_user(self, user: User) -> str:
         """Проверяет статус подписки пользователя"""
         raise NotImplementedError("При наследовании необходимо реализовать это метод")
 
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from datetime import datetime
 
 from app.domain.entities.models.user import User
 
@@ -25,6 +26,11 @@ class IUserRepository(ABC):
         """Удалить пользователя из админов"""
         raise NotImplementedError("При наследовании необходимо реализовать это метод")
 
+    @abstractmethod
+    async def ban_until(self, telegram_id: int, until: datetime) -> None:
+        """Временно забанить пользователя"""
+        raise NotImplementedError("При наследовании необходимо реализовать это метод")
+
     @abstractmethod
     async def get_admins(self) -> list[User]:
         """Получить всех админов"""
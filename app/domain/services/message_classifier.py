@@ -0,0 +1,106 @@
+import re
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Tuple
+
+# Единый источник ключевых фраз: из них собирается и регулярка классификатора,
+# и текст system prompt с логикой выбора режима.
+HARD_KEYWORDS: Tuple[str, ...] = (
+    "кричит", "запрещает", "унижает", "обесценивает",
+    "игнорирует", "молчание", "терплю", "угрожает",
+    "он сказал что без него я никто", "он давит", "он контролирует",
+)
+SELF_BLAME_KEYWORDS: Tuple[str, ...] = (
+    "я сама виновата", "это я всё накрутила", "я прошу слишком много",
+)
+
+REASON_HARD_KEYWORD = "hard_keyword"
+REASON_SELF_BLAME = "self_blame"
+REASON_SHORT_TEXT = "short_text"
+REASON_EXCLAMATIONS = "exclamations"
+REASON_CAPS = "caps"
+
+BRIEF_MAX_LENGTH = 20
+MAX_EXCLAMATIONS = 2
+
+
+@dataclass
+class Classification:
+    mode: str
+    reply_type: str
+    matched_keywords: List[str] = field(default_factory=list)
+    reasons: List[str] = field(default_factory=list)
+
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+
+class MessageClassifier:
+    """Определяет режим (soft/hard) и тип ответа (brief/long) за один проход.
+
+    Все ключевые фразы собраны в одну регулярку-альтернацию (длинные фразы
+    раньше коротких), поэтому текст сканируется один раз вне зависимости от
+    числа ключевых слов.
+    """
+
+    def __init__(self, groups: Dict[str, Tuple[str, ...]] = None):
+        self.groups = groups or {
+            REASON_HARD_KEYWORD: HARD_KEYWORDS,
+            REASON_SELF_BLAME: SELF_BLAME_KEYWORDS,
+        }
+        self._reason_by_keyword: Dict[str, str] = {
+            kw: reason for reason, keywords in self.groups.items() for kw in keywords
+        }
+        alternation = "|".join(
+            re.escape(kw) for kw in sorted(self._reason_by_keyword, key=len, reverse=True)
+        )
+        self._pattern = re.compile(alternation)
+
+    def classify(self, user_text: str) -> Classification:
+        text = user_text or ""
+        matched: List[str] = []
+        reasons: List[str] = []
+        for m in self._pattern.finditer(text.lower()):
+            kw = m.group(0)
+            if kw not in matched:
+                matched.append(kw)
+                reason = self._reason_by_keyword[kw]
+                if reason not in reasons:
+                    reasons.append(reason)
+        mode = "hard" if matched else "soft"
+
+        text_len = len(text.strip())
+        if text_len < BRIEF_MAX_LENGTH:
+            reasons.append(REASON_SHORT_TEXT)
+        if text.count("!") > MAX_EXCLAMATIONS:
+            reasons.append(REASON_EXCLAMATIONS)
+        if text.isupper() and text_len > 5:
+            reasons.append(REASON_CAPS)
+        is_brief = any(r in reasons for r in (REASON_SHORT_TEXT, REASON_EXCLAMATIONS, REASON_CAPS))
+
+        return Classification(
+            mode=mode,
+            reply_type="brief" if is_brief else "long",
+            matched_keywords=matched,
+            reasons=reasons,
+        )
+
+
+def build_mode_logic_prompt() -> str:
+    """Текст system prompt с логикой выбора режима из тех же ключевых фраз."""
+    def _quoted(keywords: Tuple[str, ...]) -> str:
+        return ", ".join(f"'{kw}'" for kw in keywords)
+
+    return (
+        "ЛОГИКА ОПРЕДЕЛЕНИЯ РЕЖИМА:\n\n"
+        "1. По умолчанию используй мягкий режим (SOFT).\n"
+        "2. Если текст пользователя содержит следующие слова или фразы:\n"
+        f"  - {_quoted(HARD_KEYWORDS)},\n"
+        "  то переключайся на жёсткий режим (HARD).\n"
+        "3. Если в тексте есть фразы:\n"
+        f"  - {_quoted(SELF_BLAME_KEYWORDS)},\n"
+        "  то включай жёсткий режим (HARD) с мягким рефреймингом."
+    )
+
+
+# Глобальный экземпляр классификатора
+message_classifier = MessageClassifier()
@@ -0,0 +1,80 @@
+"""Индексы, которые Tortoise не умеет описывать в моделях (функциональные, trigram).
+
+``generate_schemas`` создаёт только таблицы и простые индексы, поэтому эти
+индексы строит отдельный шаг развёртывания
+``python -m app.cli.indexes`` — не старт приложения: на больших ``messages``
+и ``users`` построение идёт долго. Индексы строятся ``CONCURRENTLY`` (без
+блокировки записи) на отдельном соединении вне транзакции и без
+``statement_timeout``. Выражение ``UPPER(CAST(username AS VARCHAR))``
+совпадает с тем, что Tortoise генерирует для
+``username__iexact``/``__istartswith``/``__icontains``, иначе планировщик не
+подберёт индекс.
+"""
+
+from typing import List, Tuple
+
+import asyncpg
+
+from app.infrastructure.logging.setup_logger import logger
+
+POSTGRES_INDEXES: List[Tuple[str, str, str]] = [
+    # Точный и префиксный поиск по username без учёта регистра
+    (
+        "users_username_upper_idx",
+        "users",
+        "((UPPER(CAST(username AS VARCHAR))) varchar_pattern_ops)",
+    ),
+    # История пользователя в админке: keyset по (created_at, id) внутри чата
+    (
+        "messages_chat_created_id_idx",
+        "messages",
+        "(chat_id, created_at DESC, id DESC)",
+    ),
+]
+
+TRIGRAM_INDEXES: List[Tuple[str, str, str]] = [
+    # Поиск по подстроке (username__icontains)
+    (
+        "users_username_trgm_idx",
+        "users",
+        "USING gin ((UPPER(CAST(username AS VARCHAR))) gin_trgm_ops)",
+    ),
+]
+
+
+async def _create_index(conn: asyncpg.Connection, name: str, table: str, definition: str) -> None:
+    valid = await conn.fetchval(
+        "SELECT i.indisvalid FROM pg_index i WHERE i.indexrelid = to_regclass($1)", name
+    )
+    if valid:
+        return
+    if valid is not None:
+        # Прерванное CONCURRENTLY оставляет невалидный индекс, который IF NOT EXISTS пропустил бы
+        logger.warning(f"[DB] Индекс {name} невалиден, строим заново")
+        await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    partitioned = await conn.fetchval(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass($1))", table
+    )
+    if partitioned:
+        # CONCURRENTLY на партиционированной таблице не поддерживается; индекс создаёт messages_partitions migrate
+        logger.warning(f"[DB] {table} партиционирована, индекс {name} пропущен")
+        return
+    logger.info(f"[DB] Строим индекс {name}")
+    await conn.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}")
+
+
+async def ensure_indexes(conn: asyncpg.Connection) -> None:
+    """Построить недостающие индексы. ``conn`` — отдельное соединение без открытой транзакции."""
+    # Построение может идти дольше statement_timeout приложения
+    await conn.execute("SET statement_timeout = 0")
+    for index in POSTGRES_INDEXES:
+        await _create_index(conn, *index)
+    try:
+        await conn.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except asyncpg.PostgresError as e:
+        # Расширение может быть недоступно без прав суперпользователя
+        logger.warning(f"[DB] pg_trgm недоступен, trigram-индексы пропущены: {e}")
+    else:
+        for index in TRIGRAM_INDEXES:
+            await _create_index(conn, *index)
+    logger.info("[DB] Индексы проверены")
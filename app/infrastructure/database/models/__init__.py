@@ -2,16 +2,23 @@
 from .user import UserModel
 from .chat import ChatModel
 from .message import MessageModel
+from .message_archive import MessageArchiveModel
 from .subscribe import SubscriptionModel, SubscriptionPlanModel
 from .payment import PaymentModel, PaymentStatus, PaymentProvider
+from .broadcast import BroadcastModel, BroadcastDeliveryModel
+from .usage import OpenAIUsageDailyModel
 
 __all__ = [
     "UserModel",
     "ChatModel", 
     "MessageModel",
+    "MessageArchiveModel",
     "SubscriptionModel",
     "SubscriptionPlanModel",
     "PaymentModel",
     "PaymentStatus",
-    "PaymentProvider"
+    "PaymentProvider",
+    "BroadcastModel",
+    "BroadcastDeliveryModel",
+    "OpenAIUsageDailyModel",
 ]
@@ -0,0 +1,62 @@
+import enum
+
+from tortoise import models, fields
+
+
+class BroadcastSegment(str, enum.Enum):
+    ALL = "all"
+    FREE = "free"
+    PRO = "pro"
+    VIP = "vip"
+    VIP_EXPIRING = "vip_expiring"
+
+
+class BroadcastStatus(str, enum.Enum):
+    DRAFT = "draft"
+    RUNNING = "running"
+    FINISHED = "finished"
+    CANCELLED = "cancelled"
+
+
+class DeliveryStatus(str, enum.Enum):
+    SENT = "sent"
+    BLOCKED = "blocked"
+    DELETED = "deleted"
+    FAILED = "failed"
+
+
+class BroadcastModel(models.Model):
+    """Рассылка из админ-панели"""
+
+    id = fields.IntField(pk=True)
+    text = fields.TextField()
+    segment = fields.CharEnumField(BroadcastSegment, max_length=20, default=BroadcastSegment.ALL)
+    status = fields.CharEnumField(BroadcastStatus, max_length=20, default=BroadcastStatus.DRAFT)
+    created_by = fields.BigIntField()
+    total = fields.IntField(default=0)
+    sent = fields.IntField(default=0)
+    blocked = fields.IntField(default=0)
+    deleted = fields.IntField(default=0)
+    failed = fields.IntField(default=0)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    started_at = fields.DatetimeField(null=True)
+    finished_at = fields.DatetimeField(null=True)
+
+    class Meta:
+        table = "broadcasts"
+        ordering = ["-created_at"]
+
+
+class BroadcastDeliveryModel(models.Model):
+    """Результат доставки рассылки конкретному получателю"""
+
+    id = fields.BigIntField(pk=True)
+    broadcast = fields.ForeignKeyField("models.BroadcastModel", related_name="deliveries")
+    telegram_id = fields.BigIntField()
+    status = fields.CharEnumField(DeliveryStatus, max_length=10)
+    error = fields.CharField(max_length=255, null=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        table = "broadcast_deliveries"
+        unique_together = (("broadcast", "telegram_id"),)
@@ -14,4 +14,5 @@ class MessageModel(models.Model):
     out_of_scope = fields.BooleanField(default=False)
 
     class Meta:
+        # В Postgres таблица партиционирована по месяцам created_at, см. database/partitions.py
         table = "messages"
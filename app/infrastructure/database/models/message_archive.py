@@ -0,0 +1,19 @@
+from tortoise import models, fields
+
+
+class MessageArchiveModel(models.Model):
+    """Указатель на архив месячной партиции сообщений для конкретного чата"""
+
+    id = fields.BigIntField(pk=True)
+    chat = fields.ForeignKeyField("models.ChatModel", related_name="message_archives")
+    period_start = fields.DateField(description="Первый день месяца партиции")
+    storage_key = fields.CharField(max_length=255, description="Ключ файла в хранилище архивов")
+    message_count = fields.IntField()
+    user_message_count = fields.IntField()
+    first_message_at = fields.DatetimeField()
+    last_message_at = fields.DatetimeField()
+    archived_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        table = "message_archives"
+        unique_together = (("chat", "period_start"),)
@@ -0,0 +1,22 @@
+from tortoise import models, fields
+
+
+class OpenAIUsageDailyModel(models.Model):
+    """Дневной расход OpenAI по пользователю, плану и модели (агрегаты журнала usage_ledger)"""
+
+    id = fields.BigIntField(pk=True)
+    day = fields.DateField()
+    # Без внешнего ключа: расход удалённого пользователя остаётся в учёте
+    user_id = fields.BigIntField(index=True)
+    plan = fields.CharField(max_length=10, description="План пользователя на момент запроса")
+    model_name = fields.CharField(max_length=64)
+    requests = fields.IntField(default=0)
+    prompt_tokens = fields.BigIntField(default=0)
+    completion_tokens = fields.BigIntField(default=0)
+    cached_tokens = fields.BigIntField(default=0, description="Часть prompt_tokens из кэша промптов")
+    latency_ms = fields.BigIntField(default=0, description="Суммарная длительность запросов")
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "openai_usage_daily"
+        unique_together = (("day", "user_id", "plan", "model_name"),)
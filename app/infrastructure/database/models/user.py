@@ -14,6 +14,7 @@ class UserModel(models.Model):
     banned_until = fields.DatetimeField(null=True)
     invited_by = fields.ForeignKeyField('models.UserModel', related_name='referrals_from', null=True)
     referrals = fields.JSONField(default=list)
+    # Не используются: лимиты заменены квотами токенов (redis/token_quota.py), колонки оставлены для старых БД
     message_limit = fields.IntField(default=20)
     used_messages = fields.IntField(default=0)
     created_at = fields.DatetimeField(auto_now_add=True)
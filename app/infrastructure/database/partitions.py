@@ -0,0 +1,154 @@
+"""Месячные партиции таблицы ``messages``.
+
+``messages`` — декларативно партиционированная по ``created_at`` таблица
+(``PARTITION BY RANGE``), одна партиция на календарный месяц UTC:
+``messages_2026_10`` хранит ``[2026-10-01, 2026-11-01)``. Первичный ключ
+партиционированной таблицы обязан включать ключ партиционирования, поэтому
+он ``(id, created_at)``; для ORM ``id`` по-прежнему уникален (serial).
+
+Существующая обычная таблица переводится командой
+``python -m app.cli.messages_partitions migrate`` без долгой блокировки:
+старая таблица целиком становится партицией ``messages_legacy`` на диапазон
+``[MINVALUE, X)``, новые месяцы получают собственные партиции. Когда
+``messages_legacy`` целиком выходит из горячего окна, архиватор выгружает
+её помесячно так же, как обычные партиции.
+"""
+
+import re
+from datetime import date, datetime, timezone
+from typing import List, Optional, Tuple
+
+import asyncpg
+
+from app.config import settings
+from app.infrastructure.logging.setup_logger import logger
+
+PARENT_TABLE = "messages"
+LEGACY_PARTITION = "messages_legacy"
+MONTHS_AHEAD = 2
+
+_UPPER_BOUND_RE = re.compile(r"TO \('([^']+)'\)")
+
+
+def month_start(value: datetime | date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _bound(month: date) -> str:
+    return f"{month.isoformat()} 00:00:00+00"
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_{month.year:04d}_{month.month:02d}"
+
+
+def hot_window_start(now: Optional[datetime] = None) -> datetime:
+    """Начало горячего окна: первый день самого старого из ``messages_hot_months`` месяцев."""
+    current = month_start(now or datetime.now(timezone.utc))
+    first = add_months(current, -(max(settings.messages_hot_months, 1) - 1))
+    return datetime(first.year, first.month, 1, tzinfo=timezone.utc)
+
+
+async def is_partitioned(conn: asyncpg.Connection) -> bool:
+    return await conn.fetchval(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass($1))", PARENT_TABLE
+    )
+
+
+async def list_partitions(conn: asyncpg.Connection) -> List[Tuple[str, datetime]]:
+    """Партиции ``messages`` и верхняя граница каждой, от старых к новым."""
+    rows = await conn.fetch(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) AS bound "
+        "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass($1)",
+        PARENT_TABLE,
+    )
+    partitions = []
+    for row in rows:
+        match = _UPPER_BOUND_RE.search(row["bound"])
+        if match:
+            partitions.append((row["relname"], datetime.fromisoformat(match.group(1))))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+async def ensure_partitions(conn: asyncpg.Connection, since: Optional[date] = None) -> None:
+    """Создать месячные партиции от ``since`` (или текущего месяца) до ``MONTHS_AHEAD`` вперёд."""
+    if not await is_partitioned(conn):
+        return
+    covered_until = max((upper for _, upper in await list_partitions(conn)), default=None)
+    month = since or month_start(datetime.now(timezone.utc))
+    if covered_until:
+        month = max(month, month_start(covered_until))
+    last = add_months(month_start(datetime.now(timezone.utc)), MONTHS_AHEAD)
+    while month <= last:
+        name = partition_name(month)
+        await conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT_TABLE} "
+            f"FOR VALUES FROM ('{_bound(month)}') TO ('{_bound(add_months(month, 1))}')"
+        )
+        month = add_months(month, 1)
+
+
+async def migrate_to_partitioned(conn: asyncpg.Connection) -> None:
+    """Перевести обычную ``messages`` в партиционированную, сохранив данные.
+
+    Долгие шаги (валидация CHECK, построение индекса) выполняются без
+    эксклюзивной блокировки; подмена таблиц — одна короткая транзакция.
+    """
+    if await is_partitioned(conn):
+        logger.info("[PARTITIONS] messages уже партиционирована")
+        await ensure_partitions(conn)
+        return
+
+    # Всё, что уже есть и успеет прийти во время миграции, лежит левее cutoff
+    cutoff = add_months(month_start(datetime.now(timezone.utc)), MONTHS_AHEAD)
+    logger.info(f"[PARTITIONS] Подготовка messages к партиционированию, граница {cutoff}")
+    await conn.execute(
+        f"ALTER TABLE {PARENT_TABLE} ADD CONSTRAINT {LEGACY_PARTITION}_range "
+        f"CHECK (created_at < '{_bound(cutoff)}') NOT VALID"
+    )
+    # VALIDATE не блокирует чтение и запись, а ATTACH потом не сканирует таблицу
+    await conn.execute(f"ALTER TABLE {PARENT_TABLE} VALIDATE CONSTRAINT {LEGACY_PARTITION}_range")
+    await conn.execute(
+        f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {LEGACY_PARTITION}_pkey_new "
+        f"ON {PARENT_TABLE} (id, created_at)"
+    )
+    sequence = await conn.fetchval("SELECT pg_get_serial_sequence($1, 'id')", PARENT_TABLE)
+
+    async with conn.transaction():
+        await conn.execute(f"LOCK TABLE {PARENT_TABLE} IN ACCESS EXCLUSIVE MODE")
+        await conn.execute(f"ALTER TABLE {PARENT_TABLE} RENAME TO {LEGACY_PARTITION}")
+        await conn.execute(f"ALTER TABLE {LEGACY_PARTITION} DROP CONSTRAINT {PARENT_TABLE}_pkey")
+        await conn.execute(
+            f"ALTER TABLE {LEGACY_PARTITION} ADD CONSTRAINT {LEGACY_PARTITION}_pkey "
+            f"PRIMARY KEY USING INDEX {LEGACY_PARTITION}_pkey_new"
+        )
+        await conn.execute(
+            f"ALTER INDEX IF EXISTS messages_chat_created_id_idx RENAME TO {LEGACY_PARTITION}_chat_created_id_idx"
+        )
+        await conn.execute(
+            f"CREATE TABLE {PARENT_TABLE} (LIKE {LEGACY_PARTITION} INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE (created_at)"
+        )
+        await conn.execute(f"ALTER TABLE {PARENT_TABLE} ADD CONSTRAINT {PARENT_TABLE}_pkey PRIMARY KEY (id, created_at)")
+        await conn.execute(
+            f"ALTER TABLE {PARENT_TABLE} ADD CONSTRAINT {PARENT_TABLE}_chat_id_fkey "
+            f"FOREIGN KEY (chat_id) REFERENCES chats (id) ON DELETE CASCADE"
+        )
+        await conn.execute(
+            f"CREATE INDEX messages_chat_created_id_idx ON {PARENT_TABLE} (chat_id, created_at DESC, id DESC)"
+        )
+        if sequence:
+            await conn.execute(f"ALTER SEQUENCE {sequence} OWNED BY {PARENT_TABLE}.id")
+        await conn.execute(
+            f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {LEGACY_PARTITION} "
+            f"FOR VALUES FROM (MINVALUE) TO ('{_bound(cutoff)}')"
+        )
+        await conn.execute(f"ALTER TABLE {LEGACY_PARTITION} DROP CONSTRAINT {LEGACY_PARTITION}_range")
+        await ensure_partitions(conn, since=cutoff)
+    logger.info(f"[PARTITIONS] messages партиционирована, старые данные в {LEGACY_PARTITION}")
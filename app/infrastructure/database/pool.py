@@ -0,0 +1,112 @@
+"""Пул соединений Postgres с метриками и таймаутом ожидания.
+
+Модуль подключается как ``engine`` в ``TORTOISE_ORM``: Tortoise берёт из
+него ``client_class``. Клиент — обычный asyncpg-клиент Tortoise: пул создаёт
+``asyncpg.create_pool``, а клиент хранит его в обёртке ``InstrumentedPool``,
+поэтому каждое ``acquire`` (в том числе внутри ``in_transaction``) ограничено
+``db_pool_acquire_timeout`` и попадает в метрики занятости пула и времени
+ожидания соединения. Каждый запрос
+соединения учитывается в ``db_query_seconds``, в счётчиках текущего апдейта
+и, если апдейт трассируется, span'ом ``db.query``.
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+import asyncpg
+from tortoise.backends.asyncpg.client import AsyncpgDBClient
+
+from app.infrastructure.logging.setup_logger import logger
+from app.infrastructure.metrics.pipeline import record_db_query
+from app.infrastructure.metrics.registry import registry
+from app.infrastructure.tracing import tracer
+
+POOL_IN_USE = registry.gauge(
+    "db_pool_connections_in_use", "Соединения пула, выданные приложению", ["connection"]
+)
+POOL_SIZE = registry.gauge("db_pool_connections", "Открытые соединения пула", ["connection"])
+POOL_WAITING = registry.gauge(
+    "db_pool_acquire_waiting", "Корутины, ожидающие соединение из пула", ["connection"]
+)
+POOL_ACQUIRE = registry.histogram(
+    "db_pool_acquire_seconds",
+    "Время ожидания соединения из пула",
+    ["connection"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+POOL_ACQUIRE_TIMEOUTS = registry.counter(
+    "db_pool_acquire_timeouts_total", "Запросы, не дождавшиеся соединения из пула", ["connection"]
+)
+
+
+# Запрос сброса, который asyncpg выполняет при возврате соединения в пул, собирается из этих
+# операторов (набор зависит от возможностей сервера) — служебный, его не считаем
+RESET_STATEMENTS = ("SELECT pg_advisory_unlock_all();", "CLOSE ALL;", "UNLISTEN *;", "RESET ALL;")
+
+
+class InstrumentedPool:
+    """Обёртка над ``asyncpg.Pool``: Tortoise берёт и возвращает соединения через ``acquire``/``release``.
+
+    Остальные методы пула (``close``, ``terminate``, ``expire_connections``) проксируются как есть.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, name: str, acquire_timeout: Optional[float] = None):
+        self._pool = pool
+        self.name = name
+        self.acquire_timeout = acquire_timeout
+
+    def __getattr__(self, item):
+        return getattr(self._pool, item)
+
+    async def acquire(self, *, timeout: Optional[float] = None) -> asyncpg.Connection:
+        started = time.monotonic()
+        POOL_WAITING.inc(connection=self.name)
+        try:
+            connection = await self._pool.acquire(timeout=timeout if timeout is not None else self.acquire_timeout)
+        except asyncio.TimeoutError:
+            POOL_ACQUIRE_TIMEOUTS.inc(connection=self.name)
+            logger.warning(f"[DB] {self.name}: не дождались соединения из пула за {self.acquire_timeout}s")
+            raise
+        finally:
+            POOL_WAITING.dec(connection=self.name)
+        POOL_ACQUIRE.observe(time.monotonic() - started, connection=self.name)
+        POOL_IN_USE.inc(connection=self.name)
+        POOL_SIZE.set(self._pool.get_size(), connection=self.name)
+        return connection
+
+    async def release(self, connection, *, timeout: Optional[float] = None) -> None:
+        try:
+            await self._pool.release(connection, timeout=timeout)
+        finally:
+            POOL_IN_USE.dec(connection=self.name)
+            POOL_SIZE.set(self._pool.get_size(), connection=self.name)
+
+
+class InstrumentedAsyncpgClient(AsyncpgDBClient):
+    async def create_pool(self, **kwargs) -> InstrumentedPool:
+        acquire_timeout = kwargs.pop("acquire_timeout", None)
+        kwargs["init"] = self._connection_init(kwargs.get("init"))
+        pool = await super().create_pool(**kwargs)
+        POOL_SIZE.set(pool.get_size(), connection=self.connection_name)
+        return InstrumentedPool(pool, self.connection_name, acquire_timeout)
+
+    def _connection_init(self, user_init):
+        name = self.connection_name
+
+        async def init(conn: asyncpg.Connection) -> None:
+            def log_query(record) -> None:
+                if not record.query.startswith(RESET_STATEMENTS):
+                    record_db_query(name, record.elapsed)
+                    # Колбэк вызывается через call_soon с копией контекста запроса — span попадёт в его трассу
+                    tracer.record("db.query", record.elapsed, connection=name, statement=record.query[:200])
+
+            conn.add_query_logger(log_query)
+            if user_init:
+                await user_init(conn)
+
+        return init
+
+
+# Точка входа для engine в конфигурации Tortoise
+client_class = InstrumentedAsyncpgClient
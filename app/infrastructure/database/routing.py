@@ -0,0 +1,197 @@
+"""Чтение с реплики Postgres на уровне репозиториев.
+
+Если задан ``settings.db_replica_host``, в ``TORTOISE_ORM`` появляется
+соединение ``replica``, а репозитории выполняют чтения через
+``db_router.read(query, telegram_id)``:
+
+- запись по пользователю (post_save/post_delete моделей ниже) помечает его
+  на ``db_read_your_writes_window`` секунд — локально и в Redis для других
+  воркеров; его чтения в это окно идут на primary. ``QuerySet.update()`` и
+  сырые запросы сигналов не шлют — такие места вызывают ``mark_write`` сами
+  (сброс подписки в админке, ``message_buffer``). Без отметки остаются
+  офлайн-операции без пользователя в контексте: ``cli/bulk_io``,
+  ``cli/backfill_topics``, архивация холодных месяцев;
+- фоновая проверка раз в ``db_replica_check_interval`` секунд меряет
+  отставание реплики; при отставании больше ``db_replica_max_lag`` или
+  ошибке все чтения уходят на primary, пока реплика не догонит;
+- ошибка соединения с репликой во время запроса повторяется на primary.
+
+Чтение, за которым следует ``save()`` той же модели, должно идти через
+primary, иначе можно записать устаревшие поля.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+import asyncpg
+from tortoise import Tortoise
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.exceptions import DBConnectionError, OperationalError
+from tortoise.signals import Signals
+
+from app.config import settings
+from app.infrastructure.logging.setup_logger import logger
+from app.infrastructure.metrics.registry import registry
+from app.infrastructure.redis.redis_client import redis_client
+
+T = TypeVar("T")
+
+PRIMARY = "default"
+REPLICA = "replica"
+RECENT_WRITE_KEY = "ryw:{telegram_id}"
+MAX_TRACKED_WRITES = 10000
+
+REPLICA_LAG = registry.gauge("db_replica_lag_seconds", "Отставание реплики по последней проверке")
+REPLICA_HEALTHY = registry.gauge("db_replica_healthy", "1 — чтения разрешены с реплики")
+READS = registry.counter("db_reads_total", "Чтения репозиториев по целевой БД", ["target"])
+
+REPLICA_ERRORS = (
+    OSError,
+    asyncio.TimeoutError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.InterfaceError,
+    DBConnectionError,
+    OperationalError,
+)
+
+LAG_QUERY = (
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END AS lag"
+)
+
+
+class ReadRouter:
+    def __init__(self):
+        self.enabled = bool(settings.db_replica_host)
+        self.replica_healthy = False
+        self._recent_writes: Dict[int, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def primary() -> BaseDBAsyncClient:
+        return Tortoise.get_connection(PRIMARY)
+
+    async def mark_write(self, telegram_id: Optional[int]) -> None:
+        """Ближайшие чтения этого пользователя — только с primary."""
+        if not self.enabled or not telegram_id:
+            return
+        window = settings.db_read_your_writes_window
+        now = time.monotonic()
+        if len(self._recent_writes) >= MAX_TRACKED_WRITES:
+            self._recent_writes = {uid: t for uid, t in self._recent_writes.items() if t > now}
+        self._recent_writes[telegram_id] = now + window
+        if redis_client.redis:
+            try:
+                await redis_client.redis.set(
+                    RECENT_WRITE_KEY.format(telegram_id=telegram_id), 1, px=int(window * 1000)
+                )
+            except Exception as e:
+                logger.warning(f"[DB_ROUTER] Не удалось отметить запись {telegram_id} в Redis: {e}")
+
+    async def _wrote_recently(self, telegram_id: int) -> bool:
+        if self._recent_writes.get(telegram_id, 0) > time.monotonic():
+            return True
+        if not redis_client.redis:
+            return False
+        try:
+            return bool(await redis_client.redis.exists(RECENT_WRITE_KEY.format(telegram_id=telegram_id)))
+        except Exception:
+            # Без Redis не можем доказать, что записи не было — читаем с primary
+            return True
+
+    async def connection_for_read(self, telegram_id: Optional[int] = None) -> BaseDBAsyncClient:
+        if not self.enabled or not self.replica_healthy:
+            return self.primary()
+        if telegram_id and await self._wrote_recently(telegram_id):
+            return self.primary()
+        return Tortoise.get_connection(REPLICA)
+
+    async def read(
+        self, query: Callable[[BaseDBAsyncClient], Awaitable[T]], telegram_id: Optional[int] = None
+    ) -> T:
+        """Выполнить чтение ``query(db)`` на реплике, если можно, иначе на primary."""
+        db = await self.connection_for_read(telegram_id)
+        if db.connection_name == PRIMARY:
+            READS.inc(target="primary")
+            return await query(db)
+        try:
+            result = await query(db)
+            READS.inc(target="replica")
+            return result
+        except REPLICA_ERRORS as e:
+            logger.warning(f"[DB_ROUTER] Реплика недоступна, читаем с primary: {e}")
+            self._set_healthy(False)
+            READS.inc(target="fallback")
+            return await query(self.primary())
+
+    def _set_healthy(self, healthy: bool) -> None:
+        if healthy != self.replica_healthy:
+            logger.info(f"[DB_ROUTER] Чтения с реплики {'включены' if healthy else 'отключены'}")
+        self.replica_healthy = healthy
+        REPLICA_HEALTHY.set(1 if healthy else 0)
+
+    async def check_replica(self) -> None:
+        try:
+            _, rows = await asyncio.wait_for(
+                Tortoise.get_connection(REPLICA).execute_query(LAG_QUERY), settings.db_replica_check_interval
+            )
+            lag = float(rows[0]["lag"])
+            REPLICA_LAG.set(lag)
+            self._set_healthy(lag <= settings.db_replica_max_lag)
+        except Exception as e:
+            logger.warning(f"[DB_ROUTER] Проверка реплики не удалась: {e}")
+            self._set_healthy(False)
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.db_replica_check_interval)
+            await self.check_replica()
+
+    async def start(self) -> None:
+        if not self.enabled:
+            return
+        register_write_tracking()
+        await self.check_replica()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def register_write_tracking() -> None:
+    """Отмечать записи по пользователю через сигналы моделей Tortoise."""
+    from app.infrastructure.database.models import (
+        MessageModel,
+        PaymentModel,
+        SubscriptionModel,
+        UserModel,
+    )
+
+    def listener(user_id_of: Callable):
+        async def on_write(sender, instance, *args, **kwargs) -> None:
+            await db_router.mark_write(user_id_of(instance))
+
+        return on_write
+
+    # Чат создаётся с id = telegram_id пользователя (см. MessageUseCase)
+    tracked = {
+        UserModel: lambda u: u.telegram_id,
+        SubscriptionModel: lambda s: s.user_id,
+        PaymentModel: lambda p: p.user_id,
+        MessageModel: lambda m: m.chat_id,
+    }
+    for model, user_id_of in tracked.items():
+        model.register_listener(Signals.post_save, listener(user_id_of))
+        model.register_listener(Signals.post_delete, listener(user_id_of))
+
+
+# Глобальный экземпляр
+db_router = ReadRouter()
@@ -3,16 +3,49 @@ from app.config import settings
 DATABASE_URL: str = \
     f"postgres://{settings.db_user}:{settings.db_pass}@{settings.db_host}:{settings.db_port}/{settings.db_name}"
 
+
+def _credentials(host: str, port: int) -> dict:
+    return {
+        "host": host,
+        "port": port,
+        "user": settings.db_user,
+        "password": settings.db_pass,
+        "database": settings.db_name,
+        "minsize": settings.db_pool_min_size,
+        "maxsize": settings.db_pool_max_size,
+        "acquire_timeout": settings.db_pool_acquire_timeout,
+        "statement_cache_size": settings.db_statement_cache_size,
+        "server_settings": {"statement_timeout": str(settings.db_statement_timeout_ms)},
+    }
+
+
+# Обычный asyncpg-клиент Tortoise с метриками пула, см. pool.py
+CONNECTIONS = {
+    "default": {
+        "engine": "app.infrastructure.database.pool",
+        "credentials": _credentials(settings.db_host, settings.db_port),
+    },
+}
+if settings.db_replica_host:
+    # Только для чтений через db_router (database/routing.py)
+    CONNECTIONS["replica"] = {
+        "engine": "app.infrastructure.database.pool",
+        "credentials": _credentials(settings.db_replica_host, settings.db_replica_port),
+    }
+
 TORTOISE_ORM = {
-    "connections": {"default": DATABASE_URL},
+    "connections": CONNECTIONS,
     "apps": {
         "models": {
             "models": [
                 "app.infrastructure.database.models.chat",
                 "app.infrastructure.database.models.message",
+                "app.infrastructure.database.models.message_archive",
                 "app.infrastructure.database.models.user",
                 "app.infrastructure.database.models.subscribe",
                 "app.infrastructure.database.models.payment",
+                "app.infrastructure.database.models.broadcast",
+                "app.infrastructure.database.models.usage",
             ],
             "default_connection": "default",
         },
@@ -0,0 +1,49 @@
+"""Проверки зависимостей для readiness-пробы и ожидания БД при старте."""
+
+import asyncio
+from typing import Dict
+
+import asyncpg
+from tortoise import Tortoise
+
+from app.infrastructure.database.setup_db import DATABASE_URL
+from app.infrastructure.logging.setup_logger import logger
+from app.infrastructure.redis.redis_client import redis_client
+
+CHECK_TIMEOUT = 2.0
+
+
+async def check_postgres() -> str:
+    try:
+        await asyncio.wait_for(Tortoise.get_connection("default").execute_query("SELECT 1"), CHECK_TIMEOUT)
+        return "ok"
+    except Exception as e:
+        return f"error: {type(e).__name__}: {e}"
+
+
+async def check_redis() -> str:
+    if not redis_client.redis:
+        return "error: not connected"
+    try:
+        await asyncio.wait_for(redis_client.redis.ping(), CHECK_TIMEOUT)
+        return "ok"
+    except Exception as e:
+        return f"error: {type(e).__name__}: {e}"
+
+
+async def readiness() -> Dict[str, str]:
+    postgres, redis = await asyncio.gather(check_postgres(), check_redis())
+    return {"postgres": postgres, "redis": redis}
+
+
+async def wait_for_postgres(attempts: int, delay: float = 1.0) -> None:
+    """Дождаться, пока Postgres начнёт принимать соединения (БД в compose стартует дольше бота)."""
+    for attempt in range(1, attempts + 1):
+        try:
+            connection = await asyncpg.connect(DATABASE_URL, timeout=CHECK_TIMEOUT)
+            await connection.close()
+            return
+        except (OSError, asyncio.TimeoutError, asyncpg.PostgresError) as e:
+            logger.warning(f"[DB] Postgres недоступен ({attempt}/{attempts}): {e}")
+            await asyncio.sleep(delay)
+    raise RuntimeError("Could not connect to database")
@@ -1,5 +1,17 @@
 import logging
 import sys
+from contextvars import ContextVar
+
+# ID трассы текущего апдейта (выставляет app.infrastructure.tracing)
+trace_id_var: ContextVar[str] = ContextVar("trace_id", default="-")
+
+
+class TraceIdFilter(logging.Filter):
+    """Добавляет в запись лога ``trace_id`` текущей трассы."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = trace_id_var.get()
+        return True
 
 
 def setup_logger(name: str = "my_logger", log_level: int = logging.INFO) -> logging.Logger:
@@ -15,13 +27,14 @@ def setup_logger(name: str = "my_logger", log_level: int = logging.INFO) -> logg
 
     # Создаем форматтер
     formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        "%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s",
         datefmt="%Y-%m-%d %H:%M:%S"
     )
 
     # Добавляем консольный обработчик (вывод в stderr)
     console_handler = logging.StreamHandler(sys.stderr)
     console_handler.setFormatter(formatter)
+    console_handler.addFilter(TraceIdFilter())
     logger.addHandler(console_handler)
 
     return logger
@@ -0,0 +1,101 @@
+"""Метрики конвейера обработки апдейта.
+
+``track_update()`` открывает счётчики текущего апдейта в ``ContextVar``:
+запросы к БД (см. ``database/pool.py``) прибавляются к ним из любого места
+обработки, а по завершении апдейта попадают в гистограммы «на апдейт».
+``timed_use_case`` меряет длительность use case'ов и админ-панели и
+открывает для них span трассы. ``record_fast_reply`` считает короткие ответы,
+отправленные без заглушки «Думаю...».
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+from typing import Iterator, Optional
+
+from app.infrastructure.metrics.registry import registry
+from app.infrastructure.tracing import tracer
+
+USE_CASE_SECONDS = registry.histogram(
+    "use_case_seconds", "Длительность use case по результату", ["use_case", "status"]
+)
+DB_QUERIES = registry.counter("db_queries_total", "Запросы к Postgres", ["connection"])
+DB_QUERY_SECONDS = registry.histogram(
+    "db_query_seconds",
+    "Длительность запроса к Postgres",
+    ["connection"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+UPDATE_DB_QUERIES = registry.histogram(
+    "telegram_update_db_queries",
+    "Запросы к Postgres за один апдейт",
+    ["update_type"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+UPDATE_DB_SECONDS = registry.histogram(
+    "telegram_update_db_seconds", "Суммарное время запросов к Postgres за один апдейт", ["update_type"]
+)
+
+FAST_REPLIES = registry.counter(
+    "gpt_fast_reply_total",
+    "Короткие ответы GPT: hit — пришёл за окно ожидания и отправлен одним сообщением, miss — через заглушку",
+    ["outcome"],
+)
+
+
+@dataclass
+class UpdateStats:
+    db_queries: int = 0
+    db_seconds: float = 0.0
+
+
+_update_stats: ContextVar[Optional[UpdateStats]] = ContextVar("update_stats", default=None)
+
+
+@contextmanager
+def track_update(update_type: str) -> Iterator[UpdateStats]:
+    """Считать запросы к БД, сделанные при обработке одного апдейта."""
+    stats = UpdateStats()
+    token = _update_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _update_stats.reset(token)
+        UPDATE_DB_QUERIES.observe(stats.db_queries, update_type=update_type)
+        UPDATE_DB_SECONDS.observe(stats.db_seconds, update_type=update_type)
+
+
+def record_db_query(connection: str, elapsed: float) -> None:
+    DB_QUERIES.inc(connection=connection)
+    DB_QUERY_SECONDS.observe(elapsed, connection=connection)
+    stats = _update_stats.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_seconds += elapsed
+
+
+def record_fast_reply(hit: bool) -> None:
+    FAST_REPLIES.inc(outcome="hit" if hit else "miss")
+
+
+def timed_use_case(name: str):
+    """Декоратор async-метода: длительность в ``use_case_seconds{use_case=name}``."""
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.monotonic()
+            status = "error"
+            try:
+                with tracer.span(f"use_case.{name}"):
+                    result = await func(*args, **kwargs)
+                status = "ok"
+                return result
+            finally:
+                USE_CASE_SECONDS.observe(time.monotonic() - started, use_case=name, status=status)
+
+        return wrapper
+
+    return decorator
@@ -1,14 +1,24 @@
+import asyncio
+import time
 from pathlib import Path
+from typing import Callable, Dict, Optional
 
 from openai import AsyncOpenAI
 
 from app.config import settings
-from app.domain.prompts import SYSTEM_PROMPT, DEFAULT_SETTINGS, SOFT_PROMPT, HARD_PROMPT, BRIEF_PROMPT, LONG_PROMPT
+from app.domain.prompts import (
+    SYSTEM_PROMPT, DEFAULT_SETTINGS, SOFT_PROMPT, HARD_PROMPT, BRIEF_PROMPT, LONG_PROMPT, MODE_LOGIC_PROMPT,
+)
 from app.domain.repositories.get_answer_by_gpt_openai_repositories import GetAnswerByGptOpenai
+from app.domain.services.message_classifier import message_classifier
 from app.infrastructure.logging.setup_logger import logger
+from app.infrastructure.metrics.registry import registry
+from app.infrastructure.tracing import traced, tracer
 
 import json
 from app.infrastructure.redis.fsm_manager import fsm_manager
+from app.infrastructure.redis.token_quota import token_quota
+from app.infrastructure.services.usage_ledger import usage_ledger
 
 # Для загрузки триггеров
 # from app.infrastructure.triggers.trigger_loader import TriggersLoader  # ТРИГГЕРЫ ОТКЛЮЧЕНЫ
@@ -19,35 +29,54 @@ from app.infrastructure.redis.fsm_manager import fsm_manager
 #     with open(SCENARIOS_PATH, "r", encoding="utf-8") as f:  # СЦЕНАРИИ ОТКЛЮЧЕНЫ
 #         return json.load(f)  # СЦЕНАРИИ ОТКЛЮЧЕНЫ
 
-# --- Новый блок: автодетект режима и типа ответа ---
+OPENAI_SECONDS = registry.histogram(
+    "openai_request_seconds",
+    "Длительность запроса к OpenAI",
+    ["model", "status"],
+    buckets=(0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 21.0, 34.0, 60.0),
+)
+OPENAI_TOKENS = registry.counter("openai_tokens_total", "Токены OpenAI по типу", ["model", "kind"])
+OPENAI_ERRORS = registry.counter("openai_errors_total", "Ошибки запросов к OpenAI по типу", ["model", "error"])
+OPENAI_CANCELLED = registry.counter("openai_cancelled_total", "Генерации, прерванные до конца ответа", ["model"])
+OPENAI_SAVED_SECONDS = registry.counter(
+    "openai_cancelled_saved_seconds_total",
+    "Оценка сэкономленного времени генерации: типичная длительность ответа минус прошедшее до отмены",
+    ["model"],
+)
+
+# Вес последнего ответа в скользящей средней длительности генерации
+LATENCY_EWMA_ALPHA = 0.1
+# Оценка промпта без токенизатора (для отменённых генераций): в кириллице ~3 символа на токен
+CHARS_PER_TOKEN = 3
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_prompt_tokens(messages: list) -> int:
+    """Грубая оценка токенов промпта с запасом вверх."""
+    return sum(MESSAGE_OVERHEAD_TOKENS + -(-len(msg.get("content") or "") // CHARS_PER_TOKEN) for msg in messages)
+
+
+# --- Автодетект режима и типа ответа ---
 def detect_mode_and_reply_type(user_text: str) -> tuple[str, str]:
-    hard_keywords = [
-        "кричит", "запрещает", "унижает", "обесценивает",
-        "игнорирует", "молчание", "терплю", "угрожает",
-        "он сказал что без него я никто", "он давит", "он контролирует",
-        "я сама виновата", "это я всё накрутила", "я прошу слишком много"
-    ]
-    # Анализ на HARD/soft
-    for kw in hard_keywords:
-        if kw in user_text.lower():
-            mode = "hard"
-            break
-    else:
-        mode = "soft"
-    # Анализ на brief/long
-    text_len = len(user_text.strip())
-    is_caps = user_text.isupper() and text_len > 5
-    is_brief = text_len < 20 or user_text.count("!") > 2 or is_caps
-    reply_type = "brief" if is_brief else "long"
-    return mode, reply_type
+    classification = message_classifier.classify(user_text)
+    return classification.mode, classification.reply_type
 
 class GetAnswerByGPTUseRepo(GetAnswerByGptOpenai):
     def __init__(self):
         self.client = AsyncOpenAI(api_key=settings.openai_api_key)
+        # Типичная длительность полного ответа по моделям — для оценки экономии при отмене
+        self._typical_latency: Dict[str, float] = {}
         # self.triggers_loader = TriggersLoader()  # ТРИГГЕРЫ ОТКЛЮЧЕНЫ
         # self.scenarios = load_scenarios()  # СЦЕНАРИИ ОТКЛЮЧЕНЫ
 
-    async def get_answer_from_get_triggers(self, history: list, user_id: int = None) -> str:
+    @traced()
+    async def get_answer_from_get_triggers(
+        self,
+        history: list,
+        user_id: int = None,
+        plan: str = None,
+        on_delta: Optional[Callable[[str], None]] = None,
+    ) -> str:
         try:
             openai_history = []
             for msg in history:
@@ -58,9 +87,11 @@ class GetAnswerByGPTUseRepo(GetAnswerByGptOpenai):
             # --- Динамические system prompts ---
             system_prompts = [
                 {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "system", "content": "ЛОГИКА ОПРЕДЕЛЕНИЯ РЕЖИМА:\n\n1. По умолчанию используй мягкий режим (SOFT).\n2. Если текст пользователя содержит следующие слова или фразы:\n  - 'кричит', 'запрещает', 'унижает', 'обесценивает',\n  - 'игнорирует', 'молчание', 'терплю', 'угрожает',\n  - 'он сказал что без него я никто', 'он давит', 'он контролирует',\n  то переключайся на жёсткий режим (HARD).\n3. Если в тексте есть фразы:\n  - 'я сама виновата', 'это я всё накрутила', 'я прошу слишком много',\n  то включай жёсткий режим (HARD) с мягким рефреймингом."},
+                {"role": "system", "content": MODE_LOGIC_PROMPT},
             ]
-            mode, reply_type = detect_mode_and_reply_type(user_message)
+            classification = message_classifier.classify(user_message)
+            logger.info(f"[CLASSIFIER] {json.dumps({'user_id': user_id, **classification.as_dict()}, ensure_ascii=False)}")
+            mode, reply_type = classification.mode, classification.reply_type
             if mode == "hard":
                 system_prompts.append({"role": "system", "content": HARD_PROMPT})
             else:
@@ -75,13 +106,92 @@ class GetAnswerByGPTUseRepo(GetAnswerByGptOpenai):
 
             temperature = DEFAULT_SETTINGS["temperature"]
             max_tokens = DEFAULT_SETTINGS["max_tokens"]
-            response = await self.client.chat.completions.create(
+            answer = await self._create_completion(
+                user_id,
+                plan,
                 model=DEFAULT_SETTINGS["model"],
+                on_delta=on_delta,
                 messages=messages,
                 temperature=temperature,
                 max_tokens=max_tokens,
             )
-            return response.choices[0].message.content.strip()
+            return answer.strip()
         except Exception as e:
             logger.error(f"Ошибка при получении ответа от GPT: {e}")
             return None
+
+    async def _create_completion(
+        self, user_id: int, plan: str, model: str, on_delta: Optional[Callable[[str], None]] = None, **kwargs
+    ) -> str:
+        """Потоковый запрос chat.completions с метриками, записью расхода в usage_ledger и списанием квоты.
+
+        Каждый фрагмент ответа передаётся в ``on_delta``. При отмене задачи поток
+        закрывается, и OpenAI прекращает генерацию.
+        """
+        started = time.monotonic()
+        parts = []
+        usage = None
+        stream = None
+        with tracer.span("openai.chat.completions", model=model) as span:
+            try:
+                stream = await self.client.chat.completions.create(
+                    model=model, stream=True, stream_options={"include_usage": True}, **kwargs
+                )
+                try:
+                    async for chunk in stream:
+                        if chunk.usage:
+                            usage = chunk.usage
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            parts.append(chunk.choices[0].delta.content)
+                            if on_delta:
+                                on_delta(chunk.choices[0].delta.content)
+                finally:
+                    await stream.close()
+            except asyncio.CancelledError:
+                elapsed = time.monotonic() - started
+                self._record_cancelled(model, elapsed, len(parts))
+                span.set_attribute("cancelled", True)
+                # Запрос уже ушёл в OpenAI: промпт и выданные фрагменты оплачены, списываем их оценку
+                if stream is not None:
+                    await self._charge_cancelled(user_id, plan, model, kwargs.get("messages", []), len(parts), elapsed)
+                raise
+            except Exception as e:
+                OPENAI_SECONDS.observe(time.monotonic() - started, model=model, status="error")
+                OPENAI_ERRORS.inc(model=model, error=type(e).__name__)
+                raise
+            latency = time.monotonic() - started
+            OPENAI_SECONDS.observe(latency, model=model, status="ok")
+            typical = self._typical_latency.get(model, latency)
+            self._typical_latency[model] = typical + LATENCY_EWMA_ALPHA * (latency - typical)
+            if usage:
+                details = usage.prompt_tokens_details
+                cached_tokens = (details.cached_tokens or 0) if details else 0
+                OPENAI_TOKENS.inc(usage.prompt_tokens, model=model, kind="prompt")
+                OPENAI_TOKENS.inc(usage.completion_tokens, model=model, kind="completion")
+                OPENAI_TOKENS.inc(cached_tokens, model=model, kind="cached")
+                span.set_attribute("prompt_tokens", usage.prompt_tokens)
+                span.set_attribute("completion_tokens", usage.completion_tokens)
+                await usage_ledger.record(
+                    user_id, plan, model, usage.prompt_tokens, usage.completion_tokens, cached_tokens, latency
+                )
+                await token_quota.charge(user_id, plan, usage.total_tokens)
+        return "".join(parts)
+
+    @staticmethod
+    async def _charge_cancelled(
+        user_id: int, plan: str, model: str, messages: list, chunks: int, elapsed: float
+    ) -> None:
+        """Учесть отменённую генерацию в usage_ledger и квоте: промпт по оценке, ответ — по фрагментам."""
+        prompt_tokens = estimate_prompt_tokens(messages)
+        OPENAI_TOKENS.inc(prompt_tokens, model=model, kind="cancelled_prompt")
+        await usage_ledger.record(user_id, plan, model, prompt_tokens, chunks, 0, elapsed)
+        await token_quota.charge(user_id, plan, prompt_tokens + chunks)
+
+    def _record_cancelled(self, model: str, elapsed: float, chunks: int) -> None:
+        # Итоговый usage приходит последним фрагментом, поэтому сгенерированное считаем по фрагментам (~токен каждый)
+        OPENAI_SECONDS.observe(elapsed, model=model, status="cancelled")
+        OPENAI_CANCELLED.inc(model=model)
+        OPENAI_TOKENS.inc(chunks, model=model, kind="cancelled_completion")
+        typical = self._typical_latency.get(model)
+        if typical:
+            OPENAI_SAVED_SECONDS.inc(max(typical - elapsed, 0.0), model=model)
@@ -2,6 +2,14 @@ from typing import Optional, Dict, Any, Callable, List
 from enum import Enum
 from app.interfaces.telegram.services.state_manager import state_manager
 from app.infrastructure.logging.setup_logger import logger
+from app.infrastructure.metrics.registry import registry
+
+FSM_TRANSITIONS = registry.counter(
+    "fsm_transitions_total", "Переходы FSM по состояниям", ["from_state", "to_state"]
+)
+FSM_REJECTED = registry.counter(
+    "fsm_transitions_rejected_total", "Отклонённые события FSM", ["from_state", "event"]
+)
 
 
 class FSMState(Enum):
@@ -138,16 +146,20 @@ class FSMManager:
         """Переход в новое состояние по событию"""
         current_state = await self.get_user_state(user_id)
         
+        from_state = getattr(current_state, "value", str(current_state))
         if current_state not in self.transitions:
             logger.warning(f"Неизвестное состояние FSM: {current_state}")
+            FSM_REJECTED.inc(from_state=from_state, event=event)
             return False
         
         if event not in self.transitions[current_state]:
             logger.warning(f"Неизвестное событие '{event}' для состояния {current_state}")
+            FSM_REJECTED.inc(from_state=from_state, event=event)
             return False
         
         new_state = self.transitions[current_state][event]
         await self.set_user_state(user_id, new_state)
+        FSM_TRANSITIONS.inc(from_state=from_state, to_state=new_state.value)
         
         logger.debug(f"FSM переход пользователя {user_id}: {current_state.value} -> {new_state.value} (событие: {event})")
         return True
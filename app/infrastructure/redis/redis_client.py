@@ -1,8 +1,25 @@
 import redis.asyncio as aioredis
 import json
+import time
+import uuid
 from typing import Optional, Any, Dict
+from redis.asyncio.client import Pipeline
 from app.config import settings
 from app.infrastructure.logging.setup_logger import logger
+from app.infrastructure.metrics.registry import registry
+from app.infrastructure.tracing import tracer
+
+REDIS_COMMAND_SECONDS = registry.histogram(
+    "redis_command_seconds",
+    "Длительность команд Redis (pipeline — одной записью)",
+    ["command", "status"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+
+
+def _observe_command(command: str, started: float, status: str) -> None:
+    REDIS_COMMAND_SECONDS.observe(time.monotonic() - started, command=command, status=status)
+
 
 def _to_serializable(val):
     # Преобразует Enum в строку, если нужно
@@ -10,6 +27,37 @@ def _to_serializable(val):
         return val.value
     return val
 
+
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        started, status = time.monotonic(), "error"
+        try:
+            with tracer.span("redis.PIPELINE", commands=len(self.command_stack)):
+                result = await super().execute(raise_on_error)
+            status = "ok"
+            return result
+        finally:
+            _observe_command("PIPELINE", started, status)
+
+
+class InstrumentedRedis(aioredis.Redis):
+    """Клиент Redis с метриками длительности каждой команды."""
+
+    async def execute_command(self, *args, **options):
+        command = str(args[0]).upper()
+        started, status = time.monotonic(), "error"
+        try:
+            with tracer.span(f"redis.{command}"):
+                result = await super().execute_command(*args, **options)
+            status = "ok"
+            return result
+        finally:
+            _observe_command(command, started, status)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> Pipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
 class RedisClient:
     def __init__(self):
         self.redis: Optional[aioredis.Redis] = None
@@ -19,7 +67,7 @@ class RedisClient:
 
     async def connect(self):
         try:
-            self.redis = aioredis.from_url(self._connection_string, decode_responses=True)
+            self.redis = InstrumentedRedis.from_url(self._connection_string, decode_responses=True)
             await self.redis.ping()
             logger.info(f"[REDIS] Подключено: {self._connection_string}")
         except Exception as e:
@@ -117,6 +165,23 @@ class RedisClient:
             logger.error(f"[REDIS] Ошибка INCR {key}: {e}")
             return 0
 
+    async def sliding_window_count(self, key: str, window: float) -> int:
+        """Отметить событие и вернуть число событий за последние ``window`` секунд."""
+        if not self.redis:
+            return 0
+        now = time.time()
+        try:
+            async with self.redis.pipeline() as pipe:
+                pipe.zremrangebyscore(key, "-inf", now - window)
+                pipe.zadd(key, {f"{now}:{uuid.uuid4().hex[:8]}": now})
+                pipe.zcard(key)
+                pipe.pexpire(key, int(window * 1000))
+                result = await pipe.execute()
+                return result[2]
+        except Exception as e:
+            logger.error(f"[REDIS] Ошибка окна {key}: {e}")
+            return 0
+
     async def set_user_session(self, user_id: int, session_data: Dict[str, Any], ttl: int = 86400):
         if not self.redis:
             return
@@ -0,0 +1,211 @@
+"""Квоты токенов OpenAI по планам — скользящие окна в Redis.
+
+Расход пользователя — sorted set ``quota:{user_id}``: элемент
+``<id>:<токены>`` на каждый ответ модели, score — время списания в мс.
+Лимиты плана задаются в настройках ``token_quota_<план>`` строкой
+``окно_в_секундах:токенов`` через запятую (например, час и сутки), за каждого
+приглашённого друга к каждому окну прибавляется
+``settings.token_quota_referral_bonus``.
+
+``check`` (перед запросом к OpenAI) и ``charge`` (после ответа, по
+фактическим токенам из ``usage``) — по одному Lua-скрипту, то есть одному
+обращению к Redis. Время берётся из ``TIME`` самого Redis, поэтому окна
+одинаковы для всех воркеров независимо от их часов. Если Redis недоступен,
+квота не применяется.
+"""
+
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.infrastructure.logging.setup_logger import logger
+from app.infrastructure.metrics.registry import registry
+from app.infrastructure.redis.redis_client import redis_client
+
+QUOTA_KEY = "quota:{user_id}"
+
+# KEYS[1] — журнал расхода; ARGV — пары (окно_мс, лимит).
+# Возвращает пары (израсходовано, мс до освобождения квоты — 0, если не исчерпана).
+CHECK_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local longest = 0
+for i = 1, #ARGV, 2 do longest = math.max(longest, tonumber(ARGV[i])) end
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - longest)
+local entries = redis.call('ZRANGE', KEYS[1], 0, -1, 'WITHSCORES')
+local result = {}
+for i = 1, #ARGV, 2 do
+  local window, limit = tonumber(ARGV[i]), tonumber(ARGV[i + 1])
+  local used = 0
+  for j = 1, #entries, 2 do
+    if tonumber(entries[j + 1]) > now - window then
+      used = used + tonumber(string.match(entries[j], ':(%d+)$'))
+    end
+  end
+  local retry = 0
+  if used >= limit then
+    local left = used
+    for j = 1, #entries, 2 do
+      local score = tonumber(entries[j + 1])
+      if score > now - window then
+        left = left - tonumber(string.match(entries[j], ':(%d+)$'))
+        if left < limit then
+          retry = score + window - now
+          break
+        end
+      end
+    end
+  end
+  result[#result + 1] = used
+  result[#result + 1] = retry
+end
+return result
+"""
+
+# KEYS[1] — журнал расхода; ARGV: самое длинное окно плана в мс, id списания, токены
+CHARGE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local longest = tonumber(ARGV[1])
+redis.call('ZADD', KEYS[1], now, ARGV[2] .. ':' .. ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - longest)
+redis.call('PEXPIRE', KEYS[1], longest)
+return 1
+"""
+
+QUOTA_REJECTED = registry.counter("token_quota_rejected_total", "Запросы, отклонённые по квоте токенов", ["plan"])
+QUOTA_CHARGED = registry.counter("token_quota_charged_tokens_total", "Токены, списанные с квот", ["plan"])
+
+
+def parse_windows(spec: str) -> List[Tuple[int, int]]:
+    """``"3600:10000,86400:30000"`` → ``[(3600, 10000), (86400, 30000)]``."""
+    windows = []
+    for part in spec.split(","):
+        if part.strip():
+            window, limit = part.split(":")
+            windows.append((int(window), int(limit)))
+    return sorted(windows)
+
+
+@dataclass
+class QuotaWindow:
+    seconds: int
+    limit: int
+    used: int = 0
+    retry_after: float = 0.0
+
+    @property
+    def remaining(self) -> int:
+        return max(self.limit - self.used, 0)
+
+    @property
+    def title(self) -> str:
+        if self.seconds % 86400 == 0:
+            return "сутки" if self.seconds == 86400 else f"{self.seconds // 86400} сут."
+        if self.seconds % 3600 == 0:
+            return "час" if self.seconds == 3600 else f"{self.seconds // 3600} ч"
+        return f"{self.seconds // 60} мин"
+
+
+@dataclass
+class QuotaStatus:
+    windows: List[QuotaWindow] = field(default_factory=list)
+
+    @property
+    def allowed(self) -> bool:
+        return all(w.used < w.limit for w in self.windows)
+
+    @property
+    def retry_after(self) -> float:
+        """Секунды до момента, когда все исчерпанные окна снова пустят запрос."""
+        return max((w.retry_after for w in self.windows if w.used >= w.limit), default=0.0)
+
+
+class TokenQuota:
+    def __init__(self):
+        self._windows: Dict[str, List[Tuple[int, int]]] = {
+            "free": parse_windows(settings.token_quota_free),
+            "pro": parse_windows(settings.token_quota_pro),
+            "vip": parse_windows(settings.token_quota_vip),
+        }
+        self._check = None
+        self._charge = None
+
+    def windows_for(self, plan: Optional[str]) -> List[Tuple[int, int]]:
+        return self._windows.get(plan or "free", self._windows["free"])
+
+    def _scripts(self):
+        if self._check is None:
+            self._check = redis_client.redis.register_script(CHECK_SCRIPT)
+            self._charge = redis_client.redis.register_script(CHARGE_SCRIPT)
+        return self._check, self._charge
+
+    async def check(
+        self, user_id: int, plan: Optional[str], referrals: int = 0, enforce: bool = True
+    ) -> Optional[QuotaStatus]:
+        """Остаток квоты по окнам плана; ``None`` — квота сейчас не применяется.
+
+        ``enforce=False`` — только показать остаток (личный кабинет), без учёта в метрике отказов.
+        """
+        windows = self.windows_for(plan)
+        if not windows:
+            return QuotaStatus()
+        if not redis_client.redis:
+            return None
+        bonus = referrals * settings.token_quota_referral_bonus
+        args = []
+        for seconds, limit in windows:
+            args.extend((seconds * 1000, limit + bonus))
+        try:
+            check, _ = self._scripts()
+            raw = await check(keys=[QUOTA_KEY.format(user_id=user_id)], args=args)
+        except Exception as e:
+            logger.warning(f"[QUOTA] Redis недоступен, квота {user_id} не проверена: {e}")
+            return None
+        status = QuotaStatus([
+            QuotaWindow(seconds, limit + bonus, int(raw[2 * i]), int(raw[2 * i + 1]) / 1000)
+            for i, (seconds, limit) in enumerate(windows)
+        ])
+        if enforce and not status.allowed:
+            QUOTA_REJECTED.inc(plan=plan or "free")
+        return status
+
+    async def charge(self, user_id: Optional[int], plan: Optional[str], tokens: int) -> None:
+        """Списать фактически израсходованные токены."""
+        windows = self.windows_for(plan)
+        if not user_id or not windows or tokens <= 0 or not redis_client.redis:
+            return
+        longest = max(seconds for seconds, _ in windows) * 1000
+        try:
+            _, charge = self._scripts()
+            await charge(keys=[QUOTA_KEY.format(user_id=user_id)], args=[longest, uuid.uuid4().hex[:12], tokens])
+            QUOTA_CHARGED.inc(tokens, plan=plan or "free")
+        except Exception as e:
+            logger.warning(f"[QUOTA] Не удалось списать {tokens} токенов у {user_id}: {e}")
+
+
+def format_quota(status: Optional[QuotaStatus]) -> str:
+    """Строки остатка квоты для личного кабинета."""
+    if status is None:
+        return ""
+    if not status.windows:
+        return "🔋 <b>Токены:</b> без ограничений"
+    lines = [
+        f"🔋 <b>Токены за {w.title}:</b> осталось {w.remaining} из {w.limit}"
+        for w in status.windows
+    ]
+    if not status.allowed:
+        lines.append(f"⏱ Квота обновится через {format_wait(status.retry_after)}")
+    return "\n".join(lines)
+
+
+def format_wait(seconds: float) -> str:
+    minutes = max(int(seconds + 59) // 60, 1)
+    if minutes < 60:
+        return f"{minutes} мин"
+    return f"{minutes // 60} ч {minutes % 60} мин"
+
+
+# Глобальный экземпляр
+token_quota = TokenQuota()
@@ -0,0 +1,12 @@
+"""Кэш отрендеренных экранов бота (личный кабинет и т.п.) в Redis."""
+
+from app.infrastructure.redis.redis_client import redis_client
+
+
+def lk_view_key(telegram_id: int) -> str:
+    return f"lk_view:{telegram_id}"
+
+
+async def invalidate_lk_view(telegram_id: int) -> None:
+    """Сбросить кэш личного кабинета: изменились подписка или рефералы."""
+    await redis_client.delete_cache(lk_view_key(telegram_id))
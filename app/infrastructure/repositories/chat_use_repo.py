@@ -2,10 +2,12 @@ from app.domain.repositories.chat_repositories import IChatRepository
 from app.infrastructure.database.models.chat import ChatModel
 from app.infrastructure.database.models.user import UserModel
 from app.infrastructure.logging.setup_logger import logger
+from app.infrastructure.tracing import traced
 
 
 class ChatUseRepo(IChatRepository):
 
+    @traced()
     async def get_time_last_message_by_chat_on_user(self, user: UserModel) -> object | int:
         '''Получение времени последнего сообщения для чата(Пользователя)'''
         try:
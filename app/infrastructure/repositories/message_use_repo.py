@@ -1,14 +1,66 @@
 from app.domain.repositories.message_repositories import IMessageRepository
 from app.infrastructure.database.models.chat import ChatModel
 from app.infrastructure.database.models.message import MessageModel
+from app.infrastructure.database.partitions import hot_window_start
+from app.infrastructure.services.message_buffer import message_buffer
+from app.infrastructure.database.routing import db_router
 from app.infrastructure.logging.setup_logger import logger
 from app.domain.entities.models.user import User
 from app.domain.entities.models.chat import Chat
 from app.domain.entities.models.messages import Message
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from tortoise.expressions import Q
+from app.infrastructure.tracing import traced
+
+_B36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _to_base36(value: int) -> str:
+    digits = ""
+    while True:
+        value, rem = divmod(value, 36)
+        digits = _B36[rem] + digits
+        if not value:
+            return digits
+
+
+def encode_history_cursor(created_at: datetime, message_id: int) -> str:
+    """Курсор ``(created_at, id)`` последнего показанного сообщения, компактно для callback_data."""
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    # Целочисленно: через float timestamp() микросекунды могут округлиться на единицу
+    micros = (created_at - _EPOCH) // _MICROSECOND
+    return f"{_to_base36(micros)}.{_to_base36(message_id)}"
+
+
+def decode_history_cursor(cursor: str) -> tuple[datetime, int]:
+    micros, message_id = cursor.split(".")
+    created_at = _EPOCH + timedelta(microseconds=int(micros, 36))
+    return created_at, int(message_id, 36)
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
 
 
 class MessageUseRepo(IMessageRepository):
+    @traced()
+    async def save_message(self, chat_id: int, content: str, is_from_user: bool) -> None:
+        """Сохранить сообщение диалога: через буфер отложенной записи или сразу в БД."""
+        if message_buffer.enabled:
+            await message_buffer.append(chat_id, content, is_from_user)
+            return
+        await MessageModel.create(
+            chat_id=chat_id,
+            content=content,
+            is_from_user=is_from_user,
+            created_at=datetime.now(timezone.utc)
+        )
+
+    @traced()
     async def get_message_by_chat_id(self, chat: Chat) -> str | None:
         """
         Получить текст последнего сообщения по чату.
@@ -19,7 +71,9 @@ class MessageUseRepo(IMessageRepository):
                 logger.warning(f'Чат не найден по id: {chat.id}')
                 return None
 
-            last_message = await MessageModel.filter(chat=chat_model).order_by('-created_at').first()
+            last_message = await MessageModel.filter(
+                chat=chat_model, created_at__gte=hot_window_start()
+            ).order_by('-created_at').first()
             if last_message:
                 logger.info(f'Последнее сообщение получено по chat(id): {chat.id}')
                 return last_message.content
@@ -30,6 +84,7 @@ class MessageUseRepo(IMessageRepository):
             logger.error(f'Ошибка при получении последнего сообщения по chat(id): {e}', exc_info=True)
             return None
 
+    @traced()
     async def get_history_messages(self, user: User, max_last_messages: int = 10) -> list[Message]:
         """
         Формирует историю диалога в виде списка Message для передачи в OpenAI.
@@ -39,7 +94,9 @@ class MessageUseRepo(IMessageRepository):
             history = []
 
             logger.info(f'Получаем чат для пользователя ID: {user.telegram_id}')
-            chat_model = await ChatModel.get_or_none(user_id=user.telegram_id)
+            chat_model = await db_router.read(
+                lambda db: ChatModel.get_or_none(user_id=user.telegram_id, using_db=db), user.telegram_id
+            )
             if not chat_model:
                 logger.warning(f'Чат не найден для пользователя ID: {user.telegram_id}')
                 return history
@@ -53,26 +110,81 @@ class MessageUseRepo(IMessageRepository):
             )
 
             logger.info(f'Чат {chat.id} найден. Получаем последние {max_last_messages} сообщений.')
-            messages = await MessageModel.filter(chat=chat_model).order_by('-created_at').limit(max_last_messages)
-
-            for msg in reversed(messages):  # от старых к новым
-                message = Message(
-                    id=msg.id,
-                    chat=chat,
-                    content=msg.content,
-                    is_from_user=msg.is_from_user,
-                    created_at=msg.created_at,
-                    context_summary=msg.context_summary or "",
-                    emotion=msg.emotion or "",
-                    topic=msg.topic or "",
-                    importance=msg.importance or 0,
-                    out_of_scope=msg.out_of_scope or False
+            messages = []
+            if message_buffer.enabled:
+                # Свежие сообщения (в том числе ещё не записанные в БД) — из буфера
+                messages = [
+                    Message(
+                        id=entry["id"],
+                        chat=chat,
+                        content=entry["content"],
+                        is_from_user=entry["is_from_user"],
+                        created_at=entry["created_at"],
+                        context_summary="",
+                        emotion="",
+                        topic="",
+                        importance=1,
+                        out_of_scope=False
+                    )
+                    for entry in await message_buffer.recent(chat.id, max_last_messages)
+                ]
+
+            if len(messages) < max_last_messages:
+                # Только горячие партиции: контекст для OpenAI не тянем из архива
+                db_messages = await db_router.read(
+                    lambda db: MessageModel.filter(
+                        chat_id=chat_model.id, created_at__gte=hot_window_start()
+                    ).using_db(db).order_by('-created_at').limit(max_last_messages),
+                    user.telegram_id,
+                )
+                buffered_ids = {m.id for m in messages}
+                messages.extend(
+                    Message(
+                        id=msg.id,
+                        chat=chat,
+                        content=msg.content,
+                        is_from_user=msg.is_from_user,
+                        created_at=msg.created_at,
+                        context_summary=msg.context_summary or "",
+                        emotion=msg.emotion or "",
+                        topic=msg.topic or "",
+                        importance=msg.importance or 0,
+                        out_of_scope=msg.out_of_scope or False
+                    )
+                    for msg in db_messages
+                    if msg.id not in buffered_ids
                 )
+                messages.sort(key=lambda m: (_as_utc(m.created_at), m.id), reverse=True)
+                messages = messages[:max_last_messages]
+
+            for message in reversed(messages):  # от старых к новым
                 history.append(message)
-                logger.debug(f"Добавлено сообщение в историю: [{('user' if msg.is_from_user else 'assistant')}] {msg.content[:100]}")
+                logger.debug(f"Добавлено сообщение в историю: [{('user' if message.is_from_user else 'assistant')}] {message.content[:100]}")
 
             return history
 
         except Exception as e:
             logger.error(f'Ошибка при формировании истории диалога: {e}', exc_info=True)
-            return []
\ No newline at end of file
+            return []
+
+    @traced()
+    async def get_user_history_page(
+        self, telegram_id: int, cursor: Optional[str] = None, limit: int = 10
+    ) -> tuple[list[MessageModel], Optional[str]]:
+        """
+        Страница сообщений пользователя от новых к старым (keyset по ``(created_at, id)``).
+        Возвращает сообщения и курсор следующей страницы (None, если дальше пусто).
+        """
+        query = MessageModel.filter(chat__user_id=telegram_id, is_from_user=True)
+        if cursor:
+            created_at, message_id = decode_history_cursor(cursor)
+            query = query.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id))
+        # Берём на одну запись больше, чтобы узнать, есть ли следующая страница, без count()
+        messages = await db_router.read(
+            lambda db: query.using_db(db).order_by("-created_at", "-id").limit(limit + 1), telegram_id
+        )
+        next_cursor = None
+        if len(messages) > limit:
+            messages = messages[:limit]
+            next_cursor = encode_history_cursor(messages[-1].created_at, messages[-1].id)
+        return messages, next_cursor
@@ -1,38 +1,41 @@
 from datetime import datetime
 from app.domain.repositories.subscription_repositories import ISubscriptionRepository
-from app.infrastructure.database.models.message import MessageModel
 from app.infrastructure.database.models.subscribe import PlanName, SubscriptionModel
 from app.infrastructure.database.models.user import UserModel
 from app.domain.entities.models.user import User
 from app.infrastructure.logging.setup_logger import logger
+from app.infrastructure.database.routing import db_router
+from app.infrastructure.tracing import traced
 
 
 class SubscriptionUseRepositories(ISubscriptionRepository):
-    async def check_subscription_status_by_user(self, user: User) -> tuple[str, int]:
+    @traced()
+    async def check_subscription_status_by_user(self, user: User) -> str:
         """Проверяет статус подписки пользователя
-           Возвращает: План подписки, количество сообщений
+           Возвращает: План подписки
         """
-        active_subscription = (
-            await SubscriptionModel.filter(
+        active_subscription = await db_router.read(
+            lambda db: SubscriptionModel.filter(
                 user_id=user.telegram_id, is_active=True, end_date__gte=datetime.utcnow()
             )
+            .using_db(db)
             .prefetch_related("plan")
-            .first()
+            .first(),
+            user.telegram_id,
         )
 
         current_plan = "free"
         if active_subscription:
             current_plan = active_subscription.plan.name.value
-        # Обновляем статус пользователя в БД, если он изменился
+        # Обновляем статус пользователя в БД, если он изменился (чтение и запись — на primary)
         user_model = await UserModel.get_or_none(telegram_id=user.telegram_id)
         if user_model and user_model.subscription_level != current_plan and not (user_model.subscription_level is None and current_plan == "free"):
             user_model.subscription_level = PlanName[current_plan.upper()] if current_plan != "free" else None
             await user_model.save(update_fields=["subscription_level"])
 
-        message_count = await MessageModel.filter(chat__user=user.telegram_id, is_from_user=True).count()
-
-        return current_plan, message_count
+        return current_plan
 
+    @traced()
     async def is_active(self, user: User) -> bool:
         """Проверить активность подписки"""
         try:
@@ -46,6 +49,7 @@ class SubscriptionUseRepositories(ISubscriptionRepository):
             logger.error(f'Ошибка при проверке активности подписки для пользователя {user.telegram_id}: {e}')
             return False
 
+    @traced()
     async def get_end_date(self, user: User, plan: str) -> datetime | None:
         """Получить дату конца подписки и ее план"""
         try:
@@ -62,6 +66,7 @@ class SubscriptionUseRepositories(ISubscriptionRepository):
             logger.error(f'Ошибка при получении даты окончания подписки для пользователя {user.telegram_id}: {e}')
             return None
 
+    @traced()
     async def get_payment_id(self, user: User) -> str | None:
         """Получить id платежа"""
         try:
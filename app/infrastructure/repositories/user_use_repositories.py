@@ -1,3 +1,4 @@
+from tortoise.functions import Length
 from tortoise.transactions import in_transaction
 from app.domain.repositories.user_repositories import IUserRepository
 from app.infrastructure.database.models.user import UserModel
@@ -5,12 +6,18 @@ from app.infrastructure.logging.setup_logger import logger
 from app.domain.entities.models.user import User
 from datetime import datetime
 from app.infrastructure.database.models.subscribe import PlanName
+from app.infrastructure.redis.view_cache import invalidate_lk_view
+from app.infrastructure.database.routing import db_router
+from app.infrastructure.tracing import traced
 
 
 class UserUseRepositories(IUserRepository):
+    @traced()
     async def get_user_by_telegram_id(self, telegram_id: int) -> User | None:
         try:
-            user_model = await UserModel.get_or_none(telegram_id=telegram_id)
+            user_model = await db_router.read(
+                lambda db: UserModel.get_or_none(telegram_id=telegram_id, using_db=db), telegram_id
+            )
             if user_model:
                 logger.info(f"Пользователь с id {telegram_id} найден")
                 return User(
@@ -25,18 +32,29 @@ class UserUseRepositories(IUserRepository):
                     is_banned=getattr(user_model, 'is_banned', False),
                     banned_until=getattr(user_model, 'banned_until', None),
                     invited_by=getattr(user_model, 'invited_by_id', None),
-                    referrals=getattr(user_model, 'referrals', []),
-                    message_limit=getattr(user_model, 'message_limit', 20),
-                    used_messages=getattr(user_model, 'used_messages', 0)
+                    referrals=getattr(user_model, 'referrals', [])
                 )
             return None
         except Exception as e:
             logger.error(f"Ошибка при получении пользователя {telegram_id}: {e}")
             return None
 
+    @traced()
     async def get_user_model_by_telegram_id(self, telegram_id: int):
+        # Модель потом сохраняют, поэтому читаем с primary
         return await UserModel.get_or_none(telegram_id=telegram_id)
 
+    @traced()
+    async def get_user_model_by_username(self, username: str) -> UserModel | None:
+        """Пользователь по username без учёта регистра, как в поиске админки; модель читается с primary."""
+        username = username.strip().lstrip("@")
+        if not username:
+            return None
+        candidates = await UserModel.filter(username__iexact=username).order_by("telegram_id")
+        # Различающиеся только регистром username возможны — точное совпадение важнее
+        return next((u for u in candidates if u.username == username), candidates[0] if candidates else None)
+
+    @traced()
     async def create_or_update_user(self, tg_user, invited_by=None):
         async with in_transaction():
             try:
@@ -56,9 +74,7 @@ class UserUseRepositories(IUserRepository):
                             is_banned=getattr(existing_user_model, 'is_banned', False),
                             banned_until=getattr(existing_user_model, 'banned_until', None),
                             invited_by=getattr(existing_user_model, 'invited_by_id', None),
-                            referrals=getattr(existing_user_model, 'referrals', []),
-                            message_limit=getattr(existing_user_model, 'message_limit', 20),
-                            used_messages=getattr(existing_user_model, 'used_messages', 0)
+                            referrals=getattr(existing_user_model, 'referrals', [])
                         ),
                         False
                     )
@@ -76,9 +92,7 @@ class UserUseRepositories(IUserRepository):
                     is_banned=False,
                     banned_until=None,
                     invited_by=invited_by,
-                    referrals=[],
-                    message_limit=20,
-                    used_messages=0
+                    referrals=[]
                 )
                 logger.info(f"Пользователь {new_user_model.telegram_id} создан")
 
@@ -87,8 +101,9 @@ class UserUseRepositories(IUserRepository):
                     inviter = await UserModel.get_or_none(telegram_id=invited_by)
                     if inviter and tg_user.id not in (inviter.referrals or []):
                         inviter.referrals = (inviter.referrals or []) + [tg_user.id]
-                        inviter.message_limit = getattr(inviter, 'message_limit', 20) + 5
-                        await inviter.save(update_fields=["referrals", "message_limit"])
+                        # Бонус — прибавка к квоте токенов за каждого приглашённого (см. token_quota)
+                        await inviter.save(update_fields=["referrals"])
+                        await invalidate_lk_view(inviter.telegram_id)
 
                 return (
                     User(
@@ -103,9 +118,7 @@ class UserUseRepositories(IUserRepository):
                         is_banned=getattr(new_user_model, 'is_banned', False),
                         banned_until=getattr(new_user_model, 'banned_until', None),
                         invited_by=getattr(new_user_model, 'invited_by_id', None),
-                        referrals=getattr(new_user_model, 'referrals', []),
-                        message_limit=getattr(new_user_model, 'message_limit', 20),
-                        used_messages=getattr(new_user_model, 'used_messages', 0)
+                        referrals=getattr(new_user_model, 'referrals', [])
                     ),
                     True
                 )
@@ -113,20 +126,30 @@ class UserUseRepositories(IUserRepository):
                 logger.error(f"Ошибка при создании/получении пользователя {tg_user.id}: {e}")
                 return None, False
 
+    @traced()
     async def add_admin(self, telegram_id: int) -> None:
         user = await UserModel.get_or_none(telegram_id=telegram_id)
         if user:
             user.is_admin = True
             await user.save(update_fields=["is_admin"])
 
+    @traced()
     async def remove_admin(self, telegram_id: int) -> None:
         user = await UserModel.get_or_none(telegram_id=telegram_id)
         if user:
             user.is_admin = False
             await user.save(update_fields=["is_admin"])
 
+    @traced()
+    async def ban_until(self, telegram_id: int, until: datetime) -> None:
+        user = await UserModel.get_or_none(telegram_id=telegram_id)
+        if user:
+            user.banned_until = until
+            await user.save(update_fields=["banned_until"])
+
+    @traced()
     async def get_admins(self) -> list[User]:
-        users = await UserModel.filter(is_admin=True).all()
+        users = await db_router.read(lambda db: UserModel.filter(is_admin=True).using_db(db))
         return [
             User(
                 telegram_id=u.telegram_id,
@@ -138,4 +161,30 @@ class UserUseRepositories(IUserRepository):
                 updated_at=u.updated_at,
                 is_admin=True
             ) for u in users
-        ]
\ No newline at end of file
+        ]
+
+    @traced()
+    async def search_user_models(self, query: str, limit: int = 10) -> list[UserModel]:
+        """
+        Поиск для админки: по telegram_id, затем по username без учёта регистра
+        (точное совпадение первым, дальше — по префиксу). Использует индекс
+        ``users_username_upper_idx`` (см. database/indexes.py).
+        """
+        query = query.strip().lstrip("@")
+        if not query:
+            return []
+        if query.isdigit():
+            user_model = await db_router.read(
+                lambda db: UserModel.get_or_none(telegram_id=int(query), using_db=db), int(query)
+            )
+            if user_model:
+                return [user_model]
+        # Короче username — ближе к запросу: точное совпадение (длина запроса) всегда попадает в первые
+        return await db_router.read(
+            lambda db: UserModel.filter(username__istartswith=query)
+            .annotate(username_length=Length("username"))
+            .order_by("username_length", "username")
+            .using_db(db)
+            .limit(limit)
+        )
+
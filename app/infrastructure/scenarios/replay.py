@@ -0,0 +1,70 @@
+"""Прогон записанных диалогов через движок сценариев.
+
+Файл с диалогами — JSON-список вида::
+
+    [{"name": "...", "turns": [{"user": "текст", "expect": "ответ или null"}]}]
+
+``expect: null`` означает, что сообщение должно уйти в обычную обработку
+(OpenAI). Состояние хранится в памяти, Redis и OpenAI не нужны.
+
+Запуск: python -m app.infrastructure.scenarios.replay [путь к файлу]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.infrastructure.scenarios.scenario_engine import SCENARIOS_PATH, ScenarioEngine
+
+REPLAYS_PATH = SCENARIOS_PATH.parent / "scenario_replays.json"
+
+
+class InMemoryStateStore:
+    """Минимальная замена fsm_manager для прогона сценариев."""
+
+    def __init__(self):
+        self.data: Dict[int, Dict[str, Any]] = {}
+
+    async def get_user_data(self, user_id: int) -> Dict[str, Any]:
+        return dict(self.data.get(user_id, {}))
+
+    async def update_user_data(self, user_id: int, data: Dict[str, Any]):
+        self.data.setdefault(user_id, {}).update(data)
+
+
+async def replay(engine: ScenarioEngine, conversations: List[Dict[str, Any]]) -> List[str]:
+    """Возвращает список расхождений (пустой, если всё совпало)."""
+    failures: List[str] = []
+    for user_id, conversation in enumerate(conversations, start=1):
+        engine.state_store = InMemoryStateStore()
+        for turn_no, turn in enumerate(conversation["turns"], start=1):
+            reply = await engine.handle(user_id, turn["user"])
+            if reply != turn.get("expect"):
+                failures.append(
+                    f"{conversation.get('name', user_id)} #{turn_no}: "
+                    f"ожидалось {turn.get('expect')!r}, получено {reply!r}"
+                )
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Прогон диалогов через движок сценариев")
+    parser.add_argument("path", nargs="?", type=Path, default=REPLAYS_PATH)
+    args = parser.parse_args()
+
+    with open(args.path, "r", encoding="utf-8") as f:
+        conversations = json.load(f)
+
+    engine = ScenarioEngine(state_store=InMemoryStateStore())
+    failures = asyncio.run(replay(engine, conversations))
+    for failure in failures:
+        print(failure)
+    print(f"Диалогов: {len(conversations)}, расхождений: {len(failures)}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
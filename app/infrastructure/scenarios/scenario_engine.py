@@ -0,0 +1,163 @@
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.infrastructure.logging.setup_logger import logger
+from app.infrastructure.redis.fsm_manager import fsm_manager
+
+SCENARIOS_PATH = Path(__file__).resolve().parent.parent.parent / "core" / "triggers" / "scenarios.json"
+
+EVENT_USER_REPLIED = "user_replied"
+
+
+@dataclass
+class ScenarioStep:
+    step: int
+    text: Optional[str] = None
+
+    @property
+    def is_scripted(self) -> bool:
+        return bool(self.text)
+
+
+@dataclass
+class Scenario:
+    id: int
+    name: str
+    system_prompt: str
+    first_step: int
+    steps: Dict[int, ScenarioStep]
+    transitions: Dict[Tuple[int, str], Optional[int]]
+    keywords: List[str] = field(default_factory=list)
+
+
+class ScenarioValidationError(ValueError):
+    pass
+
+
+def _parse_scenarios(raw: List[Dict[str, Any]]) -> Dict[int, Scenario]:
+    """Проверяет и индексирует сценарии. Бросает ScenarioValidationError."""
+    scenarios: Dict[int, Scenario] = {}
+    for item in raw:
+        sid = item.get("id")
+        if not isinstance(sid, int):
+            raise ScenarioValidationError(f"Сценарий без целочисленного id: {item.get('name')}")
+        if sid in scenarios:
+            raise ScenarioValidationError(f"Повторяющийся id сценария: {sid}")
+        steps = {s["step"]: ScenarioStep(step=s["step"], text=s.get("text")) for s in item.get("steps", [])}
+        if not steps:
+            raise ScenarioValidationError(f"Сценарий {sid} не содержит шагов")
+        transitions: Dict[Tuple[int, str], Optional[int]] = {}
+        for t in item.get("transitions", []):
+            src, dst = t.get("from"), t.get("to")
+            if src not in steps or (dst is not None and dst not in steps):
+                raise ScenarioValidationError(f"Сценарий {sid}: переход {src} -> {dst} ссылается на несуществующий шаг")
+            transitions[(src, t.get("on", EVENT_USER_REPLIED))] = dst
+        scenarios[sid] = Scenario(
+            id=sid,
+            name=item.get("name", ""),
+            system_prompt=item.get("system_prompt", ""),
+            first_step=min(steps),
+            steps=steps,
+            transitions=transitions,
+            keywords=[kw.lower() for kw in item.get("keywords", [])],
+        )
+    return scenarios
+
+
+class ScenarioEngine:
+    """Движок сценариев.
+
+    Сценарии читаются из JSON один раз, проверяются и раскладываются по
+    индексам (id, ключевое слово активации). Прогресс хранится в данных FSM
+    пользователя (``scenario_id``/``scenario_step``). Скриптовые шаги
+    отвечают заготовленным текстом без обращения к OpenAI.
+    """
+
+    def __init__(self, path: Path = SCENARIOS_PATH, state_store=fsm_manager, reload_check_interval: float = 5.0):
+        self.path = path
+        self.state_store = state_store
+        self.reload_check_interval = reload_check_interval
+        self._by_id: Dict[int, Scenario] = {}
+        self._by_keyword: Dict[str, int] = {}
+        self._keyword_pattern: Optional[re.Pattern] = None
+        self._mtime: float = 0.0
+        self._last_check: float = 0.0
+        self.reload()
+
+    def reload(self) -> bool:
+        """Перечитать файл сценариев. При ошибке остаётся прежний индекс."""
+        try:
+            mtime = self.path.stat().st_mtime
+            with open(self.path, "r", encoding="utf-8") as f:
+                scenarios = _parse_scenarios(json.load(f))
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"[SCENARIOS] Не удалось загрузить {self.path}: {e}")
+            return False
+
+        by_keyword = {kw: s.id for s in scenarios.values() for kw in s.keywords}
+        pattern = None
+        if by_keyword:
+            pattern = re.compile("|".join(re.escape(kw) for kw in sorted(by_keyword, key=len, reverse=True)))
+
+        self._by_id, self._by_keyword, self._keyword_pattern = scenarios, by_keyword, pattern
+        self._mtime = mtime
+        logger.info(f"[SCENARIOS] Загружено сценариев: {len(scenarios)}")
+        return True
+
+    def reload_if_changed(self) -> None:
+        now = time.monotonic()
+        if now - self._last_check < self.reload_check_interval:
+            return
+        self._last_check = now
+        try:
+            if self.path.stat().st_mtime != self._mtime:
+                self.reload()
+        except OSError as e:
+            logger.error(f"[SCENARIOS] Ошибка проверки файла сценариев: {e}")
+
+    def get(self, scenario_id: int) -> Optional[Scenario]:
+        return self._by_id.get(scenario_id)
+
+    def find_by_text(self, text: str) -> Optional[Scenario]:
+        if not self._keyword_pattern:
+            return None
+        match = self._keyword_pattern.search(text.lower())
+        return self._by_id.get(self._by_keyword[match.group(0)]) if match else None
+
+    async def handle(self, user_id: int, text: str) -> Optional[str]:
+        """Продвигает сценарий пользователя.
+
+        Возвращает текст скриптового шага или None, если сообщение должно
+        уйти в обычную обработку (нет сценария, сценарий завершён или шаг
+        не скриптовый).
+        """
+        self.reload_if_changed()
+        data = await self.state_store.get_user_data(user_id)
+        scenario = self.get(data.get("scenario_id")) if data.get("scenario_id") else None
+
+        if scenario:
+            next_step = scenario.transitions.get((data.get("scenario_step"), EVENT_USER_REPLIED))
+            if next_step is None:
+                await self.state_store.update_user_data(user_id, {"scenario_id": None, "scenario_step": None})
+                logger.info(f"[SCENARIOS] Пользователь {user_id} завершил сценарий {scenario.id}")
+                return None
+            step = scenario.steps[next_step]
+        else:
+            scenario = self.find_by_text(text)
+            if not scenario:
+                if data.get("scenario_id"):
+                    await self.state_store.update_user_data(user_id, {"scenario_id": None, "scenario_step": None})
+                return None
+            step = scenario.steps[scenario.first_step]
+            logger.info(f"[SCENARIOS] Пользователь {user_id} начал сценарий {scenario.id}")
+
+        await self.state_store.update_user_data(user_id, {"scenario_id": scenario.id, "scenario_step": step.step})
+        return step.text if step.is_scripted else None
+
+
+# Глобальный экземпляр движка сценариев
+scenario_engine = ScenarioEngine()
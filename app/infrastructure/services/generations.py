@@ -0,0 +1,114 @@
+"""Незавершённые генерации ответов GPT по чатам.
+
+``generation_registry.run(chat_id, coro)`` запускает генерацию отдельной
+задачей и держит на неё ссылку. Новое сообщение в том же чате (новый
+``run``) или кнопка «Остановить» (``cancel``) отменяют предыдущую задачу —
+отмена доходит до потокового запроса к OpenAI и закрывает его. Другие
+процессы узнают об отмене через Redis-канал; процесс-отправитель своё
+сообщение пропускает — локально он уже отменил всё, что нужно.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import uuid
+from typing import Any, Awaitable, Dict, Optional, Tuple
+
+from app.infrastructure.logging.setup_logger import logger
+from app.infrastructure.metrics.registry import registry
+from app.infrastructure.redis.redis_client import redis_client
+
+CANCEL_CHANNEL = "gpt:cancel"
+
+GENERATIONS_CANCELLED = registry.counter(
+    "gpt_generations_cancelled_total", "Отменённые генерации ответов по причине", ["reason"]
+)
+
+
+class GenerationCancelled(Exception):
+    """Генерацию отменили новым сообщением или кнопкой «Остановить»."""
+
+
+class GenerationRegistry:
+    def __init__(self):
+        self.origin = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: Dict[int, Tuple[str, asyncio.Task]] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    async def run(self, chat_id: int, coro: Awaitable[Any]) -> Any:
+        """Выполнить генерацию чата, отменив предыдущую. Отмена — ``GenerationCancelled``."""
+        generation_id = uuid.uuid4().hex
+        # Отмена предыдущей и регистрация новой — без await между ними, иначе два одновременных
+        # сообщения зарегистрируются оба и первая генерация останется без ссылки для отмены
+        self._cancel_local(chat_id, "newer_message")
+        task = asyncio.ensure_future(coro)
+        self._tasks[chat_id] = (generation_id, task)
+        try:
+            await self._publish_cancel(chat_id, "newer_message")
+            return await task
+        except asyncio.CancelledError:
+            # Отменили сам обработчик (например, при остановке) — это не отмена генерации
+            if asyncio.current_task().cancelling():
+                raise
+            raise GenerationCancelled() from None
+        finally:
+            if self._tasks.get(chat_id, (None,))[0] == generation_id:
+                del self._tasks[chat_id]
+
+    async def cancel(self, chat_id: int, reason: str = "stop") -> None:
+        """Отменить генерацию чата здесь и в остальных процессах."""
+        self._cancel_local(chat_id, reason)
+        await self._publish_cancel(chat_id, reason)
+
+    async def _publish_cancel(self, chat_id: int, reason: str) -> None:
+        if redis_client.redis:
+            try:
+                await redis_client.redis.publish(
+                    CANCEL_CHANNEL, json.dumps({"chat_id": chat_id, "reason": reason, "origin": self.origin})
+                )
+            except Exception as e:
+                logger.warning(f"[GENERATION] Не удалось разослать отмену для {chat_id}: {e}")
+
+    def _cancel_local(self, chat_id: int, reason: str) -> None:
+        _, task = self._tasks.get(chat_id, (None, None))
+        if task is None or task.done() or task.cancelling():
+            return
+        task.cancel()
+        GENERATIONS_CANCELLED.inc(reason=reason)
+        logger.info(f"[GENERATION] Генерация для {chat_id} отменена: {reason}")
+
+    async def start(self) -> None:
+        if redis_client.redis and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = redis_client.redis.pubsub()
+            try:
+                await pubsub.subscribe(CANCEL_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        payload = json.loads(message["data"])
+                        if payload.get("origin") != self.origin:
+                            self._cancel_local(payload["chat_id"], payload["reason"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[GENERATION] Подписка на {CANCEL_CHANNEL} прервана: {e}")
+                await asyncio.sleep(5)
+            finally:
+                await pubsub.aclose()
+
+
+# Глобальный экземпляр
+generation_registry = GenerationRegistry()
@@ -0,0 +1,191 @@
+"""Архив холодных месяцев истории сообщений.
+
+Партиции ``messages``, целиком вышедшие из горячего окна
+(``settings.messages_hot_months``), выгружаются в сжатые NDJSON-файлы,
+по одному на месяц, строки отсортированы по ``(chat_id, created_at, id)``.
+Для каждого чата в ``message_archives`` остаётся указатель: месяц, ключ
+файла и счётчики. После этого партиция отсоединяется и удаляется.
+
+Хранилище — каталог ``settings.messages_archive_dir``, адресуемый ключами
+как объектное хранилище, поэтому его можно заменить на S3-совместимое.
+Задача запускается раз в ``messages_archive_interval`` секунд в каждом
+процессе, параллельные запуски разводит advisory lock Postgres.
+"""
+
+import asyncio
+import gzip
+import json
+import os
+from datetime import date, datetime, timezone
+from typing import Iterator, List, Optional
+
+import asyncpg
+from tortoise import Tortoise
+
+from app.config import settings
+from app.infrastructure.database.models.message_archive import MessageArchiveModel
+from app.infrastructure.database.partitions import (
+    PARENT_TABLE,
+    add_months,
+    ensure_partitions,
+    hot_window_start,
+    is_partitioned,
+    list_partitions,
+    migrate_to_partitioned,
+)
+from app.infrastructure.logging.setup_logger import logger
+
+ADVISORY_LOCK_ID = 0x6D736761  # "msga"
+
+
+class LocalArchiveStorage:
+    """Файлы архива в локальном каталоге по ключу ``messages/2026/07.ndjson.gz``."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def open_write(self, key: str):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return gzip.open(f"{path}.tmp", "wb")
+
+    def commit(self, key: str) -> None:
+        """Атомарно опубликовать файл, записанный через ``open_write``."""
+        path = self.path(key)
+        os.replace(f"{path}.tmp", path)
+
+    def read_lines(self, key: str) -> Iterator[bytes]:
+        with gzip.open(self.path(key), "rb") as f:
+            yield from f
+
+
+def archive_key(month: date) -> str:
+    return f"messages/{month.year:04d}/{month.month:02d}.ndjson.gz"
+
+
+class MessageArchiver:
+    def __init__(self, storage: LocalArchiveStorage):
+        self.storage = storage
+        self._task: Optional[asyncio.Task] = None
+
+    async def _export_month(self, conn: asyncpg.Connection, partition: str, month: date) -> None:
+        key = archive_key(month)
+        query = (
+            f"SELECT row_to_json(t)::text FROM (SELECT * FROM {partition} "
+            f"WHERE created_at >= $1 AND created_at < $2 ORDER BY chat_id, created_at, id) t"
+        )
+        lower = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+        upper_month = add_months(month, 1)
+        upper = datetime(upper_month.year, upper_month.month, 1, tzinfo=timezone.utc)
+
+        with self.storage.open_write(key) as f:
+            async def sink(chunk: bytes) -> None:
+                f.write(chunk)
+
+            # Тот же приём, что в bulk_io: CSV с разделителями, которых нет в JSON
+            await conn.copy_from_query(
+                query, lower, upper, output=sink, format="csv", quote="\x01", delimiter="\x02"
+            )
+        self.storage.commit(key)
+
+        await conn.execute(
+            "INSERT INTO message_archives (chat_id, period_start, storage_key, message_count, "
+            "user_message_count, first_message_at, last_message_at, archived_at) "
+            "SELECT chat_id, $1::date, $2, COUNT(*), COUNT(*) FILTER (WHERE is_from_user), "
+            f"MIN(created_at), MAX(created_at), NOW() FROM {partition} "
+            "WHERE created_at >= $3 AND created_at < $4 GROUP BY chat_id "
+            "ON CONFLICT (chat_id, period_start) DO UPDATE SET storage_key = EXCLUDED.storage_key, "
+            "message_count = EXCLUDED.message_count, user_message_count = EXCLUDED.user_message_count, "
+            "first_message_at = EXCLUDED.first_message_at, last_message_at = EXCLUDED.last_message_at",
+            month,
+            key,
+            lower,
+            upper,
+        )
+
+    async def archive_partition(self, conn: asyncpg.Connection, partition: str) -> None:
+        """Выгрузить партицию помесячно, записать указатели и удалить её."""
+        months = [
+            row["month"].date()
+            for row in await conn.fetch(
+                f"SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE 'UTC') AS month "
+                f"FROM {partition} ORDER BY month"
+            )
+        ]
+        # Файлы публикуются атомарно; если транзакция откатится, повторный запуск их перезапишет
+        async with conn.transaction():
+            for month in months:
+                await self._export_month(conn, partition, month)
+            await conn.execute(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {partition}")
+            await conn.execute(f"DROP TABLE {partition}")
+        logger.info(f"[ARCHIVE] {partition}: выгружено месяцев {len(months)}, партиция удалена")
+
+    async def run_once(self, conn: asyncpg.Connection) -> None:
+        if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", ADVISORY_LOCK_ID):
+            return
+        try:
+            # Выгрузка месяца дольше общего statement_timeout; пул сбросит настройку при возврате
+            await conn.execute("SET statement_timeout = 0")
+            if not await is_partitioned(conn):
+                # Пустую таблицу (новая установка) переводим сразу, с данными — только вручную
+                if await conn.fetchval(f"SELECT EXISTS (SELECT 1 FROM {PARENT_TABLE})"):
+                    logger.warning(
+                        "[ARCHIVE] messages не партиционирована, выполните "
+                        "python -m app.cli.messages_partitions migrate"
+                    )
+                    return
+                await migrate_to_partitioned(conn)
+            await ensure_partitions(conn)
+            cutoff = hot_window_start()
+            for partition, upper in await list_partitions(conn):
+                if upper <= cutoff:
+                    await self.archive_partition(conn, partition)
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", ADVISORY_LOCK_ID)
+
+    async def load_chat_archive(self, chat_id: int, period_start: date) -> List[dict]:
+        """Сообщения чата за архивный месяц (читает файл потоком до конца блока чата)."""
+        pointer = await MessageArchiveModel.get_or_none(chat_id=chat_id, period_start=period_start)
+        if not pointer:
+            return []
+        messages = []
+        for line in self.storage.read_lines(pointer.storage_key):
+            row = json.loads(line)
+            if row["chat_id"] == chat_id:
+                messages.append(row)
+            elif messages:
+                break
+        return messages
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                async with Tortoise.get_connection("default").acquire_connection() as conn:
+                    await self.run_once(conn)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[ARCHIVE] Ошибка архивации сообщений: {e}", exc_info=True)
+            await asyncio.sleep(settings.messages_archive_interval)
+
+    async def start(self) -> None:
+        if Tortoise.get_connection("default").capabilities.dialect != "postgres":
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Глобальный экземпляр
+message_archiver = MessageArchiver(LocalArchiveStorage(settings.messages_archive_dir))
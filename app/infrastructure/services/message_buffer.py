@@ -0,0 +1,226 @@
+"""Отложенная запись сообщений (write-behind) через Redis Stream.
+
+При ``settings.message_write_behind`` сообщения диалога не пишутся в
+Postgres на пути ответа пользователю. ``append`` одним pipeline кладёт
+запись в стрим ``messages:pending`` и в список последних сообщений чата,
+а фоновый flusher забирает стрим через consumer group и вставляет пачки
+одним многострочным ``INSERT`` — по размеру пачки или по таймеру.
+
+Id сообщений выделяются заранее блоками из sequence таблицы ``messages``,
+поэтому повторная вставка после сбоя идемпотентна (``ON CONFLICT DO NOTHING``),
+а история склеивается из буфера и БД без дублей. Записи, которые упавший
+процесс прочитал, но не подтвердил, подхватываются через ``XAUTOCLAIM``.
+Стрим надёжен настолько, насколько настроено сохранение Redis (AOF).
+"""
+
+import asyncio
+import json
+import os
+import socket
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from tortoise import Tortoise
+from tortoise.exceptions import IntegrityError
+
+from app.config import settings
+from app.infrastructure.database.routing import db_router
+from app.infrastructure.logging.setup_logger import logger
+from app.infrastructure.metrics.registry import registry
+from app.infrastructure.redis.redis_client import redis_client
+
+STREAM_KEY = "messages:pending"
+DEAD_LETTER_KEY = "messages:dead"
+GROUP = "message_flusher"
+RECENT_KEY = "chat:{chat_id}:recent"
+RECENT_SIZE = 40
+RECENT_TTL = 86400
+ID_BLOCK_SIZE = 100
+CLAIM_IDLE_MS = 30000
+
+FLUSHED = registry.counter("message_buffer_flushed_total", "Сообщения, записанные flusher'ом в Postgres")
+DEAD_LETTERS = registry.counter("message_buffer_dead_letter_total", "Сообщения, которые не удалось записать")
+FLUSH_SECONDS = registry.histogram("message_buffer_flush_seconds", "Длительность вставки одной пачки")
+
+INSERT_COLUMNS = ("id", "chat_id", "content", "is_from_user", "created_at", "importance", "out_of_scope")
+
+
+def _parse_entry(data: str) -> Dict[str, Any]:
+    entry = json.loads(data)
+    entry["created_at"] = datetime.fromisoformat(entry["created_at"])
+    return entry
+
+
+class MessageBuffer:
+    def __init__(self):
+        self.consumer = f"{socket.gethostname()}:{os.getpid()}"
+        self.enabled = False
+        self._ids: List[int] = []
+        self._id_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._appended = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _next_id(self) -> int:
+        async with self._id_lock:
+            if not self._ids:
+                _, rows = await Tortoise.get_connection("default").execute_query(
+                    "SELECT nextval(pg_get_serial_sequence('messages', 'id')) AS id FROM generate_series(1, $1)",
+                    [ID_BLOCK_SIZE],
+                )
+                self._ids = sorted((row["id"] for row in rows), reverse=True)
+            return self._ids.pop()
+
+    async def append(self, chat_id: int, content: str, is_from_user: bool) -> int:
+        """Поставить сообщение в очередь на запись. Возвращает id будущей строки."""
+        entry = {
+            "id": await self._next_id(),
+            "chat_id": chat_id,
+            "content": content,
+            "is_from_user": is_from_user,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        data = json.dumps(entry, ensure_ascii=False)
+        recent_key = RECENT_KEY.format(chat_id=chat_id)
+        async with redis_client.redis.pipeline(transaction=True) as pipe:
+            pipe.xadd(STREAM_KEY, {"data": data})
+            pipe.lpush(recent_key, data)
+            pipe.ltrim(recent_key, 0, RECENT_SIZE - 1)
+            pipe.expire(recent_key, RECENT_TTL)
+            await pipe.execute()
+        # Сырой INSERT flusher'а не шлёт сигналов модели — отмечаем запись для роутера чтений
+        await db_router.mark_write(chat_id)
+        self._appended += 1
+        if self._appended >= settings.message_flush_batch_size:
+            self._wakeup.set()
+        return entry["id"]
+
+    async def recent(self, chat_id: int, limit: int) -> List[Dict[str, Any]]:
+        """Последние сообщения чата из буфера, от новых к старым."""
+        raw = await redis_client.redis.lrange(RECENT_KEY.format(chat_id=chat_id), 0, limit - 1)
+        return [_parse_entry(item) for item in raw]
+
+    async def _insert(self, entries: List[Dict[str, Any]]) -> None:
+        placeholders, values = [], []
+        for i, entry in enumerate(entries):
+            base = i * len(INSERT_COLUMNS)
+            placeholders.append("(" + ", ".join(f"${base + n + 1}" for n in range(len(INSERT_COLUMNS))) + ")")
+            values.extend(
+                (entry["id"], entry["chat_id"], entry["content"], entry["is_from_user"], entry["created_at"], 1, False)
+            )
+        await Tortoise.get_connection("default").execute_query(
+            f"INSERT INTO messages ({', '.join(INSERT_COLUMNS)}) VALUES {', '.join(placeholders)} "
+            f"ON CONFLICT DO NOTHING",
+            values,
+        )
+
+    async def _flush(self, batch: List[Tuple[str, Dict[str, str]]]) -> None:
+        # У удалённой, но ещё не подтверждённой записи полей нет — её просто подтверждаем
+        entries = [(stream_id, _parse_entry(fields["data"])) for stream_id, fields in batch if fields]
+        if len(entries) < len(batch):
+            await redis_client.redis.xack(STREAM_KEY, GROUP, *(stream_id for stream_id, fields in batch if not fields))
+        if not entries:
+            return
+        started = asyncio.get_running_loop().time()
+        try:
+            await self._insert([entry for _, entry in entries])
+        except IntegrityError as e:
+            # Одна битая запись (например, чат удалён) не должна держать всю пачку: пишем по одной.
+            # Прочие ошибки (БД недоступна) пробрасываем — записи останутся в стриме
+            logger.warning(f"[MSG_BUFFER] Пачка из {len(entries)} не записана ({e}), пишем по одной")
+            for stream_id, entry in entries:
+                try:
+                    await self._insert([entry])
+                except IntegrityError as row_error:
+                    logger.error(f"[MSG_BUFFER] Сообщение {entry['id']} отправлено в {DEAD_LETTER_KEY}: {row_error}")
+                    await redis_client.redis.xadd(
+                        DEAD_LETTER_KEY, {"data": json.dumps(entry, default=str), "error": str(row_error)[:500]}
+                    )
+                    DEAD_LETTERS.inc()
+        FLUSH_SECONDS.observe(asyncio.get_running_loop().time() - started)
+        ids = [stream_id for stream_id, _ in entries]
+        await redis_client.redis.xack(STREAM_KEY, GROUP, *ids)
+        await redis_client.redis.xdel(STREAM_KEY, *ids)
+        FLUSHED.inc(len(entries))
+
+    async def _drain(self, stream_id: str = ">") -> None:
+        """Записать всё доступное пачками. ``0`` — свои неподтверждённые записи."""
+        while True:
+            response = await redis_client.redis.xreadgroup(
+                GROUP, self.consumer, {STREAM_KEY: stream_id}, count=settings.message_flush_batch_size
+            )
+            batch = response[0][1] if response else []
+            if not batch:
+                return
+            await self._flush(batch)
+
+    async def _recover(self) -> None:
+        """Забрать записи упавших процессов и дописать свои неподтверждённые."""
+        start = "0-0"
+        while True:
+            start, claimed, *_ = await redis_client.redis.xautoclaim(
+                STREAM_KEY, GROUP, self.consumer, CLAIM_IDLE_MS, start_id=start,
+                count=settings.message_flush_batch_size,
+            )
+            if claimed:
+                logger.info(f"[MSG_BUFFER] Подхвачено незаписанных сообщений: {len(claimed)}")
+            if start in ("0-0", b"0-0"):
+                break
+        await self._drain("0")
+
+    async def _loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        last_recover: Optional[float] = None
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.message_flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            self._appended = 0
+            try:
+                # Первый проход после старта — восстановление после сбоя
+                if last_recover is None or loop.time() - last_recover > CLAIM_IDLE_MS / 1000:
+                    await self._recover()
+                    last_recover = loop.time()
+                await self._drain()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[MSG_BUFFER] Ошибка записи сообщений: {e}", exc_info=True)
+                await asyncio.sleep(1)
+
+    async def start(self) -> None:
+        if not settings.message_write_behind or not redis_client.redis:
+            return
+        if Tortoise.get_connection("default").capabilities.dialect != "postgres":
+            logger.warning("[MSG_BUFFER] Отложенная запись требует Postgres, сообщения пишутся напрямую")
+            return
+        try:
+            await redis_client.redis.xgroup_create(STREAM_KEY, GROUP, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self.enabled = True
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"[MSG_BUFFER] Отложенная запись включена, consumer={self.consumer}")
+
+    async def stop(self) -> None:
+        """Остановить flusher и дописать хвост буфера."""
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.enabled = False
+        try:
+            await self._drain()
+        except Exception as e:
+            logger.error(f"[MSG_BUFFER] Хвост не записан, его подхватит следующий процесс: {e}")
+
+
+# Глобальный экземпляр
+message_buffer = MessageBuffer()
@@ -0,0 +1,100 @@
+"""Каталог планов подписки в памяти процесса.
+
+Планов единицы, а читают их меню, оплата и активация подписки на каждый
+запрос — поэтому таблица ``subscription_plans`` загружается один раз при
+старте. Когда админ меняет цену, воркер, обработавший изменение, публикует
+сообщение в Redis-канал, и каждый процесс перечитывает каталог.
+"""
+
+import asyncio
+from typing import Dict, List, Optional
+
+from app.domain.entities.models.subscription_plan import SubscriptionPlan
+from app.infrastructure.database.models.subscribe import SubscriptionPlanModel
+from app.infrastructure.redis.redis_client import redis_client
+from app.infrastructure.logging.setup_logger import logger
+
+INVALIDATION_CHANNEL = "plans:invalidate"
+
+
+class PlanCatalogue:
+    def __init__(self):
+        self._by_id: Dict[int, SubscriptionPlan] = {}
+        self._by_name: Dict[str, SubscriptionPlan] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    async def load(self) -> None:
+        plans = [
+            SubscriptionPlan(
+                id=p.id,
+                name=p.name.value,
+                description=p.description or "",
+                price_usd=p.price_usd,
+                duration_days=p.duration_days,
+                is_active=p.is_active,
+            )
+            for p in await SubscriptionPlanModel.all().order_by("id")
+        ]
+        # Подменяем словари целиком, чтобы читатели не видели полузагруженный каталог
+        self._by_id = {p.id: p for p in plans}
+        self._by_name = {p.name: p for p in plans}
+        logger.info(f"[PLANS] Каталог загружен: {', '.join(f'{p.name}={p.price_usd}' for p in plans)}")
+
+    def get(self, plan_id: int) -> Optional[SubscriptionPlan]:
+        return self._by_id.get(plan_id)
+
+    def get_by_name(self, name: str) -> Optional[SubscriptionPlan]:
+        return self._by_name.get(str(getattr(name, "value", name)).lower())
+
+    def get_active_by_name(self, name: str) -> Optional[SubscriptionPlan]:
+        """План по имени, если он доступен для покупки."""
+        plan = self.get_by_name(name)
+        return plan if plan and plan.is_active else None
+
+    def all(self) -> List[SubscriptionPlan]:
+        return list(self._by_id.values())
+
+    def active(self) -> List[SubscriptionPlan]:
+        return [p for p in self._by_id.values() if p.is_active]
+
+    async def invalidate(self) -> None:
+        """Перечитать каталог здесь и оповестить остальные процессы."""
+        await self.load()
+        if redis_client.redis:
+            await redis_client.redis.publish(INVALIDATION_CHANNEL, "reload")
+
+    async def start(self) -> None:
+        await self.load()
+        if redis_client.redis and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = redis_client.redis.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # После (пере)подписки могли пропустить сообщение — перечитываем
+                await self.load()
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        await self.load()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[PLANS] Подписка на {INVALIDATION_CHANNEL} прервана: {e}")
+                await asyncio.sleep(5)
+            finally:
+                await pubsub.aclose()
+
+
+# Глобальный экземпляр
+plan_catalogue = PlanCatalogue()
@@ -0,0 +1,300 @@
+"""Фоновые задачи, которые не должны задерживать ответ пользователю.
+
+Задача — async-функция, зарегистрированная под именем декоратором
+``@task_runner.task("имя")``; use case откладывает её вызов через
+``await task_runner.defer("имя", **kwargs)`` (аргументы должны сериализоваться
+в JSON). Задачи выполняют ``settings.task_runner_concurrency`` воркеров,
+упавшая задача повторяется до ``settings.task_runner_max_retries`` раз с
+экспоненциальной паузой, после последней попытки — ошибка в лог (или в
+``tasks:dead`` для стойкой очереди). При остановке приложения ``stop`` ждёт
+не дольше ``settings.task_runner_drain_timeout`` секунд, пока очередь опустеет.
+
+По умолчанию очередь в памяти процесса: при падении процесса отложенные
+задачи теряются. При ``settings.task_runner_durable`` задачи идут через Redis
+Stream ``tasks:pending`` (consumer group, как у ``message_buffer``) и
+подтверждаются после выполнения; задачи упавших процессов подхватываются
+через ``XAUTOCLAIM``, то есть задача выполняется хотя бы один раз — она должна
+переживать повтор. Задачи с ``durable=False`` (работают с состоянием в памяти
+процесса, например FSM) всегда выполняются в памяти процесса, который их отложил.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.config import settings
+from app.infrastructure.logging.setup_logger import logger
+from app.infrastructure.metrics.registry import registry
+from app.infrastructure.redis.redis_client import redis_client
+
+STREAM_KEY = "tasks:pending"
+DEAD_LETTER_KEY = "tasks:dead"
+GROUP = "task_runner"
+CLAIM_IDLE_MS = 60000
+RETRY_BASE_DELAY = 0.5
+
+TASKS = registry.counter(
+    "background_tasks_total", "Фоновые задачи по результату: ok, retry, failed", ["task", "status"]
+)
+TASK_LAG = registry.histogram(
+    "background_task_lag_seconds",
+    "Задержка от постановки фоновой задачи до начала выполнения",
+    ["task"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 120.0),
+)
+TASK_SECONDS = registry.histogram("background_task_seconds", "Длительность выполнения фоновой задачи", ["task"])
+TASKS_QUEUED = registry.gauge("background_tasks_queued", "Фоновые задачи в очереди процесса, ещё не начатые")
+
+TaskFunc = Callable[..., Awaitable[Any]]
+
+
+@dataclass
+class Job:
+    name: str
+    kwargs: Dict[str, Any]
+    enqueued_at: float = field(default_factory=time.time)
+    attempt: int = 0
+    stream_id: Optional[str] = None
+
+    def dumps(self) -> str:
+        return json.dumps(
+            {"name": self.name, "kwargs": self.kwargs, "enqueued_at": self.enqueued_at}, ensure_ascii=False
+        )
+
+    @classmethod
+    def loads(cls, stream_id: str, data: str) -> "Job":
+        payload = json.loads(data)
+        return cls(payload["name"], payload["kwargs"], payload["enqueued_at"], stream_id=stream_id)
+
+
+class TaskRunner:
+    def __init__(self):
+        self.consumer = f"{socket.gethostname()}:{os.getpid()}"
+        self.durable = False
+        self._tasks: Dict[str, Tuple[TaskFunc, bool]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._reader: Optional[asyncio.Task] = None
+        self._retries: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        # Задачи, принятые процессом и ещё не завершённые (включая ждущие повтора)
+        self._pending = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def task(self, name: str, durable: bool = True):
+        """Декоратор: зарегистрировать async-функцию как фоновую задачу ``name``."""
+
+        def decorator(func: TaskFunc) -> TaskFunc:
+            self._tasks[name] = (func, durable)
+            return func
+
+        return decorator
+
+    async def defer(self, name: str, **kwargs: Any) -> None:
+        """Отложить задачу. Если раннер не запущен или очередь полна — выполнить сразу."""
+        _, durable = self._tasks[name]
+        job = Job(name, kwargs)
+        if self.durable and durable:
+            try:
+                await redis_client.redis.xadd(STREAM_KEY, {"data": job.dumps()})
+                self._wakeup.set()
+                return
+            except Exception as e:
+                logger.warning(f"[TASKS] Redis недоступен, задача {name} выполняется в процессе: {e}")
+        if self._queue is None or self._queue.full():
+            await self._run(job)
+            return
+        self._enqueue(job)
+
+    def _enqueue(self, job: Job) -> None:
+        self._pending += 1
+        self._idle.clear()
+        self._queue.put_nowait(job)
+        TASKS_QUEUED.inc()
+
+    def _done(self) -> None:
+        self._pending -= 1
+        if self._pending <= 0:
+            self._idle.set()
+
+    async def _run(self, job: Job) -> bool:
+        """Выполнить одну попытку задачи; ``True`` — успешно."""
+        func, _ = self._tasks[job.name]
+        if job.attempt == 0:
+            TASK_LAG.observe(max(time.time() - job.enqueued_at, 0.0), task=job.name)
+        started = time.monotonic()
+        try:
+            await func(**job.kwargs)
+            TASKS.inc(task=job.name, status="ok")
+            return True
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            status = "retry" if job.attempt < settings.task_runner_max_retries else "failed"
+            TASKS.inc(task=job.name, status=status)
+            logger.warning(f"[TASKS] {job.name} (попытка {job.attempt + 1}) упала: {e}", exc_info=status == "failed")
+            return False
+        finally:
+            TASK_SECONDS.observe(time.monotonic() - started, task=job.name)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            TASKS_QUEUED.dec()
+            try:
+                if await self._run(job):
+                    await self._ack(job)
+                elif job.attempt < settings.task_runner_max_retries:
+                    job.attempt += 1
+                    retry = asyncio.create_task(self._retry_later(job))
+                    self._retries.add(retry)
+                    retry.add_done_callback(self._retries.discard)
+                    continue
+                else:
+                    await self._bury(job)
+                self._done()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[TASKS] Ошибка обработки задачи {job.name}: {e}", exc_info=True)
+                self._done()
+
+    async def _retry_later(self, job: Job) -> None:
+        await asyncio.sleep(RETRY_BASE_DELAY * 2 ** (job.attempt - 1))
+        await self._queue.put(job)
+        TASKS_QUEUED.inc()
+
+    async def _ack(self, job: Job) -> None:
+        if job.stream_id:
+            await redis_client.redis.xack(STREAM_KEY, GROUP, job.stream_id)
+            await redis_client.redis.xdel(STREAM_KEY, job.stream_id)
+
+    async def _bury(self, job: Job) -> None:
+        logger.error(f"[TASKS] {job.name} не выполнена за {job.attempt + 1} попыток, отброшена")
+        if job.stream_id:
+            await redis_client.redis.xadd(DEAD_LETTER_KEY, {"data": job.dumps()})
+            await self._ack(job)
+
+    def _accept(self, batch: List[Tuple[str, Optional[Dict[str, str]]]]) -> List[str]:
+        """Поставить записи стрима в очередь; вернуть id записей, которые нечего выполнять."""
+        skipped = []
+        for stream_id, fields in batch:
+            job = Job.loads(stream_id, fields["data"]) if fields else None
+            if job is None or job.name not in self._tasks:
+                if job is not None:
+                    logger.error(f"[TASKS] Неизвестная задача {job.name}, отправлена в {DEAD_LETTER_KEY}")
+                skipped.append(stream_id)
+                continue
+            self._enqueue(job)
+        return skipped
+
+    async def _accept_batch(self, batch: List[Tuple[str, Optional[Dict[str, str]]]]) -> None:
+        skipped = self._accept(batch)
+        if not skipped:
+            return
+        for stream_id, fields in batch:
+            if stream_id in skipped and fields:
+                await redis_client.redis.xadd(DEAD_LETTER_KEY, fields)
+        await redis_client.redis.xack(STREAM_KEY, GROUP, *skipped)
+        await redis_client.redis.xdel(STREAM_KEY, *skipped)
+
+    def _free_slots(self) -> int:
+        return self._queue.maxsize - self._queue.qsize()
+
+    async def _read(self, stream_id: str = ">") -> int:
+        """Прочитать записи стрима в свободные места очереди. ``0`` — свои неподтверждённые."""
+        if self._free_slots() <= 0:
+            return 0
+        response = await redis_client.redis.xreadgroup(
+            GROUP, self.consumer, {STREAM_KEY: stream_id}, count=self._free_slots()
+        )
+        batch = response[0][1] if response else []
+        await self._accept_batch(batch)
+        return len(batch)
+
+    async def _recover(self) -> None:
+        """Забрать задачи, которые другой процесс прочитал, но не подтвердил."""
+        if self._free_slots() <= 0:
+            return
+        _, claimed, *_ = await redis_client.redis.xautoclaim(
+            STREAM_KEY, GROUP, self.consumer, CLAIM_IDLE_MS, start_id="0-0", count=self._free_slots(),
+        )
+        if claimed:
+            logger.info(f"[TASKS] Подхвачено задач упавших процессов: {len(claimed)}")
+            await self._accept_batch(claimed)
+
+    async def _read_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        last_recover: Optional[float] = None
+        while True:
+            try:
+                if last_recover is None:
+                    # Процесс с тем же именем consumer'а (тот же pid в контейнере) мог не подтвердить свои задачи
+                    await self._read("0")
+                if last_recover is None or loop.time() - last_recover > CLAIM_IDLE_MS / 1000:
+                    await self._recover()
+                    last_recover = loop.time()
+                if await self._read():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[TASKS] Ошибка чтения {STREAM_KEY}: {e}", exc_info=True)
+                await asyncio.sleep(1)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.task_runner_poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=settings.task_runner_queue_size)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(settings.task_runner_concurrency)]
+        if settings.task_runner_durable and redis_client.redis:
+            try:
+                await redis_client.redis.xgroup_create(STREAM_KEY, GROUP, id="0", mkstream=True)
+            except Exception as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+            self.durable = True
+            self._reader = asyncio.create_task(self._read_loop())
+        logger.info(
+            f"[TASKS] Фоновые задачи: {settings.task_runner_concurrency} воркеров, "
+            f"очередь {'Redis Stream' if self.durable else 'в памяти'}"
+        )
+
+    async def stop(self) -> None:
+        """Дождаться выполнения принятых задач (не дольше drain timeout) и остановить воркеров."""
+        if not self._workers:
+            return
+        if self._reader:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        self.durable = False
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=settings.task_runner_drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"[TASKS] Не дождались {self._pending} фоновых задач"
+                + (", стойкие подхватит следующий процесс" if settings.task_runner_durable else "")
+            )
+        for task in self._workers + list(self._retries):
+            task.cancel()
+        await asyncio.gather(*self._workers, *self._retries, return_exceptions=True)
+        self._workers, self._queue = [], None
+        TASKS_QUEUED.set(0)
+
+
+# Глобальный экземпляр
+task_runner = TaskRunner()
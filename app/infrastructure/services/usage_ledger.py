@@ -0,0 +1,268 @@
+"""Учёт расхода OpenAI: токены, кэш промптов, латентность и стоимость.
+
+``usage_ledger.record`` вызывается после каждого ответа модели и одним
+pipeline прибавляет значения к полям хеша ``usage:pending`` в Redis
+(поле — ``день|пользователь|план|модель|метрика``). Фоновый flusher раз в
+``settings.openai_usage_flush_interval`` секунд забирает хеш атомарно
+(MULTI: HGETALL + DEL) и пачками прибавляет к строкам ``openai_usage_daily``
+через ``INSERT ... ON CONFLICT DO UPDATE``. Если запись в Postgres не
+удалась, значения возвращаются в хеш и уйдут со следующей пачкой; без Redis
+они копятся в памяти процесса.
+
+Дневные итоги по пользователю и по плану для админ-панели читаются из
+``openai_usage_daily``, то есть отстают не больше чем на интервал сброса.
+"""
+
+import asyncio
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from tortoise import Tortoise
+from tortoise.expressions import F
+from tortoise.functions import Sum
+
+from app.config import settings
+from app.infrastructure.database.models.usage import OpenAIUsageDailyModel
+from app.infrastructure.logging.setup_logger import logger
+from app.infrastructure.metrics.registry import registry
+from app.infrastructure.redis.redis_client import redis_client
+
+PENDING_KEY = "usage:pending"
+METRICS = ("requests", "prompt_tokens", "completion_tokens", "cached_tokens", "latency_ms")
+FLUSH_BATCH_SIZE = 500
+
+# Цены OpenAI, $ за 1M токенов: (вход, вход из кэша, выход)
+MODEL_PRICES_USD: Dict[str, Tuple[float, float, float]] = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+
+FLUSHED_ROWS = registry.counter("openai_usage_flushed_rows_total", "Строки расхода OpenAI, записанные в Postgres")
+
+UsageKey = Tuple[str, int, str, str]  # (день ISO, пользователь, план, модель)
+
+
+@dataclass
+class UsageTotals:
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    latency_ms: int = 0
+    cost_usd: float = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def avg_latency_ms(self) -> int:
+        return self.latency_ms // self.requests if self.requests else 0
+
+
+def estimate_cost(model_name: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int) -> float:
+    """Оценка стоимости в долларах; для неизвестной модели — 0."""
+    prices = MODEL_PRICES_USD.get(model_name)
+    if not prices:
+        return 0.0
+    input_price, cached_price, output_price = prices
+    uncached = max(prompt_tokens - cached_tokens, 0)
+    return (uncached * input_price + cached_tokens * cached_price + completion_tokens * output_price) / 1_000_000
+
+
+def _field(key: UsageKey, metric: str) -> str:
+    return "|".join((key[0], str(key[1]), key[2], key[3], metric))
+
+
+def _parse_pending(raw: Dict[str, str]) -> Dict[UsageKey, Dict[str, int]]:
+    rows: Dict[UsageKey, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+    for field, value in raw.items():
+        day, user_id, plan, model_name, metric = field.split("|")
+        rows[(day, int(user_id), plan, model_name)][metric] += int(value)
+    return rows
+
+
+class UsageLedger:
+    def __init__(self):
+        # Значения, которые не удалось положить в Redis
+        self._local: Dict[UsageKey, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+        self._task: Optional[asyncio.Task] = None
+
+    async def record(
+        self,
+        user_id: Optional[int],
+        plan: Optional[str],
+        model_name: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_tokens: int,
+        latency: float,
+    ) -> None:
+        """Учесть один запрос к модели."""
+        if not user_id:
+            return
+        key = (datetime.now(timezone.utc).date().isoformat(), user_id, plan or "free", model_name)
+        values = {
+            "requests": 1,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cached_tokens": cached_tokens,
+            "latency_ms": int(latency * 1000),
+        }
+        if redis_client.redis:
+            try:
+                async with redis_client.redis.pipeline(transaction=False) as pipe:
+                    for metric, value in values.items():
+                        pipe.hincrby(PENDING_KEY, _field(key, metric), value)
+                    await pipe.execute()
+                return
+            except Exception as e:
+                logger.warning(f"[USAGE] Redis недоступен, расход копится в памяти: {e}")
+        for metric, value in values.items():
+            self._local[key][metric] += value
+
+    async def _take_pending(self) -> Dict[UsageKey, Dict[str, int]]:
+        rows: Dict[UsageKey, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+        if redis_client.redis:
+            async with redis_client.redis.pipeline(transaction=True) as pipe:
+                pipe.hgetall(PENDING_KEY)
+                pipe.delete(PENDING_KEY)
+                raw, _ = await pipe.execute()
+            rows.update(_parse_pending(raw))
+        local, self._local = self._local, defaultdict(lambda: dict.fromkeys(METRICS, 0))
+        for key, values in local.items():
+            for metric, value in values.items():
+                rows[key][metric] += value
+        return rows
+
+    async def _restore(self, rows: Dict[UsageKey, Dict[str, int]]) -> None:
+        """Вернуть незаписанные значения, чтобы они ушли со следующим сбросом."""
+        try:
+            async with redis_client.redis.pipeline(transaction=False) as pipe:
+                for key, values in rows.items():
+                    for metric, value in values.items():
+                        if value:
+                            pipe.hincrby(PENDING_KEY, _field(key, metric), value)
+                await pipe.execute()
+        except Exception:
+            for key, values in rows.items():
+                for metric, value in values.items():
+                    self._local[key][metric] += value
+
+    async def _upsert(self, rows: List[Tuple[UsageKey, Dict[str, int]]]) -> None:
+        columns = ("day", "user_id", "plan", "model_name") + METRICS
+        placeholders, values = [], []
+        for i, ((day, user_id, plan, model_name), metrics) in enumerate(rows):
+            base = i * len(columns)
+            placeholders.append("(" + ", ".join(f"${base + n + 1}" for n in range(len(columns))) + ", NOW())")
+            values.extend((date.fromisoformat(day), user_id, plan, model_name, *(metrics[m] for m in METRICS)))
+        updates = ", ".join(f"{m} = openai_usage_daily.{m} + EXCLUDED.{m}" for m in METRICS)
+        await Tortoise.get_connection("default").execute_query(
+            f"INSERT INTO openai_usage_daily ({', '.join(columns)}, updated_at) VALUES {', '.join(placeholders)} "
+            f"ON CONFLICT (day, user_id, plan, model_name) DO UPDATE SET {updates}, updated_at = NOW()",
+            values,
+        )
+
+    async def flush(self) -> None:
+        """Перенести накопленный расход в Postgres."""
+        rows = await self._take_pending()
+        if not rows:
+            return
+        items = list(rows.items())
+        for start in range(0, len(items), FLUSH_BATCH_SIZE):
+            batch = items[start:start + FLUSH_BATCH_SIZE]
+            try:
+                await self._upsert(batch)
+            except Exception:
+                await self._restore(dict(items[start:]))
+                raise
+            FLUSHED_ROWS.inc(len(batch))
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.openai_usage_flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[USAGE] Ошибка записи расхода OpenAI: {e}", exc_info=True)
+
+    async def start(self) -> None:
+        if Tortoise.get_connection("default").capabilities.dialect != "postgres":
+            logger.warning("[USAGE] Учёт расхода OpenAI требует Postgres, сброс отключён")
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Остановить flusher и записать остаток."""
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"[USAGE] Остаток расхода не записан, он останется в Redis: {e}")
+
+    @staticmethod
+    async def _totals(query, group_by: str) -> List[Tuple[object, UsageTotals]]:
+        rows = await (
+            query.annotate(
+                sum_requests=Sum("requests"),
+                sum_prompt=Sum("prompt_tokens"),
+                sum_completion=Sum("completion_tokens"),
+                sum_cached=Sum("cached_tokens"),
+                sum_latency=Sum("latency_ms"),
+            )
+            .group_by(group_by, "model_name")
+            .values(group_by, "model_name", "sum_requests", "sum_prompt", "sum_completion", "sum_cached", "sum_latency")
+        )
+        totals: Dict[object, UsageTotals] = defaultdict(UsageTotals)
+        for row in rows:
+            item = totals[row[group_by]]
+            prompt, completion, cached = int(row["sum_prompt"]), int(row["sum_completion"]), int(row["sum_cached"])
+            item.requests += int(row["sum_requests"])
+            item.prompt_tokens += prompt
+            item.completion_tokens += completion
+            item.cached_tokens += cached
+            item.latency_ms += int(row["sum_latency"])
+            item.cost_usd += estimate_cost(row["model_name"], prompt, completion, cached)
+        return list(totals.items())
+
+    async def plan_totals(self, day: date) -> List[Tuple[str, UsageTotals]]:
+        """Итоги дня по планам."""
+        totals = await self._totals(OpenAIUsageDailyModel.filter(day=day), "plan")
+        return sorted(totals, key=lambda item: item[0])
+
+    async def top_users(self, day: date, limit: int = 10) -> List[Tuple[int, UsageTotals]]:
+        """Пользователи с наибольшим расходом токенов за день."""
+        top_ids = await (
+            OpenAIUsageDailyModel.filter(day=day)
+            .annotate(sum_tokens=Sum(F("prompt_tokens") + F("completion_tokens")))
+            .group_by("user_id")
+            .order_by("-sum_tokens")
+            .limit(limit)
+            .values_list("user_id", flat=True)
+        )
+        if not top_ids:
+            return []
+        totals = dict(await self._totals(OpenAIUsageDailyModel.filter(day=day, user_id__in=top_ids), "user_id"))
+        return [(user_id, totals[user_id]) for user_id in top_ids]
+
+    async def user_days(self, user_id: int, days: int = 7) -> List[Tuple[date, UsageTotals]]:
+        """Дневные итоги пользователя за последние ``days`` дней, от новых к старым."""
+        since = date.fromordinal(datetime.now(timezone.utc).date().toordinal() - days + 1)
+        totals = await self._totals(OpenAIUsageDailyModel.filter(user_id=user_id, day__gte=since), "day")
+        return sorted(totals, key=lambda item: item[0], reverse=True)
+
+
+# Глобальный экземпляр
+usage_ledger = UsageLedger()
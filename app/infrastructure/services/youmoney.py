@@ -9,7 +9,7 @@ from yookassa.domain.exceptions import ApiError, BadRequestError
 
 from app.config import settings
 from app.infrastructure.database.models.payment import PaymentModel, PaymentProvider, PaymentStatus
-from app.infrastructure.database.models.subscribe import SubscriptionPlanModel
+from app.infrastructure.services.plan_catalogue import plan_catalogue
 from app.infrastructure.logging.setup_logger import logger
 
 
@@ -50,8 +50,8 @@ class YouMoneyAPIService:
             Tuple[payment_id, payment_url, amount_rub]
         """
         try:
-            # Получаем план подписки
-            plan = await SubscriptionPlanModel.get(id=plan_id)
+            # План из каталога в памяти, без запроса к БД
+            plan = plan_catalogue.get(plan_id)
             if not plan:
                 raise ValueError(f"Plan with ID {plan_id} not found")
             
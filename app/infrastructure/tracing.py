@@ -0,0 +1,177 @@
+"""Трассировка обработки апдейта: span'ы в духе OpenTelemetry без зависимостей.
+
+Корневой span открывает ``tracer.start_trace`` — в ``main.webhook`` по одному
+на апдейт Telegram. Дочерние span'ы (``tracer.span``, декоратор ``traced``,
+запросы к БД через ``tracer.record``) пишутся, только если в текущем
+контексте уже идёт трасса, поэтому фоновые задачи трасс не порождают.
+
+Идентификаторы — как в W3C Trace Context (trace 32 hex, span 16 hex),
+trace id попадает в каждую строку лога. Экспорт завершённых span'ов задаёт
+``settings.tracing_exporter``: ``console`` — строки ``[TRACE]`` в лог,
+``file`` — JSON Lines в ``settings.tracing_file``, ``none`` — только trace id
+в логах. Доля записываемых трасс — ``settings.tracing_sample_ratio``.
+"""
+
+import json
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Any, Dict, Iterator, Optional
+
+from app.config import settings
+from app.infrastructure.logging.setup_logger import logger, trace_id_var
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    sampled: bool = True
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: str = "ok"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class ConsoleExporter:
+    def export(self, span: Span) -> None:
+        attributes = " ".join(f"{k}={v}" for k, v in span.attributes.items())
+        logger.info(
+            f"[TRACE] {span.name} {span.duration_ms:.1f}ms {span.status} "
+            f"span={span.span_id} parent={span.parent_id or '-'} {attributes}".rstrip()
+        )
+
+
+class FileExporter:
+    """Span'ы построчно в JSON Lines — для локальной отладки."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, span: Span) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(span.as_dict(), ensure_ascii=False, default=str) + "\n")
+
+
+class Tracer:
+    def __init__(self, exporter=None, sample_ratio: float = 1.0):
+        self.exporter = exporter
+        self.sample_ratio = sample_ratio
+
+    @staticmethod
+    def current_span() -> Optional[Span]:
+        return _current_span.get()
+
+    @contextmanager
+    def start_trace(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Корневой span новой трассы."""
+        sampled = self.exporter is not None and random.random() < self.sample_ratio
+        span = Span(name, _new_id(128), _new_id(64), sampled=sampled, attributes=attributes)
+        with self._activate(span):
+            yield span
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Дочерний span текущей трассы (вне трассы или без семплирования — пустышка)."""
+        parent = _current_span.get()
+        if parent is None or not parent.sampled:
+            yield Span(name, "", "", sampled=False)
+            return
+        span = Span(name, parent.trace_id, _new_id(64), parent.span_id, attributes=attributes)
+        with self._activate(span):
+            yield span
+
+    def record(self, name: str, elapsed: float, **attributes: Any) -> None:
+        """Записать уже завершившуюся операцию длительностью ``elapsed`` секунд."""
+        parent = _current_span.get()
+        if parent is None or not parent.sampled:
+            return
+        end_ns = time.time_ns()
+        span = Span(
+            name, parent.trace_id, _new_id(64), parent.span_id,
+            start_ns=end_ns - int(elapsed * 1e9), end_ns=end_ns, attributes=attributes,
+        )
+        self._export(span)
+
+    @contextmanager
+    def _activate(self, span: Span) -> Iterator[Span]:
+        token = _current_span.set(span)
+        log_token = trace_id_var.set(span.trace_id)
+        try:
+            yield span
+        except Exception as e:
+            span.status = "error"
+            span.set_attribute("error", type(e).__name__)
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            if span.sampled:
+                self._export(span)
+            trace_id_var.reset(log_token)
+            _current_span.reset(token)
+
+    def _export(self, span: Span) -> None:
+        try:
+            self.exporter.export(span)
+        except Exception as e:
+            logger.warning(f"[TRACE] Не удалось экспортировать span {span.name}: {e}")
+
+
+def traced(name: Optional[str] = None):
+    """Декоратор async-функции: дочерний span ``name`` (по умолчанию — qualname)."""
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with tracer.span(span_name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _build_exporter(kind: str):
+    if kind == "console":
+        return ConsoleExporter()
+    if kind == "file":
+        return FileExporter(settings.tracing_file)
+    return None
+
+
+# Глобальный экземпляр
+tracer = Tracer(_build_exporter(settings.tracing_exporter), settings.tracing_sample_ratio)
@@ -1,3 +1,5 @@
+from typing import Iterable, Iterator, List, Optional
+
 from rapidfuzz import fuzz, process
 
 from app.domain.entities.models.triggers import Trigger
@@ -8,6 +10,8 @@ class TriggerMatcher:
     def __init__(self, triggers):
         self.triggers = triggers
         self.trigger_phrases = [t["trigger"] for t in triggers]
+        # Фразы приводим к нижнему регистру один раз, а не на каждый запрос
+        self._choices = [phrase.lower() for phrase in self.trigger_phrases]
 
     def find_similar_trigger(self, user_input: str, threshold: int = 80, scorer=fuzz.partial_ratio):
         """Находит наиболее подходящий триггер для пользовательского ввода."""
@@ -17,7 +21,7 @@ class TriggerMatcher:
         try:
             match, score, idx = process.extractOne(
                 query=user_input.lower(),
-                choices=[phrase.lower() for phrase in self.trigger_phrases],
+                choices=self._choices,
                 scorer=scorer
             )
             if score >= threshold:
@@ -26,3 +30,37 @@ class TriggerMatcher:
         except Exception as e:
             logger.error('Ошибка при поиске триггера:', str(e))
             return None
+
+    def match_batch(
+        self,
+        texts: Iterable[str],
+        threshold: int = 80,
+        scorer=fuzz.partial_ratio,
+        chunk_size: int = 1000,
+    ) -> Iterator[List[Optional[dict]]]:
+        """Пакетный поиск триггеров.
+
+        Тексты читаются порциями по ``chunk_size``; фразы триггеров приведены к
+        нижнему регистру один раз, а ``score_cutoff`` даёт rapidfuzz отбросить
+        слабые совпадения без полного подсчёта. Для каждой порции отдаётся
+        список той же длины: триггер или ``None``.
+        """
+        chunk: List[str] = []
+        for text in texts:
+            chunk.append((text or "").lower())
+            if len(chunk) >= chunk_size:
+                yield self._match_chunk(chunk, threshold, scorer)
+                chunk = []
+        if chunk:
+            yield self._match_chunk(chunk, threshold, scorer)
+
+    def _match_chunk(self, queries: List[str], threshold: int, scorer) -> List[Optional[dict]]:
+        if not self._choices:
+            return [None] * len(queries)
+
+        results: List[Optional[dict]] = []
+        for query in queries:
+            # extractOne, в отличие от process.cdist, не требует numpy
+            match = process.extractOne(query, self._choices, scorer=scorer, score_cutoff=threshold)
+            results.append(self.triggers[match[2]] if match else None)
+        return results
@@ -0,0 +1,169 @@
+"""Optional PTB compatibility shim.
+
+Native aiogram handlers live in ``aiogram_app``; these adapters are kept only
+for legacy code written against the python-telegram-bot ``update``/``context``
+interface. Use :func:`wrap_update` to build such a pair from aiogram objects.
+"""
+
+from __future__ import annotations
+
+from typing import Tuple, Dict, Any, Optional
+
+from aiogram import Bot
+from aiogram.types import Message, CallbackQuery
+from aiogram.types import InlineKeyboardMarkup as AIOInlineKeyboardMarkup, InlineKeyboardButton as AIOInlineKeyboardButton
+
+from app.interfaces.telegram.middlewares import USER_DATA_STORE
+from app.interfaces.telegram.services.bot_info import bot_info
+
+
+class _ReplyMessage:
+    """Lightweight wrapper to mimic PTB returned message with id."""
+
+    def __init__(self, message_id: int):
+        self.message_id = message_id
+
+
+class PTBBotAdapter:
+    """Adapter exposing minimal PTB-like bot interface used in use cases."""
+
+    def __init__(self, bot: Bot):
+        self._bot = bot
+
+    async def edit_message_text(self, text: str, chat_id: int, message_id: int) -> None:
+        await self._bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text)
+
+    async def get_me(self):
+        return await bot_info.get_me(self._bot)
+
+
+class PTBContextAdapter:
+    """Context shim carrying args, user_data and bot adapter."""
+
+    _user_data_store: Dict[int, Dict[str, Any]] = USER_DATA_STORE
+
+    def __init__(self, bot: Bot, command_args: Optional[list[str]], user_id: int):
+        self.args = command_args or []
+        self.user_data = self._user_data_store.setdefault(user_id, {})
+        self.bot = PTBBotAdapter(bot)
+
+
+class _EffectiveChat:
+    def __init__(self, chat_id: int):
+        self.id = chat_id
+
+
+class _MessageAdapter:
+    """PTB-like message adapter with text and reply_text support."""
+
+    def __init__(self, msg: Message):
+        self._msg = msg
+
+    @property
+    def text(self) -> Optional[str]:
+        return self._msg.text
+
+    @property
+    def chat(self):
+        return self._msg.chat
+
+    async def reply_text(self, text: str, reply_markup=None, parse_mode: Optional[str] = None):
+        sent = await self._msg.answer(text, reply_markup=_convert_reply_markup(reply_markup), parse_mode=parse_mode)
+        return _ReplyMessage(sent.message_id)
+
+
+class _CallbackQueryAdapter:
+    def __init__(self, cq: CallbackQuery, bot: Bot):
+        self._cq = cq
+        self._bot = bot
+
+    @property
+    def data(self) -> str:
+        return self._cq.data or ""
+
+    async def answer(self, text: Optional[str] = None, show_alert: bool = False):
+        await self._cq.answer(text=text, show_alert=show_alert)
+
+    async def edit_message_text(self, text: str, reply_markup=None, parse_mode: Optional[str] = None):
+        await self._bot.edit_message_text(
+            chat_id=self._cq.message.chat.id,
+            message_id=self._cq.message.message_id,
+            text=text,
+            reply_markup=_convert_reply_markup(reply_markup),
+        )
+
+    @property
+    def message(self) -> _MessageAdapter:
+        return _MessageAdapter(self._cq.message)
+
+
+class PTBUpdateAdapter:
+    """Update shim that exposes attributes/methods used by PTB-based use cases."""
+
+    def __init__(self, message: Optional[Message], callback_query: Optional[CallbackQuery], bot: Bot):
+        self._message = message
+        self._callback_query = callback_query
+        self._bot = bot
+
+    @property
+    def effective_chat(self) -> _EffectiveChat:
+        chat_id = (
+            self._message.chat.id if self._message else self._callback_query.message.chat.id
+        )
+        return _EffectiveChat(chat_id)
+
+    @property
+    def effective_user(self):
+        user = self._message.from_user if self._message else self._callback_query.from_user
+        return user
+
+    @property
+    def message(self):
+        return _MessageAdapter(self._message) if self._message else None
+
+    @property
+    def callback_query(self):
+        return _CallbackQueryAdapter(self._callback_query, self._bot) if self._callback_query else None
+
+    async def reply_text(self, text: str, reply_markup=None, parse_mode: Optional[str] = None):
+        sent = await self._message.answer(text, reply_markup=_convert_reply_markup(reply_markup), parse_mode=parse_mode)
+        return _ReplyMessage(sent.message_id)
+
+
+def _convert_reply_markup(markup) -> Optional[AIOInlineKeyboardMarkup]:
+    """Convert PTB InlineKeyboardMarkup to aiogram InlineKeyboardMarkup if needed."""
+    if markup is None:
+        return None
+    # Already aiogram markup
+    if isinstance(markup, AIOInlineKeyboardMarkup):
+        return markup
+    # PTB-like markup: try duck typing using .inline_keyboard
+    rows = getattr(markup, "inline_keyboard", None)
+    if not rows:
+        return None
+    aio_rows: list[list[AIOInlineKeyboardButton]] = []
+    for row in rows:
+        aio_row: list[AIOInlineKeyboardButton] = []
+        for btn in row:
+            text = getattr(btn, "text", "")
+            callback_data = getattr(btn, "callback_data", None)
+            url = getattr(btn, "url", None)
+            if url:
+                aio_row.append(AIOInlineKeyboardButton(text=text, url=url))
+            else:
+                aio_row.append(AIOInlineKeyboardButton(text=text, callback_data=callback_data))
+        aio_rows.append(aio_row)
+    return AIOInlineKeyboardMarkup(inline_keyboard=aio_rows)
+
+
+def wrap_update(
+    bot: Bot,
+    message: Optional[Message] = None,
+    callback_query: Optional[CallbackQuery] = None,
+    command_args: Optional[list[str]] = None,
+) -> Tuple[PTBUpdateAdapter, PTBContextAdapter]:
+    """Build PTB-like ``update``/``context`` for legacy callables."""
+    user = message.from_user if message else callback_query.from_user
+    update = PTBUpdateAdapter(message=message, callback_query=callback_query, bot=bot)
+    context = PTBContextAdapter(bot, command_args, user.id)
+    return update, context
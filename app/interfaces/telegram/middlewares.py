@@ -0,0 +1,171 @@
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.filters import Filter
+from aiogram.types import CallbackQuery, Message, TelegramObject, Update
+
+from app.config import settings
+from app.infrastructure.logging.setup_logger import logger
+
+from app.infrastructure.metrics.pipeline import track_update
+from app.infrastructure.metrics.registry import registry
+from app.infrastructure.redis.redis_client import redis_client
+from app.infrastructure.repositories.user_use_repositories import UserUseRepositories
+from app.interfaces.telegram.services.admin_panel import is_admin_input
+
+# Данные пользователя между апдейтами (флаги админ-панели, последний платёж и т.п.)
+USER_DATA_STORE: Dict[int, Dict[str, Any]] = {}
+
+UPDATE_SECONDS = registry.histogram(
+    "telegram_update_seconds",
+    "Полное время обработки апдейта",
+    ["update_type", "status"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0),
+)
+FLOOD_REJECTED = registry.counter("telegram_flood_rejected_total", "Апдейты, отброшенные антифлудом", ["plan"])
+FLOOD_BANS = registry.counter("telegram_flood_bans_total", "Автоматические баны за флуд")
+
+FLOOD_WINDOW_KEY = "flood:{telegram_id}"
+FLOOD_STRIKES_KEY = "flood:strikes:{telegram_id}"
+MAX_PLAN_HINTS = 100000
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Outer-middleware ``dp.update``: время апдейта и запросы к БД за апдейт."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        update_type = event.event_type
+        started = time.monotonic()
+        status = "error"
+        with track_update(update_type):
+            try:
+                result = await handler(event, data)
+                status = "unhandled" if result is UNHANDLED else "ok"
+                return result
+            finally:
+                UPDATE_SECONDS.observe(time.monotonic() - started, update_type=update_type, status=status)
+
+
+class AntiFloodMiddleware(BaseMiddleware):
+    """Ограничение частоты апдейтов пользователя скользящим окном в Redis.
+
+    Регистрируется первым outer-middleware, до загрузки пользователя: лишний
+    апдейт отбрасывается после одного запроса к Redis, без обращения к БД.
+    План пользователя берётся из того, что загрузили для его прошлых апдейтов
+    в этом процессе; пока план неизвестен, действует самый мягкий лимит.
+    Первое превышение в окне — «страйк» с предупреждением; после
+    ``flood_strikes_to_ban`` страйков за ``flood_strike_window`` секунд
+    пользователь получает временный бан в ``banned_until`` (его проверяют use
+    case'ы, как и бан из админ-панели).
+    """
+
+    def __init__(self, user_repo: UserUseRepositories = None):
+        self.user_repo = user_repo or UserUseRepositories()
+        self.limits = {
+            "free": settings.flood_limit_free,
+            "pro": settings.flood_limit_pro,
+            "vip": settings.flood_limit_vip,
+        }
+        self._plans: Dict[int, str] = {}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        tg_user = data.get("event_from_user")
+        if not tg_user:
+            return await handler(event, data)
+        telegram_id = tg_user.id
+        plan = self._plans.get(telegram_id)
+        if plan == "admin":
+            return await handler(event, data)
+        count = await redis_client.sliding_window_count(
+            FLOOD_WINDOW_KEY.format(telegram_id=telegram_id), settings.flood_window_seconds
+        )
+        limit = self.limits.get(plan, max(self.limits.values()))
+        if count > limit:
+            FLOOD_REJECTED.inc(plan=plan or "unknown")
+            if count == limit + 1:
+                await self._strike(event, telegram_id)
+            return None
+
+        result = await handler(event, data)
+        user = data.get("user")
+        if user:
+            if len(self._plans) >= MAX_PLAN_HINTS:
+                self._plans.clear()
+            self._plans[telegram_id] = "admin" if user.is_admin else user.subscription_level
+        return result
+
+    async def _strike(self, event: TelegramObject, telegram_id: int) -> None:
+        strikes = await redis_client.increment_counter(
+            FLOOD_STRIKES_KEY.format(telegram_id=telegram_id), ttl=settings.flood_strike_window
+        )
+        if strikes >= settings.flood_strikes_to_ban:
+            until = datetime.now(timezone.utc) + timedelta(minutes=settings.flood_ban_minutes)
+            await self.user_repo.ban_until(telegram_id, until)
+            FLOOD_BANS.inc()
+            logger.warning(f"[FLOOD] {telegram_id} забанен до {until:%d.%m.%Y %H:%M} после {strikes} превышений")
+            text = f"Слишком много сообщений. Вы временно забанены до {until.strftime('%d.%m.%Y %H:%M')}."
+        else:
+            text = f"Слишком много сообщений. Подождите {int(settings.flood_window_seconds)} секунд."
+        if isinstance(event, Message):
+            await event.answer(text)
+        elif isinstance(event, CallbackQuery):
+            await event.answer(text, show_alert=True)
+
+
+class UserDataMiddleware(BaseMiddleware):
+    """Передаёт в хендлер словарь ``user_data`` текущего пользователя."""
+
+    def __init__(self, store: Dict[int, Dict[str, Any]] = USER_DATA_STORE):
+        self.store = store
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        tg_user = data.get("event_from_user")
+        if tg_user:
+            data["user_data"] = self.store.setdefault(tg_user.id, {})
+        return await handler(event, data)
+
+
+class UserLoaderMiddleware(BaseMiddleware):
+    """Загружает пользователя один раз на апдейт и кладёт его в ``data["user"]``.
+
+    Регистрируется как outer-middleware, чтобы пользователь был доступен и
+    фильтрам маршрутизации, и хендлерам без повторных запросов к БД.
+    """
+
+    def __init__(self, user_repo: UserUseRepositories = None):
+        self.user_repo = user_repo or UserUseRepositories()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        tg_user = data.get("event_from_user")
+        data["user"] = await self.user_repo.get_user_by_telegram_id(tg_user.id) if tg_user else None
+        return await handler(event, data)
+
+
+class AdminInputFilter(Filter):
+    """Текст админа, который ждёт админ-панель (ввод цены, username и т.п.)."""
+
+    async def __call__(self, event: TelegramObject, user=None, user_data: Dict[str, Any] = None) -> bool:
+        return is_admin_input(user, user_data or {})
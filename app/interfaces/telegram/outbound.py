@@ -0,0 +1,257 @@
+"""Исходящие запросы к Bot API: лимиты Telegram, приоритеты и RetryAfter.
+
+Все вызовы бота (``answer``, ``edit_text``, ``send_message`` и т.д.) проходят
+через ``OutboundRateLimitMiddleware`` — middleware сессии aiogram, поэтому
+хендлерам ничего менять не нужно. Для запросов с ``chat_id`` действуют:
+
+- корзина токенов на чат: ~1 сообщение/с в личке, ~20 сообщений/мин в группах;
+- глобальная корзина (~30 сообщений/с) с очередью по приоритету:
+  интерактивные ответы обслуживаются раньше массовых рассылок.
+
+Массовые отправки оборачиваются в ``with send_priority(SendPriority.BULK):``.
+"""
+
+import asyncio
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Dict, Optional, Union
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+
+from app.config import settings
+from app.infrastructure.logging.setup_logger import logger
+from app.infrastructure.metrics.registry import registry
+from app.infrastructure.tracing import tracer
+
+ChatId = Union[int, str]
+
+QUEUE_WAIT = registry.histogram(
+    "telegram_send_queue_wait_seconds",
+    "Время ожидания исходящего запроса в лимитере",
+    ["priority"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0),
+)
+QUEUE_DEPTH = registry.gauge(
+    "telegram_send_queue_depth", "Запросы, ожидающие глобальный токен", ["priority"]
+)
+RETRY_AFTER = registry.counter(
+    "telegram_retry_after_total", "Ответы RetryAfter от Bot API", ["method"]
+)
+API_REQUEST_SECONDS = registry.histogram(
+    "telegram_api_request_seconds",
+    "Длительность запроса к Bot API (без ожидания в лимитере)",
+    ["method", "status"],
+    buckets=(0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+
+class SendPriority(IntEnum):
+    INTERACTIVE = 0
+    BULK = 1
+
+
+_send_priority: ContextVar[SendPriority] = ContextVar("send_priority", default=SendPriority.INTERACTIVE)
+
+
+@contextmanager
+def send_priority(priority: SendPriority):
+    """Задать приоритет исходящих запросов для текущей задачи."""
+    token = _send_priority.set(priority)
+    try:
+        yield
+    finally:
+        _send_priority.reset(token)
+
+
+class TokenBucket:
+    """Корзина токенов: ``rate`` токенов в секунду, не больше ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Сколько ждать до следующего токена (0 — токен есть)."""
+        now = time.monotonic()
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self) -> None:
+        while True:
+            wait = self.delay()
+            if wait <= 0:
+                self.tokens -= 1
+                return
+            await asyncio.sleep(wait)
+
+    def block(self, seconds: float) -> None:
+        """Заблокировать корзину (например, по RetryAfter от Telegram)."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    def is_idle(self) -> bool:
+        return self.delay() == 0 and self.tokens >= self.capacity
+
+
+class OutboundDispatcher:
+    """Выдаёт разрешения на исходящие запросы с учётом лимитов Telegram."""
+
+    MAX_CHAT_BUCKETS = 10000
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        group_rate_per_minute: float = 20.0,
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate_per_minute / 60.0
+        self._chat_buckets: Dict[ChatId, TokenBucket] = {}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._pump_task: Optional[asyncio.Task] = None
+        self._seq = itertools.count()
+
+    @staticmethod
+    def is_group(chat_id: ChatId) -> bool:
+        # Группы и каналы имеют отрицательный id или @username
+        return isinstance(chat_id, str) or chat_id < 0
+
+    def chat_bucket(self, chat_id: ChatId) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.MAX_CHAT_BUCKETS:
+                self._prune()
+            if self.is_group(chat_id):
+                bucket = TokenBucket(self.group_rate, self.group_rate * 60)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _prune(self) -> None:
+        # Полная корзина ничем не отличается от новой — её можно выбросить
+        for chat_id in [cid for cid, b in self._chat_buckets.items() if b.is_idle()]:
+            del self._chat_buckets[chat_id]
+
+    def _ensure_pump(self) -> asyncio.PriorityQueue:
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        return self._queue
+
+    async def _pump(self) -> None:
+        """Раздаёт глобальные токены строго по приоритету, затем по порядку поступления."""
+        while True:
+            priority, _, future = await self._queue.get()
+            QUEUE_DEPTH.dec(priority=priority.name.lower())
+            if future.done():
+                continue
+            await self.global_bucket.acquire()
+            if not future.done():
+                future.set_result(None)
+
+    async def acquire(self, chat_id: ChatId, priority: SendPriority) -> float:
+        """Дождаться права на запрос в ``chat_id``. Возвращает время ожидания."""
+        started = time.monotonic()
+        await self.chat_bucket(chat_id).acquire()
+        queue = self._ensure_pump()
+        future = asyncio.get_running_loop().create_future()
+        queue.put_nowait((priority, next(self._seq), future))
+        QUEUE_DEPTH.inc(priority=priority.name.lower())
+        await future
+        waited = time.monotonic() - started
+        QUEUE_WAIT.observe(waited, priority=priority.name.lower())
+        return waited
+
+    def penalize(self, chat_id: ChatId, retry_after: float) -> None:
+        self.chat_bucket(chat_id).block(retry_after)
+
+    async def close(self) -> None:
+        if self._pump_task:
+            self._pump_task.cancel()
+            try:
+                await self._pump_task
+            except asyncio.CancelledError:
+                pass
+            self._pump_task = None
+
+
+class OutboundRateLimitMiddleware(BaseRequestMiddleware):
+    """Middleware сессии: лимиты перед запросом и повтор после RetryAfter."""
+
+    def __init__(self, dispatcher: OutboundDispatcher, max_retries: int = 3):
+        self.dispatcher = dispatcher
+        self.max_retries = max_retries
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod,
+    ) -> Any:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            # getMe, answerCallbackQuery, setWebhook и т.п. лимитам не подлежат
+            return await self._request(make_request, bot, method)
+
+        priority = _send_priority.get()
+        for attempt in range(self.max_retries + 1):
+            with tracer.span("telegram.rate_limit", chat_id=chat_id, priority=priority.name.lower()):
+                await self.dispatcher.acquire(chat_id, priority)
+            try:
+                return await self._request(make_request, bot, method)
+            except TelegramRetryAfter as e:
+                method_name = type(method).__name__
+                RETRY_AFTER.inc(method=method_name)
+                if attempt >= self.max_retries:
+                    raise
+                logger.warning(
+                    f"[OUTBOUND] RetryAfter {e.retry_after}s для {method_name} chat={chat_id}, "
+                    f"попытка {attempt + 1}/{self.max_retries}"
+                )
+                self.dispatcher.penalize(chat_id, e.retry_after)
+
+    @staticmethod
+    async def _request(make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod) -> Any:
+        method_name = type(method).__name__
+        started, status = time.monotonic(), "error"
+        try:
+            with tracer.span(f"telegram.{method_name}", chat_id=getattr(method, "chat_id", None)):
+                result = await make_request(bot, method)
+            status = "ok"
+            return result
+        except TelegramRetryAfter:
+            status = "retry_after"
+            raise
+        finally:
+            API_REQUEST_SECONDS.observe(time.monotonic() - started, method=method_name, status=status)
+
+
+# Глобальный диспетчер исходящих запросов
+outbound_dispatcher = OutboundDispatcher(
+    global_rate=settings.telegram_global_rate,
+    chat_rate=settings.telegram_chat_rate,
+    chat_burst=settings.telegram_chat_burst,
+    group_rate_per_minute=settings.telegram_group_rate_per_minute,
+)
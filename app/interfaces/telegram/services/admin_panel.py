@@ -1,65 +1,131 @@
-from typing import Any
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional, Union
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, Message
 from app.infrastructure.repositories.user_use_repositories import UserUseRepositories
+from app.infrastructure.repositories.message_use_repo import MessageUseRepo
+from app.domain.entities.models.user import User
 from app.infrastructure.database.models.subscribe import SubscriptionPlanModel
 from app.infrastructure.database.models.user import UserModel
+from app.infrastructure.services.plan_catalogue import plan_catalogue
+from app.infrastructure.services.usage_ledger import UsageTotals, usage_ledger
 from app.application.use_cases.subscriptions import activate_subscription_for_user
+from app.infrastructure.database.models.broadcast import BroadcastModel, BroadcastSegment
+from app.infrastructure.redis.view_cache import invalidate_lk_view
+from app.infrastructure.database.routing import db_router
+from app.infrastructure.metrics.pipeline import timed_use_case
+from app.interfaces.telegram.services.message_sender import respond
+from app.interfaces.telegram.services.keyboard_manager import KeyboardManager
+from app.interfaces.telegram.services.broadcast import SEGMENT_TITLES, broadcast_service
+
+# Флаги user_data, при которых текст админа — ввод для админ-панели
+ADMIN_INPUT_FLAGS = (
+    "edit_price_plan_id",
+    "admin_add_subscription",
+    "admin_remove_subscription",
+    "admin_search_user",
+    "admin_manage_user",
+    "admin_broadcast_segment",
+)
+
+HISTORY_PAGE_SIZE = 10
+USAGE_TOP_USERS = 10
+USAGE_USER_DAYS = 7
+
+
+def is_admin_input(user: Optional[User], user_data: dict) -> bool:
+    return bool(user and user.is_admin and any(flag in user_data for flag in ADMIN_INPUT_FLAGS))
+
+
+def format_usage(totals: UsageTotals) -> str:
+    return (
+        f"{totals.requests} запр., {totals.total_tokens} ток. "
+        f"(вход {totals.prompt_tokens}, из кэша {totals.cached_tokens}, выход {totals.completion_tokens}), "
+        f"~{totals.avg_latency_ms} мс, ≈${totals.cost_usd:.2f}"
+    )
+
 
 class AdminPanelHandler:
     def __init__(self):
         self.user_repo = UserUseRepositories()
+        self.message_repo = MessageUseRepo()
 
-    async def handle_callback(self, update: Any, context: Any, data: str):
+    @timed_use_case("admin_callback")
+    async def handle_callback(self, cq: CallbackQuery, user_data: dict, data: str):
         if data == "admin_change_prices":
-            await self.show_price_list(update)
+            await self.show_price_list(cq)
         elif data.startswith("admin_edit_price:"):
-            await self.ask_new_price(update, context, data)
+            await self.ask_new_price(cq, user_data, data)
         elif data == "admin_add_subscription":
-            await self.ask_username_for_subscription(update, context)
+            await self.ask_username_for_subscription(cq, user_data)
         elif data.startswith("admin_add_subscription_plan:"):
-            await self.add_subscription_to_user(update, context, data)
+            await self.add_subscription_to_user(cq, user_data, data)
         elif data == "admin_remove_subscription":
-            await self.ask_username_for_remove_subscription(update, context)
+            await self.ask_username_for_remove_subscription(cq, user_data)
         elif data.startswith("admin_remove_subscription_plan:"):
-            await self.remove_subscription_from_user(update, context, data)
+            await self.remove_subscription_from_user(cq, user_data, data)
         elif data == "admin_search_user":
-            await self.ask_username_for_search(update, context)
+            await self.ask_username_for_search(cq, user_data)
         elif data == "admin_manage_user":
-            await self.ask_username_for_manage(update, context)
+            await self.ask_username_for_manage(cq, user_data)
+        elif data.startswith("admin_user_pick:"):
+            await self.pick_user(cq, data)
+        elif data.startswith("admin_hist:"):
+            _, telegram_id, cursor = data.split(":")
+            await self.show_user_history(cq, int(telegram_id), cursor)
         elif data.startswith("admin_user_action:"):
-            await self.handle_user_action(update, context, data)
+            await self.handle_user_action(cq, user_data, data)
+        elif data == "admin_broadcast":
+            await self.show_broadcast_menu(cq, user_data)
+        elif data.startswith("admin_broadcast_segment:"):
+            await self.ask_broadcast_text(cq, user_data, data)
+        elif data.startswith("admin_broadcast_start:"):
+            await self.start_broadcast(cq, data)
+        elif data.startswith("admin_broadcast_status:"):
+            await self.show_broadcast_status(cq, data)
+        elif data.startswith("admin_broadcast_cancel:"):
+            await self.cancel_broadcast(cq, data)
+        elif data == "admin_usage" or data.startswith("admin_usage:"):
+            day = date.fromisoformat(data.split(":", 1)[1]) if ":" in data else None
+            await self.show_usage(cq, day)
         elif data == "admin_back":
-            await self.show_main_panel(update, context)
+            await self.show_main_panel(cq)
         else:
-            await update.callback_query.answer("Неизвестная команда", show_alert=True)
+            await cq.answer("Неизвестная команда", show_alert=True)
 
-    async def handle_text(self, update: Any, context: Any):
-        user = await self.user_repo.get_user_by_telegram_id(update.effective_user.id)
+    @timed_use_case("admin_text")
+    async def handle_text(self, message: Message, user_data: dict, user: Optional[User]):
+        """Ввод админа в режиме панели. Пользователь уже загружен UserLoaderMiddleware."""
         if not user or not user.is_admin:
             return
-        if context.user_data.get("edit_price_plan_id"):
-            await self.set_new_price(update, context)
+        if user_data.get("edit_price_plan_id"):
+            await self.set_new_price(message, user_data)
+            return
+        if user_data.get("admin_add_subscription"):
+            await self.ask_plan_for_subscription(message, user_data)
             return
-        if context.user_data.get("admin_add_subscription"):
-            await self.ask_plan_for_subscription(update, context)
+        if user_data.get("admin_remove_subscription"):
+            await self.ask_plan_for_remove_subscription(message, user_data)
             return
-        if context.user_data.get("admin_remove_subscription"):
-            await self.ask_plan_for_remove_subscription(update, context)
+        if user_data.get("admin_search_user"):
+            await self.show_user_info(message, user_data)
             return
-        if context.user_data.get("admin_search_user"):
-            await self.show_user_info(update, context)
+        if user_data.get("admin_manage_user"):
+            await self.show_manage_user_panel(message, user_data)
             return
-        if context.user_data.get("admin_manage_user"):
-            await self.show_manage_user_panel(update, context)
+        if user_data.get("admin_broadcast_segment"):
+            await self.create_broadcast(message, user_data, user)
             return
 
-    async def show_main_panel(self, update, context):
+    @timed_use_case("admin_panel")
+    async def show_main_panel(self, event: Union[Message, CallbackQuery]):
         keyboard = [
             [InlineKeyboardButton(text="💸 Изменить цены", callback_data="admin_change_prices")],
             [InlineKeyboardButton(text="➕ Добавить подписку", callback_data="admin_add_subscription")],
             [InlineKeyboardButton(text="➖ Удалить подписку", callback_data="admin_remove_subscription")],
             [InlineKeyboardButton(text="🔍 Поиск пользователя", callback_data="admin_search_user")],
             [InlineKeyboardButton(text="👤 Управление пользователем", callback_data="admin_manage_user")],
+            [InlineKeyboardButton(text="📣 Рассылка", callback_data="admin_broadcast")],
+            [InlineKeyboardButton(text="💰 Расход OpenAI", callback_data="admin_usage")],
         ]
         text = (
             "<b>👑 Админ-панель</b>\n\n"
@@ -68,56 +134,55 @@ class AdminPanelHandler:
             "➖ <b>Удалить подписку</b> — снять подписку с пользователя.\n"
             "🔍 <b>Поиск пользователя</b> — найти пользователя по username или id.\n"
             "👤 <b>Управление пользователем</b> — бан, разбан, удаление, инфо.\n"
+            "📣 <b>Рассылка</b> — сообщение всем пользователям или сегменту.\n"
+            "💰 <b>Расход OpenAI</b> — токены и стоимость за день по планам и пользователям.\n"
         )
         markup = InlineKeyboardMarkup(inline_keyboard=keyboard)
-        if hasattr(update, "callback_query") and update.callback_query:
-            await update.callback_query.edit_message_text(text, reply_markup=markup, parse_mode="HTML")
-        else:
-            await update.message.reply_text(text, reply_markup=markup, parse_mode="HTML")
+        await respond(event, text, reply_markup=markup, parse_mode="HTML")
 
-    async def show_price_list(self, update):
-        from app.infrastructure.database.models.subscribe import SubscriptionPlanModel
-        plans = await SubscriptionPlanModel.all()
+    async def show_price_list(self, cq: CallbackQuery):
+        plans = plan_catalogue.all()
         keyboard = [
-            [InlineKeyboardButton(f"{plan.name.value.upper()} — {plan.price_usd}₽", callback_data=f"admin_edit_price:{plan.id}")]
+            [InlineKeyboardButton(text=f"{plan.name.upper()} — {plan.price_usd}₽", callback_data=f"admin_edit_price:{plan.id}")]
             for plan in plans
         ]
         keyboard.append([InlineKeyboardButton(text="◀️ Назад", callback_data="admin_back")])
         text = "<b>💸 Изменение цен</b>\n\nВыберите план для изменения цены:"
         markup = InlineKeyboardMarkup(inline_keyboard=keyboard)
-        await update.callback_query.edit_message_text(text, reply_markup=markup, parse_mode="HTML")
+        await respond(cq, text, reply_markup=markup, parse_mode="HTML")
 
-    async def ask_new_price(self, update, context, data):
+    async def ask_new_price(self, cq: CallbackQuery, user_data: dict, data: str):
         plan_id = int(data.split(":")[1])
-        context.user_data["edit_price_plan_id"] = plan_id
-        await update.callback_query.edit_message_text("Введите новую цену для этого плана:")
+        user_data["edit_price_plan_id"] = plan_id
+        await respond(cq, "Введите новую цену для этого плана:")
 
-    async def set_new_price(self, update, context):
-        plan_id = context.user_data.get("edit_price_plan_id")
+    async def set_new_price(self, message: Message, user_data: dict):
+        plan_id = user_data.get("edit_price_plan_id")
         if not plan_id:
             return
         try:
-            new_price = float(update.message.text.replace(",", "."))
-            plan = await SubscriptionPlanModel.get_or_none(id=plan_id)
-            if not plan:
-                await update.message.reply_text("План не найден.")
+            new_price = float(message.text.replace(",", "."))
+            updated = await SubscriptionPlanModel.filter(id=plan_id).update(price_usd=new_price)
+            if not updated:
+                await message.answer("План не найден.")
                 return
-            plan.price_usd = new_price
-            await plan.save(update_fields=["price_usd"])
-            del context.user_data["edit_price_plan_id"]
-            await update.message.reply_text(f"Цена для {plan.name.value.upper()} обновлена: ${new_price}")
+            # Каталог планов перечитывается во всех процессах
+            await plan_catalogue.invalidate()
+            plan = plan_catalogue.get(plan_id)
+            del user_data["edit_price_plan_id"]
+            await message.answer(f"Цена для {plan.name.upper()} обновлена: ${new_price}")
         except Exception as e:
-            await update.message.reply_text(f"Ошибка: {e}\nВведите корректную цену.")
+            await message.answer(f"Ошибка: {e}\nВведите корректную цену.")
 
-    async def ask_username_for_subscription(self, update, context):
-        context.user_data["admin_add_subscription"] = True
+    async def ask_username_for_subscription(self, cq: CallbackQuery, user_data: dict):
+        user_data["admin_add_subscription"] = True
         text = "<b>➕ Добавить подписку</b>\n\nВведите username пользователя (без @):"
-        await update.callback_query.edit_message_text(text, parse_mode="HTML")
+        await respond(cq, text, parse_mode="HTML")
 
-    async def ask_plan_for_subscription(self, update, context):
-        username = update.message.text.strip().lstrip("@")
-        context.user_data["admin_add_subscription_username"] = username
-        del context.user_data["admin_add_subscription"]
+    async def ask_plan_for_subscription(self, message: Message, user_data: dict):
+        username = message.text.strip().lstrip("@")
+        user_data["admin_add_subscription_username"] = username
+        del user_data["admin_add_subscription"]
         keyboard = [
             [InlineKeyboardButton(text="PRO", callback_data="admin_add_subscription_plan:pro")],
             [InlineKeyboardButton(text="VIP", callback_data="admin_add_subscription_plan:vip")],
@@ -125,35 +190,35 @@ class AdminPanelHandler:
         ]
         markup = InlineKeyboardMarkup(inline_keyboard=keyboard)
         text = f"<b>➕ Добавить подписку</b>\n\nВыберите план для @{username}:"
-        await update.message.reply_text(text, reply_markup=markup, parse_mode="HTML")
+        await message.answer(text, reply_markup=markup, parse_mode="HTML")
 
-    async def add_subscription_to_user(self, update, context, data):
+    async def add_subscription_to_user(self, cq: CallbackQuery, user_data: dict, data: str):
         plan_name = data.split(":")[1]
-        username = context.user_data.get("admin_add_subscription_username")
+        username = user_data.get("admin_add_subscription_username")
         if not username:
-            await update.callback_query.edit_message_text("Ошибка: username не найден. Начните заново.")
+            await respond(cq, "Ошибка: username не найден. Начните заново.")
             return
-        user = await UserModel.get_or_none(username=username)
+        user = await self.user_repo.get_user_model_by_username(username)
         if not user:
-            await update.callback_query.edit_message_text("Пользователь не найден.")
+            await respond(cq, "Пользователь не найден.")
             return
-        plan = await SubscriptionPlanModel.get_or_none(name=plan_name)
+        plan = plan_catalogue.get_by_name(plan_name)
         if not plan:
-            await update.callback_query.edit_message_text("План не найден.")
+            await respond(cq, "План не найден.")
             return
         await activate_subscription_for_user(user.telegram_id, plan.id, payment_id="admin_grant", payment_amount=0)
-        del context.user_data["admin_add_subscription_username"]
-        await update.callback_query.edit_message_text(f"Пользователю @{username} выдана подписка {plan_name.upper()}.")
+        del user_data["admin_add_subscription_username"]
+        await respond(cq, f"Пользователю @{username} выдана подписка {plan_name.upper()}.")
 
-    async def ask_username_for_remove_subscription(self, update, context):
-        context.user_data["admin_remove_subscription"] = True
+    async def ask_username_for_remove_subscription(self, cq: CallbackQuery, user_data: dict):
+        user_data["admin_remove_subscription"] = True
         text = "<b>➖ Удалить подписку</b>\n\nВведите username пользователя для удаления подписки (без @):"
-        await update.callback_query.edit_message_text(text, parse_mode="HTML")
+        await respond(cq, text, parse_mode="HTML")
 
-    async def ask_plan_for_remove_subscription(self, update, context):
-        username = update.message.text.strip().lstrip("@")
-        context.user_data["admin_remove_subscription_username"] = username
-        del context.user_data["admin_remove_subscription"]
+    async def ask_plan_for_remove_subscription(self, message: Message, user_data: dict):
+        username = message.text.strip().lstrip("@")
+        user_data["admin_remove_subscription_username"] = username
+        del user_data["admin_remove_subscription"]
         keyboard = [
             [InlineKeyboardButton(text="PRO", callback_data="admin_remove_subscription_plan:pro")],
             [InlineKeyboardButton(text="VIP", callback_data="admin_remove_subscription_plan:vip")],
@@ -161,17 +226,17 @@ class AdminPanelHandler:
         ]
         markup = InlineKeyboardMarkup(inline_keyboard=keyboard)
         text = f"<b>➖ Удалить подписку</b>\n\nВыберите план для удаления у @{username}:"
-        await update.message.reply_text(text, reply_markup=markup, parse_mode="HTML")
+        await message.answer(text, reply_markup=markup, parse_mode="HTML")
 
-    async def remove_subscription_from_user(self, update, context, data):
+    async def remove_subscription_from_user(self, cq: CallbackQuery, user_data: dict, data: str):
         plan_name = data.split(":")[1]
-        username = context.user_data.get("admin_remove_subscription_username")
+        username = user_data.get("admin_remove_subscription_username")
         if not username:
-            await update.callback_query.edit_message_text("Ошибка: username не найден. Начните заново.")
+            await respond(cq, "Ошибка: username не найден. Начните заново.")
             return
-        user = await UserModel.get_or_none(username=username)
+        user = await self.user_repo.get_user_model_by_username(username)
         if not user:
-            await update.callback_query.edit_message_text("Пользователь не найден.")
+            await respond(cq, "Пользователь не найден.")
             return
         from app.infrastructure.database.models.subscribe import SubscriptionModel, PlanName
         from datetime import datetime
@@ -179,25 +244,53 @@ class AdminPanelHandler:
         plan_enum = PlanName[plan_name.upper()]
         active_sub = await SubscriptionModel.filter(user=user, is_active=True, end_date__gte=datetime.now(), plan__name=plan_enum).first()
         if not active_sub:
-            await update.callback_query.edit_message_text(f"У пользователя @{username} нет активной подписки {plan_name.upper()}.")
+            await respond(cq, f"У пользователя @{username} нет активной подписки {plan_name.upper()}.")
             return
         active_sub.is_active = False
         await active_sub.save(update_fields=["is_active"])
-        del context.user_data["admin_remove_subscription_username"]
-        await update.callback_query.edit_message_text(f"У пользователя @{username} удалена подписка {plan_name.upper()}.")
+        await invalidate_lk_view(user.telegram_id)
+        del user_data["admin_remove_subscription_username"]
+        await respond(cq, f"У пользователя @{username} удалена подписка {plan_name.upper()}.")
 
-    async def ask_username_for_search(self, update, context):
-        context.user_data["admin_search_user"] = True
+    async def ask_username_for_search(self, cq: CallbackQuery, user_data: dict):
+        user_data["admin_search_user"] = True
         text = "<b>🔍 Поиск пользователя</b>\n\nВведите username или id пользователя для поиска:"
-        await update.callback_query.edit_message_text(text, parse_mode="HTML")
+        await respond(cq, text, parse_mode="HTML")
+
+    async def _find_user(self, message: Message, mode: str) -> Optional[UserModel]:
+        """Поиск по id/username. Несколько совпадений по префиксу — кнопки выбора, возвращает None."""
+        users = await self.user_repo.search_user_models(message.text)
+        if not users:
+            await message.answer("Пользователь не найден.")
+            return None
+        if len(users) == 1 or (users[0].username or "").lower() == message.text.strip().lstrip("@").lower():
+            return users[0]
+        keyboard = [
+            [InlineKeyboardButton(text=f"@{u.username}", callback_data=f"admin_user_pick:{mode}:{u.telegram_id}")]
+            for u in users
+        ]
+        keyboard.append([InlineKeyboardButton(text="◀️ Назад", callback_data="admin_back")])
+        await message.answer("Найдено несколько пользователей:", reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard))
+        return None
 
-    async def show_user_info(self, update, context):
-        query = update.message.text.strip().lstrip("@")
-        del context.user_data["admin_search_user"]
-        user = await UserModel.get_or_none(username=query) or await UserModel.get_or_none(telegram_id=query)
+    async def pick_user(self, cq: CallbackQuery, data: str):
+        _, mode, telegram_id = data.split(":")
+        user = await UserModel.get_or_none(telegram_id=int(telegram_id))
         if not user:
-            await update.message.reply_text("Пользователь не найден.")
+            await respond(cq, "Пользователь не найден.")
             return
+        if mode == "manage":
+            await self.send_manage_user_panel(cq, user)
+        else:
+            await self.send_user_info(cq, user)
+
+    async def show_user_info(self, message: Message, user_data: dict):
+        del user_data["admin_search_user"]
+        user = await self._find_user(message, "info")
+        if user:
+            await self.send_user_info(message, user)
+
+    async def send_user_info(self, event: Union[Message, CallbackQuery], user: UserModel):
         text = (
             f"👤 @{user.username or user.telegram_id}\n"
             f"ID: {user.telegram_id}\n"
@@ -207,32 +300,33 @@ class AdminPanelHandler:
             f"Создан: {user.created_at.strftime('%d.%m.%Y %H:%M')}\n"
             f"Обновлён: {user.updated_at.strftime('%d.%m.%Y %H:%M')}"
         )
-        await update.message.reply_text(text)
+        await respond(event, text)
 
-    async def ask_username_for_manage(self, update, context):
-        context.user_data["admin_manage_user"] = True
+    async def ask_username_for_manage(self, cq: CallbackQuery, user_data: dict):
+        user_data["admin_manage_user"] = True
         text = "<b>👤 Управление пользователем</b>\n\nВведите username или id пользователя для управления:"
-        await update.callback_query.edit_message_text(text, parse_mode="HTML")
+        await respond(cq, text, parse_mode="HTML")
 
-    async def show_manage_user_panel(self, update, context):
-        query = update.message.text.strip().lstrip("@")
-        del context.user_data["admin_manage_user"]
-        user = await UserModel.get_or_none(username=query) or await UserModel.get_or_none(telegram_id=query)
-        if not user:
-            await update.message.reply_text("Пользователь не найден.")
-            return
-        from datetime import datetime
-        now = datetime.utcnow()
+    async def show_manage_user_panel(self, message: Message, user_data: dict):
+        del user_data["admin_manage_user"]
+        user = await self._find_user(message, "manage")
+        if user:
+            await self.send_manage_user_panel(message, user)
+
+    async def send_manage_user_panel(self, event: Union[Message, CallbackQuery], user: UserModel):
+        now = datetime.now(timezone.utc)
         ban_status = "Забанен до: " + user.banned_until.strftime('%d.%m.%Y %H:%M') if user.banned_until and user.banned_until > now else ("Забанен" if user.is_banned else "Не забанен")
+        banned = user.is_banned or bool(user.banned_until and user.banned_until > now)
         keyboard = [
-            [InlineKeyboardButton(text=("🚫 Забанить" if not user.is_banned else "✅ Разбанить"), callback_data=f"admin_user_action:toggle_ban:{user.telegram_id}")],
+            [InlineKeyboardButton(text=("🚫 Забанить" if not banned else "✅ Разбанить"), callback_data=f"admin_user_action:toggle_ban:{user.telegram_id}")],
             [InlineKeyboardButton(text="⏳ Временный бан (24ч)", callback_data=f"admin_user_action:temp_ban:{user.telegram_id}")],
             [InlineKeyboardButton(text="🔄 Сбросить подписку", callback_data=f"admin_user_action:reset_sub:{user.telegram_id}")],
             [InlineKeyboardButton(text="🕓 История сообщений", callback_data=f"admin_user_action:history:{user.telegram_id}")],
+            [InlineKeyboardButton(text="💰 Расход OpenAI", callback_data=f"admin_user_action:usage:{user.telegram_id}")],
             [InlineKeyboardButton(text="❌ Удалить", callback_data=f"admin_user_action:delete:{user.telegram_id}")],
             [InlineKeyboardButton(text="◀️ Назад", callback_data="admin_back")],
         ]
-        markup = InlineKeyboardMarkup(keyboard)
+        markup = InlineKeyboardMarkup(inline_keyboard=keyboard)
         text = (
             f"<b>👤 Управление пользователем</b>\n\n"
             f"👤 @{user.username or user.telegram_id}\n"
@@ -242,63 +336,159 @@ class AdminPanelHandler:
             f"Подписка: {user.subscription_level.value if user.subscription_level else 'free'}\n"
             f"Бан: {ban_status}\n"
         )
-        await update.message.reply_text(text, reply_markup=markup, parse_mode="HTML")
+        await respond(event, text, reply_markup=markup, parse_mode="HTML")
 
-    async def handle_user_action(self, update, context, data):
+    async def handle_user_action(self, cq: CallbackQuery, user_data: dict, data: str):
         parts = data.split(":")
         action = parts[1]
         user_id = int(parts[2])
         user = await UserModel.get_or_none(telegram_id=user_id)
         if not user:
-            await update.callback_query.edit_message_text("Пользователь не найден.")
+            await respond(cq, "Пользователь не найден.")
             return
-        from datetime import datetime, timedelta
         if action == "toggle_admin":
             user.is_admin = not user.is_admin
             await user.save(update_fields=["is_admin"])
-            await update.callback_query.edit_message_text(f"Права администратора для @{user.username or user.telegram_id} изменены.")
+            await respond(cq, f"Права администратора для @{user.username or user.telegram_id} изменены.")
         elif action == "toggle_ban":
-            user.is_banned = not user.is_banned
-            if user.is_banned:
-                user.banned_until = None
+            # Разбан снимает и временный бан (в том числе автоматический за флуд)
+            banned = user.is_banned or bool(user.banned_until and user.banned_until > datetime.now(timezone.utc))
+            user.is_banned = not banned
+            user.banned_until = None
             await user.save(update_fields=["is_banned", "banned_until"])
-            await update.callback_query.edit_message_text(f"Статус бана для @{user.username or user.telegram_id} изменён.")
+            await respond(cq, f"Статус бана для @{user.username or user.telegram_id} изменён.")
         elif action == "temp_ban":
             user.is_banned = True
-            user.banned_until = datetime.utcnow() + timedelta(hours=24)
+            user.banned_until = datetime.now(timezone.utc) + timedelta(hours=24)
             await user.save(update_fields=["is_banned", "banned_until"])
-            await update.callback_query.edit_message_text(f"Пользователь @{user.username or user.telegram_id} забанен на 24 часа.")
+            await respond(cq, f"Пользователь @{user.username or user.telegram_id} забанен на 24 часа.")
         elif action == "reset_sub":
             from app.infrastructure.database.models.subscribe import SubscriptionModel
             await SubscriptionModel.filter(user=user).update(is_active=False)
-            await update.callback_query.edit_message_text(f"У пользователя @{user.username or user.telegram_id} сброшены все подписки.")
-        elif action == "history":
-            from app.infrastructure.database.models.message import MessageModel
-            page = int(context.user_data.get(f"history_page_{user_id}", 0))
-            page_size = 10
-            offset = page * page_size
-            messages = await MessageModel.filter(chat__user=user, is_from_user=True).order_by("-created_at").offset(offset).limit(page_size)
-            total = await MessageModel.filter(chat__user=user, is_from_user=True).count()
-            if not messages:
-                await update.callback_query.edit_message_text("Нет сообщений пользователя.")
-                return
-            text = f"Последние сообщения пользователя (страница {page+1}):\nВсего сообщений: {total}\n\n"
-            for msg in messages:
-                dt = msg.created_at.strftime('%d.%m.%Y %H:%M')
-                content = msg.content[:50].replace('\n', ' ')
-                text += f"[{dt}] {content}\n"
-            last_msg = messages[0].created_at.strftime('%d.%m.%Y %H:%M') if messages else '-'
-            text += f"\nПоследнее сообщение: {last_msg}"
-            keyboard = []
-            if offset + page_size < total:
-                keyboard.append([InlineKeyboardButton(text="Показать ещё", callback_data=f"admin_user_action:history_more:{user_id}")])
-            keyboard.append([InlineKeyboardButton(text="◀️ Назад", callback_data="admin_back")])
-            markup = InlineKeyboardMarkup(inline_keyboard=keyboard)
-            await update.callback_query.edit_message_text(text, reply_markup=markup)
-        elif action == "history_more":
-            page = int(context.user_data.get(f"history_page_{user_id}", 0)) + 1
-            context.user_data[f"history_page_{user_id}"] = page
-            await self.handle_user_action(update, context, f"admin_user_action:history:{user_id}")
+            # update() не шлёт сигналов — сами отправляем чтения пользователя на primary
+            await db_router.mark_write(user.telegram_id)
+            await invalidate_lk_view(user.telegram_id)
+            await respond(cq, f"У пользователя @{user.username or user.telegram_id} сброшены все подписки.")
+        elif action in ("history", "history_more"):
+            await self.show_user_history(cq, user.telegram_id)
+        elif action == "usage":
+            await self.show_user_usage(cq, user)
         elif action == "delete":
             await user.delete()
-            await update.callback_query.edit_message_text(f"Пользователь @{user.username or user.telegram_id} удалён.") 
\ No newline at end of file
+            await respond(cq, f"Пользователь @{user.username or user.telegram_id} удалён.")
+
+    async def show_usage(self, cq: CallbackQuery, day: Optional[date] = None):
+        """Расход OpenAI за день: итоги по планам и самые затратные пользователи."""
+        today = datetime.now(timezone.utc).date()
+        day = day or today
+        plans = await usage_ledger.plan_totals(day)
+        top = await usage_ledger.top_users(day, USAGE_TOP_USERS)
+        names = dict(
+            await UserModel.filter(telegram_id__in=[user_id for user_id, _ in top]).values_list("telegram_id", "username")
+        )
+        text = f"<b>💰 Расход OpenAI за {day.strftime('%d.%m.%Y')}</b> (UTC)\n\n"
+        if not plans:
+            text += "Запросов не было."
+        else:
+            text += "<b>По планам:</b>\n"
+            text += "".join(f"• {plan.upper()}: {format_usage(totals)}\n" for plan, totals in plans)
+            text += "\n<b>Пользователи:</b>\n"
+            text += "".join(
+                f"• @{names.get(user_id) or user_id}: {format_usage(totals)}\n" for user_id, totals in top
+            )
+        navigation = [InlineKeyboardButton(
+            text="◀️ День назад", callback_data=f"admin_usage:{(day - timedelta(days=1)).isoformat()}"
+        )]
+        if day < today:
+            navigation.append(InlineKeyboardButton(
+                text="День вперёд ▶️", callback_data=f"admin_usage:{(day + timedelta(days=1)).isoformat()}"
+            ))
+        keyboard = [navigation, [InlineKeyboardButton(text="◀️ Назад", callback_data="admin_back")]]
+        await respond(cq, text, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard), parse_mode="HTML")
+
+    async def show_user_usage(self, cq: CallbackQuery, user: UserModel):
+        """Расход OpenAI пользователя по дням."""
+        days = await usage_ledger.user_days(user.telegram_id, USAGE_USER_DAYS)
+        text = f"<b>💰 Расход OpenAI @{user.username or user.telegram_id}</b> за {USAGE_USER_DAYS} дн. (UTC)\n\n"
+        if not days:
+            text += "Запросов не было."
+        text += "".join(f"• {day.strftime('%d.%m')}: {format_usage(totals)}\n" for day, totals in days)
+        keyboard = [[InlineKeyboardButton(text="◀️ Назад", callback_data="admin_back")]]
+        await respond(cq, text, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard), parse_mode="HTML")
+
+    async def show_user_history(self, cq: CallbackQuery, telegram_id: int, cursor: Optional[str] = None):
+        """История сообщений пользователя; курсор следующей страницы едет в callback_data."""
+        messages, next_cursor = await self.message_repo.get_user_history_page(telegram_id, cursor, HISTORY_PAGE_SIZE)
+        if not messages:
+            await respond(cq, "Нет сообщений пользователя.")
+            return
+        title = "Последние сообщения пользователя" if not cursor else "Более ранние сообщения пользователя"
+        text = f"{title}:\n\n"
+        for msg in messages:
+            dt = msg.created_at.strftime('%d.%m.%Y %H:%M')
+            content = msg.content[:50].replace('\n', ' ')
+            text += f"[{dt}] {content}\n"
+        keyboard = []
+        if next_cursor:
+            keyboard.append([InlineKeyboardButton(text="Показать ещё", callback_data=f"admin_hist:{telegram_id}:{next_cursor}")])
+        keyboard.append([InlineKeyboardButton(text="◀️ Назад", callback_data="admin_back")])
+        markup = InlineKeyboardMarkup(inline_keyboard=keyboard)
+        await respond(cq, text, reply_markup=markup)
+
+    async def show_broadcast_menu(self, cq: CallbackQuery, user_data: dict):
+        user_data.pop("admin_broadcast_segment", None)
+        keyboard = [
+            [InlineKeyboardButton(text=title, callback_data=f"admin_broadcast_segment:{segment.value}")]
+            for segment, title in SEGMENT_TITLES.items()
+        ]
+        recent = await BroadcastModel.all().limit(5)
+        for broadcast in recent:
+            keyboard.append([InlineKeyboardButton(
+                text=f"#{broadcast.id} {SEGMENT_TITLES[broadcast.segment]} — {broadcast.status.value}",
+                callback_data=f"admin_broadcast_status:{broadcast.id}",
+            )])
+        keyboard.append([InlineKeyboardButton(text="◀️ Назад", callback_data="admin_back")])
+        text = "<b>📣 Рассылка</b>\n\nВыберите сегмент получателей или откройте одну из последних рассылок:"
+        await respond(cq, text, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard), parse_mode="HTML")
+
+    async def ask_broadcast_text(self, cq: CallbackQuery, user_data: dict, data: str):
+        segment = BroadcastSegment(data.split(":")[1])
+        user_data["admin_broadcast_segment"] = segment.value
+        text = (
+            f"<b>📣 Рассылка: {SEGMENT_TITLES[segment]}</b>\n\n"
+            "Отправьте текст сообщения. Форматирование сохранится."
+        )
+        await respond(cq, text, parse_mode="HTML")
+
+    async def create_broadcast(self, message: Message, user_data: dict, user: User):
+        segment = BroadcastSegment(user_data.pop("admin_broadcast_segment"))
+        broadcast = await broadcast_service.create(message.html_text, segment, user.telegram_id)
+        progress = broadcast_service.snapshot(broadcast)
+        text = (
+            f"{progress.render()}\n\n"
+            f"<b>Сегмент:</b> {SEGMENT_TITLES[segment]}\n"
+            f"<b>Текст:</b>\n{broadcast.text}"
+        )
+        reply_markup = KeyboardManager.get_broadcast_status_keyboard(broadcast.id, progress.state)
+        await message.answer(text, reply_markup=reply_markup, parse_mode="HTML")
+
+    async def start_broadcast(self, cq: CallbackQuery, data: str):
+        broadcast_id = int(data.split(":")[1])
+        started = await broadcast_service.start(cq.bot, broadcast_id, cq.message.chat.id, cq.message.message_id)
+        if not started:
+            await cq.answer("Рассылка уже идёт или завершена.", show_alert=True)
+        await self.show_broadcast_status(cq, f"admin_broadcast_status:{broadcast_id}")
+
+    async def show_broadcast_status(self, cq: CallbackQuery, data: str):
+        broadcast = await BroadcastModel.get_or_none(id=int(data.split(":")[1]))
+        if not broadcast:
+            await respond(cq, "Рассылка не найдена.")
+            return
+        progress = broadcast_service.snapshot(broadcast)
+        reply_markup = KeyboardManager.get_broadcast_status_keyboard(broadcast.id, progress.state)
+        await respond(cq, progress.render(), reply_markup=reply_markup, parse_mode="HTML")
+
+    async def cancel_broadcast(self, cq: CallbackQuery, data: str):
+        broadcast_id = int(data.split(":")[1])
+        await broadcast_service.cancel(broadcast_id)
+        await self.show_broadcast_status(cq, f"admin_broadcast_status:{broadcast_id}")
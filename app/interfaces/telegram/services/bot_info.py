@@ -0,0 +1,99 @@
+import asyncio
+import hashlib
+import json
+import time
+from typing import List, Optional
+
+from aiogram import Bot
+from aiogram.types import BotCommand, User as TgUser
+
+from app.config import settings
+from app.infrastructure.redis.redis_client import redis_client
+from app.infrastructure.logging.setup_logger import logger
+
+# Меню команд бота
+BOT_COMMANDS: List[BotCommand] = [
+    BotCommand(command="start", description="🚀 Начать/Перезапустить диалог"),
+    BotCommand(command="upgrade", description="💎 Улучшить подписку"),
+    BotCommand(command="lk", description="📱 Личный кабинет"),
+]
+
+
+class BotInfoService:
+    """Статические данные бота: профиль из ``get_me`` и меню команд.
+
+    Профиль запрашивается один раз при старте и дальше обновляется в фоне,
+    поэтому хендлеры не делают лишний запрос к Telegram на каждый апдейт.
+    """
+
+    COMMANDS_HASH_KEY = "bot:commands_hash"
+
+    def __init__(self, refresh_interval: int = 3600):
+        self.refresh_interval = refresh_interval
+        self._me: Optional[TgUser] = None
+        self._fetched_at: float = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def start(self, bot: Bot) -> None:
+        """Загрузить профиль и запустить периодическое обновление."""
+        await self.refresh(bot)
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop(bot))
+
+    async def stop(self) -> None:
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def refresh(self, bot: Bot) -> TgUser:
+        self._me = await bot.get_me()
+        self._fetched_at = time.monotonic()
+        logger.info(f"[BOT_INFO] Профиль обновлён: @{self._me.username}")
+        return self._me
+
+    async def _refresh_loop(self, bot: Bot) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh(bot)
+            except Exception as e:
+                # Оставляем прежний профиль, попробуем в следующий раз
+                logger.warning(f"[BOT_INFO] Не удалось обновить профиль: {e}")
+
+    async def get_me(self, bot: Bot) -> TgUser:
+        if self._me is None:
+            return await self.refresh(bot)
+        return self._me
+
+    async def username(self, bot: Bot) -> str:
+        return (await self.get_me(bot)).username
+
+    async def referral_link(self, bot: Bot, telegram_id: int) -> str:
+        return f"https://t.me/{await self.username(bot)}?start=ref_{telegram_id}"
+
+    @staticmethod
+    def commands_hash(bot_id: int, commands: List[BotCommand]) -> str:
+        payload = json.dumps(
+            [bot_id, [[c.command, c.description] for c in commands]], ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def sync_commands(self, bot: Bot, commands: List[BotCommand] = BOT_COMMANDS) -> bool:
+        """Установить меню команд, только если оно изменилось. Возвращает True, если был вызов API."""
+        digest = self.commands_hash(bot.id, commands)
+        if await redis_client.get_cache(self.COMMANDS_HASH_KEY) == digest:
+            logger.info("[BOT_INFO] Меню команд не изменилось, set_my_commands пропущен")
+            return False
+        await bot.set_my_commands(commands)
+        # Без TTL в set_cache нельзя, поэтому храним долго: при истечении просто переустановим
+        await redis_client.set_cache(self.COMMANDS_HASH_KEY, digest, ttl=30 * 24 * 3600)
+        logger.info("[BOT_INFO] Меню команд обновлено")
+        return True
+
+
+# Глобальный экземпляр
+bot_info = BotInfoService(refresh_interval=settings.bot_info_refresh_interval)
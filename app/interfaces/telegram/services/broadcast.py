@@ -0,0 +1,361 @@
+"""Рассылки из админ-панели.
+
+Получатели читаются из ``users`` постранично по ключу (``telegram_id > last_id``),
+каждая страница отправляется пулом воркеров через общий лимитер исходящих
+запросов с приоритетом BULK, затем результаты доставки пишутся одним
+``bulk_create``, а ``last_id`` страницы сохраняется в Redis как чекпоинт.
+При остановке или ошибке посреди страницы результаты уже отправленных
+сообщений сохраняются до выхода. После рестарта рассылку можно продолжить с
+чекпоинта: получатели с записанным результатом пропускаются.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from tortoise.expressions import Q
+from tortoise.queryset import QuerySet
+from tortoise.transactions import in_transaction
+
+from app.config import settings
+from app.infrastructure.database.models.broadcast import (
+    BroadcastDeliveryModel,
+    BroadcastModel,
+    BroadcastSegment,
+    BroadcastStatus,
+    DeliveryStatus,
+)
+from app.infrastructure.database.models.subscribe import PlanName
+from app.infrastructure.database.models.user import UserModel
+from app.infrastructure.metrics.registry import registry
+from app.infrastructure.redis.redis_client import redis_client
+from app.infrastructure.logging.setup_logger import logger
+from app.interfaces.telegram.outbound import SendPriority, send_priority
+from app.interfaces.telegram.services.keyboard_manager import KeyboardManager
+
+SEGMENT_TITLES: Dict[BroadcastSegment, str] = {
+    BroadcastSegment.ALL: "Все пользователи",
+    BroadcastSegment.FREE: "Free",
+    BroadcastSegment.PRO: "PRO",
+    BroadcastSegment.VIP: "VIP",
+    BroadcastSegment.VIP_EXPIRING: "VIP, истекает за 7 дней",
+}
+
+DELIVERIES = registry.counter("broadcast_deliveries_total", "Доставки рассылок по статусу", ["status"])
+
+CHECKPOINT_TTL = 7 * 24 * 3600
+
+STATE_TITLES = {
+    "running": "",
+    "finished": " — завершена",
+    "cancelled": " — остановлена",
+    "interrupted": " — прервана, можно продолжить",
+    "draft": " — черновик",
+}
+
+MODEL_STATES = {
+    BroadcastStatus.DRAFT: "draft",
+    # RUNNING в БД без живой задачи — процесс перезапускался посреди рассылки
+    BroadcastStatus.RUNNING: "interrupted",
+    BroadcastStatus.FINISHED: "finished",
+    BroadcastStatus.CANCELLED: "cancelled",
+}
+
+
+@dataclass
+class BroadcastProgress:
+    broadcast_id: int
+    total: int = 0
+    counts: Dict[DeliveryStatus, int] = field(default_factory=lambda: {s: 0 for s in DeliveryStatus})
+    # Обработано до текущего запуска (при продолжении с чекпоинта)
+    resumed: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    state: str = "running"
+
+    @property
+    def active(self) -> bool:
+        return self.state == "running"
+
+    @property
+    def processed(self) -> int:
+        return sum(self.counts.values())
+
+    @property
+    def rate(self) -> float:
+        elapsed = time.monotonic() - self.started_at
+        return (self.processed - self.resumed) / elapsed if elapsed > 0 else 0.0
+
+    def render(self) -> str:
+        eta = ""
+        if self.active and self.rate > 0 and self.total > self.processed:
+            eta = f"\n⏱ Осталось ~{int((self.total - self.processed) / self.rate)} с"
+        return (
+            f"<b>📣 Рассылка #{self.broadcast_id}</b>{STATE_TITLES[self.state]}\n\n"
+            f"Обработано: {self.processed}/{self.total}\n"
+            f"✅ Доставлено: {self.counts[DeliveryStatus.SENT]}\n"
+            f"🚫 Заблокировали бота: {self.counts[DeliveryStatus.BLOCKED]}\n"
+            f"🗑 Удалённые аккаунты: {self.counts[DeliveryStatus.DELETED]}\n"
+            f"⚠️ Ошибки: {self.counts[DeliveryStatus.FAILED]}\n"
+            f"⚡️ Скорость: {self.rate:.1f} сообщ./с"
+            f"{eta}"
+        )
+
+
+def segment_queryset(segment: BroadcastSegment) -> QuerySet:
+    """Получатели сегмента (забаненные исключаются)."""
+    query = UserModel.filter(is_banned=False)
+    if segment == BroadcastSegment.FREE:
+        return query.filter(Q(subscription_level__isnull=True) | Q(subscription_level=PlanName.FREE))
+    if segment == BroadcastSegment.PRO:
+        return query.filter(subscription_level=PlanName.PRO)
+    if segment == BroadcastSegment.VIP:
+        return query.filter(subscription_level=PlanName.VIP)
+    if segment == BroadcastSegment.VIP_EXPIRING:
+        now = datetime.now(timezone.utc)
+        return query.filter(
+            subscriptions__plan__name=PlanName.VIP,
+            subscriptions__is_active=True,
+            subscriptions__end_date__gte=now,
+            subscriptions__end_date__lte=now + timedelta(days=7),
+        ).distinct()
+    return query
+
+
+def classify_error(error: Exception) -> Tuple[DeliveryStatus, str]:
+    text = str(error)
+    lowered = text.lower()
+    if isinstance(error, TelegramForbiddenError):
+        if "deactivated" in lowered:
+            return DeliveryStatus.DELETED, text
+        return DeliveryStatus.BLOCKED, text
+    if isinstance(error, TelegramBadRequest) and "chat not found" in lowered:
+        return DeliveryStatus.DELETED, text
+    return DeliveryStatus.FAILED, text
+
+
+class BroadcastService:
+    """Запуск, возобновление и учёт прогресса рассылок."""
+
+    def __init__(self, workers: int = 20, page_size: int = 500, report_interval: float = 5.0):
+        self.workers = workers
+        self.page_size = page_size
+        self.report_interval = report_interval
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._progress: Dict[int, BroadcastProgress] = {}
+
+    @staticmethod
+    def checkpoint_key(broadcast_id: int) -> str:
+        return f"broadcast:{broadcast_id}:last_id"
+
+    async def create(self, text: str, segment: BroadcastSegment, created_by: int) -> BroadcastModel:
+        total = await segment_queryset(segment).count()
+        return await BroadcastModel.create(text=text, segment=segment, created_by=created_by, total=total)
+
+    def is_running(self, broadcast_id: int) -> bool:
+        task = self._tasks.get(broadcast_id)
+        return bool(task and not task.done())
+
+    def snapshot(self, broadcast: BroadcastModel) -> BroadcastProgress:
+        """Прогресс рассылки: живой, если она идёт в этом процессе, иначе из БД."""
+        progress = self._progress.get(broadcast.id)
+        if progress:
+            return progress
+        progress = BroadcastProgress(broadcast_id=broadcast.id, total=broadcast.total, state=MODEL_STATES[broadcast.status])
+        for status in DeliveryStatus:
+            progress.counts[status] = getattr(broadcast, status.value)
+        return progress
+
+    async def recipient_pages(self, segment: BroadcastSegment, last_id: int):
+        """Страницы telegram_id по возрастанию, начиная после ``last_id``."""
+        while True:
+            ids: List[int] = await (
+                segment_queryset(segment)
+                .filter(telegram_id__gt=last_id)
+                .order_by("telegram_id")
+                .limit(self.page_size)
+                .values_list("telegram_id", flat=True)
+            )
+            if not ids:
+                return
+            yield ids
+            last_id = ids[-1]
+
+    async def start(
+        self, bot: Bot, broadcast_id: int, report_chat_id: Optional[int] = None, report_message_id: Optional[int] = None
+    ) -> bool:
+        """Запустить (или продолжить с чекпоинта) рассылку в фоне."""
+        if self.is_running(broadcast_id):
+            return False
+        broadcast = await BroadcastModel.get_or_none(id=broadcast_id)
+        if not broadcast or broadcast.status in (BroadcastStatus.FINISHED, BroadcastStatus.CANCELLED):
+            return False
+        progress = BroadcastProgress(broadcast_id=broadcast.id, total=broadcast.total)
+        for status in DeliveryStatus:
+            progress.counts[status] = getattr(broadcast, status.value)
+        progress.resumed = progress.processed
+        self._progress[broadcast.id] = progress
+        self._tasks[broadcast_id] = asyncio.create_task(
+            self._run(bot, broadcast, progress, report_chat_id, report_message_id)
+        )
+        return True
+
+    async def cancel(self, broadcast_id: int) -> None:
+        task = self._tasks.get(broadcast_id)
+        if task and not task.done():
+            task.cancel()
+            await asyncio.wait([task], timeout=5)
+        elif broadcast_id in self._progress:
+            self._progress[broadcast_id].state = "cancelled"
+        await BroadcastModel.filter(id=broadcast_id).update(
+            status=BroadcastStatus.CANCELLED, finished_at=datetime.now(timezone.utc)
+        )
+
+    async def _run(
+        self,
+        bot: Bot,
+        broadcast: BroadcastModel,
+        progress: BroadcastProgress,
+        report_chat_id: Optional[int],
+        report_message_id: Optional[int],
+    ) -> None:
+        reporter = None
+        if report_chat_id and report_message_id:
+            reporter = asyncio.create_task(self._report_loop(bot, progress, report_chat_id, report_message_id))
+
+        last_id = int(await redis_client.get_cache(self.checkpoint_key(broadcast.id)) or 0)
+        broadcast.status = BroadcastStatus.RUNNING
+        broadcast.started_at = broadcast.started_at or datetime.now(timezone.utc)
+        await broadcast.save(update_fields=["status", "started_at"])
+        logger.info(f"[BROADCAST] #{broadcast.id} старт, сегмент={broadcast.segment.value}, last_id={last_id}")
+
+        semaphore = asyncio.Semaphore(self.workers)
+        # Результаты текущей страницы по мере доставки — чтобы сохранить их и при прерывании
+        outcomes: List[BroadcastDeliveryModel] = []
+        try:
+            with send_priority(SendPriority.BULK):
+                first_page = True
+                async for ids in self.recipient_pages(broadcast.segment, last_id):
+                    page_last_id = ids[-1]
+                    if first_page:
+                        # Страница после чекпоинта могла быть отправлена частично — в том числе
+                        # запуском, упавшим до сохранения счётчиков, поэтому проверяем всегда
+                        ids = await self._undelivered(broadcast.id, ids)
+                        first_page = False
+                    await asyncio.gather(
+                        *(self._deliver(bot, semaphore, broadcast, chat_id, outcomes) for chat_id in ids)
+                    )
+                    # Отмена во время записи не должна оставить страницу записанной наполовину
+                    page, outcomes = outcomes, []
+                    await asyncio.shield(self._save_outcomes(broadcast, progress, page))
+                    await redis_client.set_cache(self.checkpoint_key(broadcast.id), page_last_id, ttl=CHECKPOINT_TTL)
+            broadcast.status = BroadcastStatus.FINISHED
+            broadcast.finished_at = datetime.now(timezone.utc)
+            await broadcast.save(update_fields=["status", "finished_at"])
+            await redis_client.delete_cache(self.checkpoint_key(broadcast.id))
+            progress.state = "finished"
+            logger.info(f"[BROADCAST] #{broadcast.id} завершена: {progress.processed} получателей")
+        except asyncio.CancelledError:
+            progress.state = "cancelled"
+            await asyncio.shield(self._save_partial(broadcast, progress, outcomes))
+            logger.info(f"[BROADCAST] #{broadcast.id} остановлена на {progress.processed}")
+            raise
+        except Exception as e:
+            progress.state = "interrupted"
+            await self._save_partial(broadcast, progress, outcomes)
+            logger.error(f"[BROADCAST] #{broadcast.id} прервана: {e}")
+        finally:
+            if reporter:
+                reporter.cancel()
+                await self._report(bot, progress, report_chat_id, report_message_id)
+
+    @staticmethod
+    async def _undelivered(broadcast_id: int, ids: List[int]) -> List[int]:
+        done = set(
+            await BroadcastDeliveryModel.filter(broadcast_id=broadcast_id, telegram_id__in=ids)
+            .values_list("telegram_id", flat=True)
+        )
+        return [chat_id for chat_id in ids if chat_id not in done]
+
+    async def _save_outcomes(
+        self, broadcast: BroadcastModel, progress: BroadcastProgress, outcomes: List[BroadcastDeliveryModel]
+    ) -> None:
+        if not outcomes:
+            return
+        # Строки и счётчики пишутся вместе: уже записанная строка уже учтена в счётчиках
+        async with in_transaction():
+            unrecorded = set(await self._undelivered(broadcast.id, [outcome.telegram_id for outcome in outcomes]))
+            new = [outcome for outcome in outcomes if outcome.telegram_id in unrecorded]
+            await BroadcastDeliveryModel.bulk_create(new, ignore_conflicts=True)
+            counts = dict(progress.counts)
+            for outcome in new:
+                counts[outcome.status] += 1
+            await self._save_counters(broadcast, counts)
+        progress.counts = counts
+
+    async def _save_partial(
+        self, broadcast: BroadcastModel, progress: BroadcastProgress, outcomes: List[BroadcastDeliveryModel]
+    ) -> None:
+        """Сохранить результаты уже отправленных сообщений прерванной страницы."""
+        try:
+            await self._save_outcomes(broadcast, progress, list(outcomes))
+        except Exception as e:
+            logger.error(f"[BROADCAST] #{broadcast.id} результаты {len(outcomes)} доставок не сохранены: {e}")
+
+    async def _deliver(
+        self,
+        bot: Bot,
+        semaphore: asyncio.Semaphore,
+        broadcast: BroadcastModel,
+        chat_id: int,
+        outcomes: List[BroadcastDeliveryModel],
+    ) -> None:
+        async with semaphore:
+            status, error = DeliveryStatus.SENT, None
+            try:
+                await bot.send_message(chat_id, broadcast.text)
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                status, error = classify_error(e)
+            except Exception as e:
+                status, error = DeliveryStatus.FAILED, str(e)
+            DELIVERIES.inc(status=status.value)
+            outcomes.append(BroadcastDeliveryModel(
+                broadcast_id=broadcast.id,
+                telegram_id=chat_id,
+                status=status,
+                error=error[:255] if error else None,
+            ))
+
+    @staticmethod
+    async def _save_counters(broadcast: BroadcastModel, counts: Dict[DeliveryStatus, int]) -> None:
+        await BroadcastModel.filter(id=broadcast.id).update(
+            sent=counts[DeliveryStatus.SENT],
+            blocked=counts[DeliveryStatus.BLOCKED],
+            deleted=counts[DeliveryStatus.DELETED],
+            failed=counts[DeliveryStatus.FAILED],
+        )
+
+    async def _report_loop(self, bot: Bot, progress: BroadcastProgress, chat_id: int, message_id: int) -> None:
+        while True:
+            await asyncio.sleep(self.report_interval)
+            await self._report(bot, progress, chat_id, message_id)
+
+    @staticmethod
+    async def _report(bot: Bot, progress: BroadcastProgress, chat_id: int, message_id: int) -> None:
+        try:
+            await bot.edit_message_text(
+                progress.render(),
+                chat_id=chat_id,
+                message_id=message_id,
+                reply_markup=KeyboardManager.get_broadcast_status_keyboard(progress.broadcast_id, progress.state),
+            )
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e).lower():
+                logger.warning(f"[BROADCAST] Не удалось обновить прогресс: {e}")
+
+
+# Глобальный экземпляр
+broadcast_service = BroadcastService(workers=settings.broadcast_workers, page_size=settings.broadcast_page_size)
@@ -1,15 +1,16 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from app.infrastructure.database.models.subscribe import SubscriptionPlanModel, PlanName
+from app.infrastructure.database.models.subscribe import PlanName
+from app.infrastructure.services.plan_catalogue import plan_catalogue
 
 
 class KeyboardManager:
     @staticmethod
     async def get_subscription_keyboard() -> InlineKeyboardMarkup:
-        plans = await SubscriptionPlanModel.filter(is_active=True).all()
+        plans = plan_catalogue.active()
         keyboard = [
             [InlineKeyboardButton(
-                text=(f"⭐️ {plan.name.value.upper()} - ${plan.price_usd}" if plan.name == PlanName.PRO else f"👑 {plan.name.value.upper()} - ${plan.price_usd}"),
-                callback_data=f"choose_plan:{plan.name.value}"
+                text=(f"⭐️ {plan.name.upper()} - ${plan.price_usd}" if plan.name == PlanName.PRO else f"👑 {plan.name.upper()} - ${plan.price_usd}"),
+                callback_data=f"choose_plan:{plan.name}"
             )] for plan in plans
         ]
         keyboard.append([InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_lk")])
@@ -19,6 +20,12 @@ class KeyboardManager:
     def get_upsell_keyboard(offer: dict, callback_data: str) -> InlineKeyboardMarkup:
         return InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text=offer["button"], callback_data=callback_data)]])
 
+    @staticmethod
+    def get_stop_generation_keyboard() -> InlineKeyboardMarkup:
+        return InlineKeyboardMarkup(
+            inline_keyboard=[[InlineKeyboardButton(text="⏹ Остановить", callback_data="gpt_stop")]]
+        )
+
     @staticmethod
     def get_lk_inline_keyboard() -> InlineKeyboardMarkup:
         return InlineKeyboardMarkup(
@@ -34,4 +41,15 @@ class KeyboardManager:
             [InlineKeyboardButton(text="Поиск пользователя", callback_data="admin_search_user")],
             [InlineKeyboardButton(text="Управление пользователем", callback_data="admin_manage_user")],
         ]
-        return InlineKeyboardMarkup(inline_keyboard=keyboard)
\ No newline at end of file
+        return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+    @staticmethod
+    def get_broadcast_status_keyboard(broadcast_id: int, state: str) -> InlineKeyboardMarkup:
+        keyboard = [[InlineKeyboardButton(text="🔄 Обновить", callback_data=f"admin_broadcast_status:{broadcast_id}")]]
+        if state == "running":
+            keyboard.append([InlineKeyboardButton(text="⛔️ Остановить", callback_data=f"admin_broadcast_cancel:{broadcast_id}")])
+        elif state in ("draft", "interrupted"):
+            title = "▶️ Запустить" if state == "draft" else "▶️ Продолжить"
+            keyboard.append([InlineKeyboardButton(text=title, callback_data=f"admin_broadcast_start:{broadcast_id}")])
+        keyboard.append([InlineKeyboardButton(text="◀️ Назад", callback_data="admin_broadcast")])
+        return InlineKeyboardMarkup(inline_keyboard=keyboard)
@@ -1,27 +1,53 @@
-from typing import Any
-from aiogram.types import InlineKeyboardMarkup
+import asyncio
+from typing import List, Optional, Union
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message
 from app.core.bot_character import NEURO_ASSISTANT
 from app.interfaces.telegram.services.keyboard_manager import KeyboardManager
+from app.interfaces.telegram.services.message_splitter import (
+    TELEGRAM_MESSAGE_LIMIT,
+    StreamSplitter,
+    split_message,
+)
+from app.infrastructure.logging.setup_logger import logger
+
+
+async def respond(
+    event: Union[Message, CallbackQuery],
+    text: str,
+    reply_markup: Optional[InlineKeyboardMarkup] = None,
+    parse_mode: Optional[str] = None,
+) -> None:
+    """Редактирует сообщение под inline-кнопкой или отвечает новым сообщением."""
+    if isinstance(event, CallbackQuery):
+        try:
+            await event.message.edit_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e).lower():
+                raise
+    else:
+        await event.answer(text, reply_markup=reply_markup, parse_mode=parse_mode)
 
 
 class MessageSender:
-    async def send_welcome_message(self, update: Any, is_new_user: bool, reply_markup: InlineKeyboardMarkup) -> None:
+    async def send_welcome_message(self, message: Message, is_new_user: bool, reply_markup: InlineKeyboardMarkup) -> None:
         if is_new_user:
             welcome_text = (
                 "Maze активен. Говори."
             )
         else:
             welcome_text = "С возвращением! Чем могу помочь?"
-        
-        await update.message.reply_text(welcome_text, parse_mode="HTML")
 
-    async def send_error(self, update: Any, message: str) -> None:
-        if update.callback_query:
-            await update.callback_query.answer(message, show_alert=True)
+        await message.answer(welcome_text, parse_mode="HTML")
+
+    async def send_error(self, event: Union[Message, CallbackQuery], message: str) -> None:
+        if isinstance(event, CallbackQuery):
+            await event.answer(message, show_alert=True)
         else:
-            await update.message.reply_text(message)
+            await event.answer(message)
 
-    async def send_upsell_offer(self, update: Any, context: Any, trigger: str) -> None:
+    async def send_upsell_offer(self, message: Message, trigger: str) -> None:
         offer = None
         callback_data = ""
         if trigger in NEURO_ASSISTANT.upsell_triggers["base_to_pro"]:
@@ -36,4 +62,96 @@ class MessageSender:
 
         if offer:
             reply_markup = KeyboardManager.get_upsell_keyboard(offer, callback_data)
-            await update.message.reply_text(text=offer["text"], reply_markup=reply_markup)
+            await message.answer(text=offer["text"], reply_markup=reply_markup)
+
+
+class ChunkedReply:
+    """Доставка ответа GPT частями по мере генерации.
+
+    Фрагменты потока копятся в ``StreamSplitter``; каждая готовая часть (до
+    4096 символов) уходит сразу, не дожидаясь конца ответа. Первая часть
+    заменяет заглушку «Думаю...», если она есть, остальные — новые сообщения
+    строго по порядку через общий лимитер исходящих запросов.
+    """
+
+    def __init__(self, bot: Bot, chat_id: int, limit: int = TELEGRAM_MESSAGE_LIMIT):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.splitter = StreamSplitter(limit)
+        self.placeholder_id: Optional[int] = None
+        self.sent = 0
+        self._parts: List[str] = []
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts).strip()
+
+    def feed(self, delta: str) -> None:
+        self._parts.append(delta)
+        for chunk in self.splitter.feed(delta):
+            self._queue.put_nowait(chunk)
+
+    def start(self, placeholder_id: Optional[int] = None) -> None:
+        """Начать отправку; до этого готовые части только копятся."""
+        self.placeholder_id = placeholder_id
+        self._worker = asyncio.create_task(self._deliver())
+
+    async def finish(self, tail: str = "") -> None:
+        """Дописать ``tail``, отправить остаток и дождаться доставки всех частей."""
+        if tail:
+            self.feed(tail)
+        for chunk in self.splitter.flush():
+            self._queue.put_nowait(chunk)
+        self._queue.put_nowait(None)
+        await self._worker
+
+    async def abort(self) -> None:
+        """Прекратить отправку; неотправленные части отбрасываются."""
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+
+    async def discard(self) -> None:
+        """Прекратить отправку и убрать заглушку, если ничего не успело уйти."""
+        await self.abort()
+        if self.sent == 0 and self.placeholder_id:
+            await self.bot.delete_message(chat_id=self.chat_id, message_id=self.placeholder_id)
+
+    async def send_text(self, text: str) -> None:
+        """Отправить готовый текст следующими частями (после ``abort``)."""
+        for chunk in split_message(text):
+            await self._send(chunk)
+
+    async def _deliver(self) -> None:
+        while True:
+            chunk = await self._queue.get()
+            if chunk is None:
+                return
+            try:
+                await self._send(chunk)
+            except Exception as e:
+                # Одна неотправленная часть не должна останавливать остальные
+                logger.error(f"[REPLY] Часть ответа для {self.chat_id} не отправлена: {e}")
+
+    async def _send(self, chunk: str) -> None:
+        try:
+            await self._send_chunk(chunk)
+        except TelegramBadRequest as e:
+            if "can't parse entities" not in str(e).lower():
+                raise
+            # Модель прислала невалидный HTML — отправляем часть без разметки
+            await self._send_chunk(chunk, parse_mode=None)
+
+    async def _send_chunk(self, chunk: str, **kwargs) -> None:
+        if self.sent == 0 and self.placeholder_id:
+            await self.bot.edit_message_text(
+                text=chunk, chat_id=self.chat_id, message_id=self.placeholder_id, **kwargs
+            )
+        else:
+            await self.bot.send_message(chat_id=self.chat_id, text=chunk, **kwargs)
+        self.sent += 1
@@ -0,0 +1,110 @@
+"""Разбиение длинного текста на сообщения Telegram (лимит 4096 символов).
+
+Текст режется по границе абзаца, строки, предложения или слова — что
+найдётся ближе к лимиту, но не раньше его половины. Разметка parse_mode=HTML
+не ломается: разрез не попадает внутрь тега или сущности (``&amp;``), а теги,
+открытые на месте разреза, закрываются в конце части и открываются заново в
+начале следующей. ``StreamSplitter`` делает то же для потокового ответа:
+отдаёт готовые части, пока генерация ещё идёт.
+"""
+
+import re
+from typing import List, Tuple
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+TAG_RE = re.compile(r"<(/?)([a-zA-Z][a-zA-Z0-9-]*)[^<>]*>")
+SENTENCE_END_RE = re.compile(r"[.!?…][»\")]*\s")
+# Разделители по убыванию предпочтения
+BREAKS = ("\n\n", "\n")
+
+
+def _safe_cut(text: str, cut: int) -> int:
+    """Сдвинуть разрез левее, если он внутри тега или HTML-сущности."""
+    tag_start = text.rfind("<", 0, cut)
+    if tag_start > text.rfind(">", 0, cut):
+        cut = tag_start
+    entity_start = text.rfind("&", 0, cut)
+    if entity_start != -1 and cut - entity_start < 10 and ";" not in text[entity_start:cut]:
+        cut = entity_start
+    return cut
+
+
+def _find_cut(text: str, budget: int) -> int:
+    window = text[:budget]
+    floor = budget // 2
+    for separator in BREAKS:
+        position = window.rfind(separator)
+        if position >= floor:
+            return _safe_cut(text, position + len(separator))
+    sentence_ends = [m.end() for m in SENTENCE_END_RE.finditer(window, floor)]
+    if sentence_ends:
+        return _safe_cut(text, sentence_ends[-1])
+    position = window.rfind(" ")
+    if position >= floor:
+        return _safe_cut(text, position + 1)
+    return _safe_cut(text, budget) or budget
+
+
+def _open_tags(text: str) -> List[Tuple[str, str]]:
+    """Теги, открытые в конце ``text``: (имя, исходный открывающий тег)."""
+    stack: List[Tuple[str, str]] = []
+    for match in TAG_RE.finditer(text):
+        closing, name = match.group(1), match.group(2).lower()
+        if not closing:
+            stack.append((name, match.group(0)))
+            continue
+        for i in range(len(stack) - 1, -1, -1):
+            if stack[i][0] == name:
+                del stack[i:]
+                break
+    return stack
+
+
+def split_once(text: str, limit: int = TELEGRAM_MESSAGE_LIMIT) -> Tuple[str, str]:
+    """Отрезать от ``text`` первую часть не длиннее ``limit``; вернуть (часть, остаток)."""
+    if len(text) <= limit:
+        return text, ""
+    budget = limit
+    while True:
+        cut = _find_cut(text, budget)
+        open_tags = _open_tags(text[:cut])
+        closers = "".join(f"</{name}>" for name, _ in reversed(open_tags))
+        if cut + len(closers) <= limit or budget <= limit // 2:
+            break
+        budget = limit - len(closers)
+    head = text[:cut].rstrip() + closers
+    tail = "".join(tag for _, tag in open_tags) + text[cut:].lstrip()
+    return head, tail
+
+
+def split_message(text: str, limit: int = TELEGRAM_MESSAGE_LIMIT) -> List[str]:
+    """Весь текст — списком частей для отдельных сообщений."""
+    chunks = []
+    while text:
+        chunk, text = split_once(text, limit)
+        if chunk.strip():
+            chunks.append(chunk)
+    return chunks
+
+
+class StreamSplitter:
+    """Накопитель фрагментов потокового ответа, отдающий готовые части."""
+
+    def __init__(self, limit: int = TELEGRAM_MESSAGE_LIMIT):
+        self.limit = limit
+        self._buffer = ""
+
+    def feed(self, delta: str) -> List[str]:
+        self._buffer += delta
+        chunks = []
+        # Запас в лимит: часть отрезается, только когда за разрезом уже есть текст
+        while len(self._buffer) > self.limit:
+            chunk, self._buffer = split_once(self._buffer, self.limit)
+            if chunk.strip():
+                chunks.append(chunk)
+        return chunks
+
+    def flush(self) -> List[str]:
+        chunks, self._buffer = split_message(self._buffer, self.limit), ""
+        return chunks
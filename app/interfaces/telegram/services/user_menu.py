@@ -1,5 +1,7 @@
-from typing import Any
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from typing import Union
+from aiogram import Bot
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, Message
+from app.interfaces.telegram.services.message_sender import respond
 
 class UserMenuHandler:
     MODES = [
@@ -10,7 +12,7 @@ class UserMenuHandler:
         ("😈 Humor", "Юмор, мемы, сарказм, лёгкость")
     ]
 
-    async def show_main_menu(self, update: Any, context: Any):
+    async def show_main_menu(self, event: Union[Message, CallbackQuery]):
         keyboard = [
             [InlineKeyboardButton(text="📱 Личный кабинет", callback_data="open_lk")],
             [InlineKeyboardButton(text="💎 Апгрейд подписки", callback_data="upgrade")],
@@ -22,37 +24,39 @@ class UserMenuHandler:
             "\n💎 <b>Апгрейд подписки</b> — откройте PRO или VIP-возможности."
         )
         markup = InlineKeyboardMarkup(inline_keyboard=keyboard)
-        if hasattr(update, "callback_query") and update.callback_query:
-            await update.callback_query.edit_message_text(text, reply_markup=markup, parse_mode="HTML")
-        else:
-            await update.message.reply_text(text, reply_markup=markup, parse_mode="HTML")
+        await respond(event, text, reply_markup=markup, parse_mode="HTML")
 
-    async def show_upgrade_menu(self, update: Any, context: Any):
-        from app.infrastructure.database.models.subscribe import SubscriptionPlanModel, PlanName
-        plans = await SubscriptionPlanModel.filter(is_active=True).all()
-        pro = next((p for p in plans if p.name == PlanName.PRO), None)
-        vip = next((p for p in plans if p.name == PlanName.VIP), None)
-        keyboard = [
-            [InlineKeyboardButton(text="⭐️ PRO", callback_data="upgrade_pro")],
-            [InlineKeyboardButton(text="👑 VIP", callback_data="upgrade_vip")],
-            [InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_main_menu")],
-        ]
-        text = (
-            "<b>Выберите подписку для апгрейда:</b>\n\n"
-            "⭐️ <b>PRO</b>\n"
-            f"<i>Цена: {pro.price_usd if pro else '-'}₽/мес</i>\n"
-            "• Доступ к расширенным функциям\n"
-            "• Больше лимитов\n\n"
-            "👑 <b>VIP</b>\n"
-            f"<i>Цена: {vip.price_usd if vip else '-'}₽/мес</i>\n"
-            "• Все возможности PRO\n"
-            "• Персональный приоритет\n"
-            "• Максимальные лимиты\n"
-        )
+    async def show_upgrade_menu(self, cq: CallbackQuery):
+        from app.infrastructure.services.plan_catalogue import plan_catalogue
+        # Снятые с продажи планы не предлагаем: ни цены, ни кнопки
+        pro = plan_catalogue.get_active_by_name("pro")
+        vip = plan_catalogue.get_active_by_name("vip")
+        keyboard = []
+        text = "<b>Выберите подписку для апгрейда:</b>\n\n"
+        if pro:
+            keyboard.append([InlineKeyboardButton(text="⭐️ PRO", callback_data="upgrade_pro")])
+            text += (
+                "⭐️ <b>PRO</b>\n"
+                f"<i>Цена: {pro.price_usd}₽/мес</i>\n"
+                "• Доступ к расширенным функциям\n"
+                "• Больше лимитов\n\n"
+            )
+        if vip:
+            keyboard.append([InlineKeyboardButton(text="👑 VIP", callback_data="upgrade_vip")])
+            text += (
+                "👑 <b>VIP</b>\n"
+                f"<i>Цена: {vip.price_usd}₽/мес</i>\n"
+                "• Все возможности PRO\n"
+                "• Персональный приоритет\n"
+                "• Максимальные лимиты\n"
+            )
+        if not keyboard:
+            text = "Сейчас нет подписок, доступных для покупки.\n"
+        keyboard.append([InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_main_menu")])
         markup = InlineKeyboardMarkup(inline_keyboard=keyboard)
-        await update.callback_query.edit_message_text(text, reply_markup=markup, parse_mode="HTML")
+        await respond(cq, text, reply_markup=markup, parse_mode="HTML")
 
-    async def show_modes_menu(self, update: Any, context: Any):
+    async def show_modes_menu(self, cq: CallbackQuery):
         keyboard = [[InlineKeyboardButton(text=f"{name} — {desc}", callback_data=f"set_mode:{i}")] for i, (name, desc) in enumerate(self.MODES)]
         keyboard.append([InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_main_menu")])
         text = (
@@ -61,28 +65,29 @@ class UserMenuHandler:
             "\n".join([f"{i+1}. <b>{name}</b> — {desc}" for i, (name, desc) in enumerate(self.MODES)])
         )
         markup = InlineKeyboardMarkup(inline_keyboard=keyboard)
-        await update.callback_query.edit_message_text(text, reply_markup=markup, parse_mode="HTML")
+        await respond(cq, text, reply_markup=markup, parse_mode="HTML")
 
-    async def set_mode(self, update: Any, context: Any, mode_index: int):
-        context.user_data["bot_mode"] = mode_index
+    async def set_mode(self, cq: CallbackQuery, user_data: dict, mode_index: int):
+        user_data["bot_mode"] = mode_index
         name, desc = self.MODES[mode_index]
         text = f"<b>🤖 Режим бота установлен:</b> {name} — {desc}"
-        await update.callback_query.edit_message_text(text, reply_markup=None, parse_mode="HTML")
-        await self.show_main_menu(update, context)
+        await respond(cq, text, reply_markup=None, parse_mode="HTML")
+        await self.show_main_menu(cq)
 
-    async def handle_callback(self, update: Any, context: Any, data: str):
+    async def handle_callback(self, cq: CallbackQuery, user_data: dict, data: str, bot: Bot):
         if data == "back_to_main_menu":
-            await self.show_main_menu(update, context)
+            await self.show_main_menu(cq)
         elif data == "upgrade":
-            await self.show_upgrade_menu(update, context)
+            await self.show_upgrade_menu(cq)
         elif data == "choose_mode":
-            await self.show_modes_menu(update, context)
+            await self.show_modes_menu(cq)
         elif data.startswith("set_mode:"):
             mode_index = int(data.split(":")[1])
-            await self.set_mode(update, context, mode_index)
+            await self.set_mode(cq, user_data, mode_index)
         elif data in ("upgrade_pro", "upgrade_vip"):
             # Здесь можно вызвать PaymentUseCase или другой flow оплаты
-            await update.callback_query.edit_message_text(
+            await respond(
+                cq,
                 f"<b>💳 Переход к оплате:</b> {data.replace('upgrade_', '').upper()}\n\nСледуйте дальнейшим инструкциям.",
                 parse_mode="HTML"
             )
@@ -94,4 +99,4 @@ class UserMenuHandler:
             user_repo = UserUseRepositories()
             sub_repo = SubscriptionUseRepositories()
             lk_use_case = LkUseCase(user_repo, sub_repo)
-            await lk_use_case.execute(update, context) 
+            await lk_use_case.execute(cq, bot) 
@@ -8,10 +8,13 @@ from app.application.use_cases.subscriptions import \
     activate_subscription_for_user
 from app.config import settings
 from app.infrastructure.database.models.payment import PaymentModel, PaymentStatus
+from app.infrastructure.metrics.registry import registry
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+PAYMENT_WEBHOOKS = registry.counter("payment_webhooks_total", "Вебхуки YooKassa по результату обработки", ["outcome"])
+
 
 @router.post("/yoomoney")
 async def yoomoney_webhook(request: Request):
@@ -25,6 +28,7 @@ async def yoomoney_webhook(request: Request):
             # Попробуем получить raw данные
             raw_data = await request.body()
             logger.error(f"Raw request body: {raw_data}")
+            PAYMENT_WEBHOOKS.inc(outcome="invalid")
             raise HTTPException(status_code=400, detail="Invalid JSON format")
         
         # Логируем все полученные данные для отладки
@@ -36,10 +40,12 @@ async def yoomoney_webhook(request: Request):
         # Проверяем структуру данных
         if not webhook_data:
             logger.warning("Empty webhook data received")
+            PAYMENT_WEBHOOKS.inc(outcome="empty")
             return {"status": "ok", "message": "Empty data acknowledged"}
             
         if not isinstance(webhook_data, dict):
             logger.error("Invalid webhook data format - expected JSON object")
+            PAYMENT_WEBHOOKS.inc(outcome="invalid")
             raise HTTPException(status_code=400, detail="Invalid data format")
         
         # Получаем данные платежа
@@ -66,40 +72,51 @@ async def yoomoney_webhook(request: Request):
                 logger.info(f"Our payment ID: {our_payment_id}, amount: {amount} {currency}")
                 
                 if our_payment_id:
-                    await process_successful_payment(our_payment_id, amount, payment_id, metadata)
+                    outcome = await process_successful_payment(our_payment_id, amount, payment_id, metadata)
+                    PAYMENT_WEBHOOKS.inc(outcome=outcome)
                     logger.info(f"Payment processed successfully: {our_payment_id}")
                     return {"status": "ok", "message": "Payment processed"}
                 else:
                     logger.warning(f"No label found in metadata for payment {payment_id}")
+                    PAYMENT_WEBHOOKS.inc(outcome="no_label")
                     return {"status": "ok", "message": "No label found"}
         
         elif event_type == 'payment.canceled':
             payment_id = payment_data.get('id')
             logger.info(f"Payment canceled: {payment_id}")
+            PAYMENT_WEBHOOKS.inc(outcome="canceled")
             return {"status": "ok", "message": "Payment canceled acknowledged"}
         
         else:
             logger.info(f"Unhandled event type: {event_type}")
-            return {"status": "ok", "message": "Event acknowledged"}
-        
+
+        PAYMENT_WEBHOOKS.inc(outcome="ignored")
+        return {"status": "ok", "message": "Event acknowledged"}
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing YooKassa webhook: {e}")
+        PAYMENT_WEBHOOKS.inc(outcome="error")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
-async def process_successful_payment(payment_id: str, amount: float, yookassa_payment_id: str, metadata: dict):
-    """Process successful payment and update subscription"""
+async def process_successful_payment(payment_id: str, amount: float, yookassa_payment_id: str, metadata: dict) -> str:
+    """Process successful payment and update subscription.
+
+    Returns the outcome: ``processed``, ``duplicate`` or ``not_found``.
+    """
     try:
         # Ищем платеж в базе данных
         payment = await PaymentModel.get_by_payment_id(payment_id)
         
         if not payment:
             logger.error(f"Payment not found: {payment_id}")
-            return
+            return "not_found"
         
         if payment.payment_status == PaymentStatus.SUCCEEDED:
             logger.info(f"Payment already processed: {payment_id}")
-            return
+            return "duplicate"
         
         # Обновляем статус платежа
         await payment.mark_as_paid({
@@ -122,6 +139,7 @@ async def process_successful_payment(payment_id: str, amount: float, yookassa_pa
         )
         
         logger.info(f"Subscription activated for user {payment.user_id}, plan {payment.plan_id}")
+        return "processed"
         
     except Exception as e:
         logger.error(f"Error processing successful payment: {e}")
@@ -3,26 +3,62 @@ import json
 import logging
 
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from tortoise.contrib.fastapi import register_tortoise
-from aiogram.types import BotCommand as AIOBotCommand, Update as AiogramUpdate
+from aiogram.types import Update as AiogramUpdate
 
 from app.infrastructure.database.setup_db import TORTOISE_ORM
+from app.infrastructure.database.routing import db_router
+from app.infrastructure.health import readiness, wait_for_postgres
+from app.infrastructure.logging.setup_logger import TraceIdFilter
+from app.infrastructure.metrics.registry import registry
+from app.infrastructure.tracing import tracer
 from app.config import settings
 from app.infrastructure.database.models.subscribe import SubscriptionPlanModel
 from app.interfaces.youmoney_webhooks import router as yoomoney_router
 from app.infrastructure.redis.redis_client import redis_client
+from app.infrastructure.services.plan_catalogue import plan_catalogue
+from app.infrastructure.services.message_archive import message_archiver
+from app.infrastructure.services.message_buffer import message_buffer
+from app.infrastructure.services.usage_ledger import usage_ledger
+from app.infrastructure.services.generations import generation_registry
+from app.infrastructure.services.task_runner import task_runner
 from app.interfaces.telegram.aiogram_app import create_bot_and_dispatcher
+from app.interfaces.telegram.services.bot_info import bot_info
+from app.interfaces.telegram.outbound import outbound_dispatcher
 
 
 # Настройка логирования
 logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
+    format="%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s", level=logging.INFO
 )
+for _handler in logging.getLogger().handlers:
+    _handler.addFilter(TraceIdFilter())
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
 app.include_router(yoomoney_router, prefix="/webhook", tags=["yoomoney"])
 
+
+
+@app.on_event("startup")
+async def wait_for_database():
+    """Дождаться Postgres до инициализации Tortoise (обработчик зарегистрирован раньше неё)"""
+    await wait_for_postgres(settings.db_connect_attempts)
+
+
+@app.on_event("shutdown")
+async def drain_background_writes():
+    """Дописать фоновые задачи и буферы в БД до закрытия соединений Tortoise (обработчик зарегистрирован раньше неё)"""
+    try:
+        await task_runner.stop()
+        await message_archiver.stop()
+        await message_buffer.stop()
+        await usage_ledger.stop()
+    except Exception as e:
+        logger.error(f"Ошибка при остановке фоновой записи: {e}")
+
+
 # Регистрация Tortoise ORM
 register_tortoise(
     app,
@@ -41,17 +77,15 @@ async def startup_event():
     try:
         # Подключение к Redis
         await redis_client.connect()
-        
+
+        # Чтения с реплики (если задана) и проверка её отставания
+        await db_router.start()
+
         # Устанавливаем webhook для aiogram
 
-        # Установка меню команд для aiogram
-        await aiogram_bot.set_my_commands(
-            [
-                AIOBotCommand(command="start", description="🚀 Начать/Перезапустить диалог"),
-                AIOBotCommand(command="upgrade", description="💎 Улучшить подписку"),
-                AIOBotCommand(command="lk", description="📱 Личный кабинет"),
-            ]
-        )
+        # Профиль бота (get_me) и меню команд — один раз при старте
+        await bot_info.start(aiogram_bot)
+        await bot_info.sync_commands(aiogram_bot)
 
         # Создание планов подписки
         await SubscriptionPlanModel.get_or_create(
@@ -75,25 +109,42 @@ async def startup_event():
             },
         )
 
+        # Каталог планов в памяти + подписка на инвалидацию
+        await plan_catalogue.start()
+
+        # Партиции messages на ближайшие месяцы и архивация холодных
+        await message_archiver.start()
+
+        # Отложенная запись сообщений (если включена) и дозапись хвоста после сбоя
+        await message_buffer.start()
+
+        # Сброс счётчиков расхода OpenAI из Redis в Postgres
+        await usage_ledger.start()
+
+        # Отмена генераций GPT из других процессов
+        await generation_registry.start()
+
+        # Фоновые задачи, отложенные use case'ами после ответа
+        await task_runner.start()
+
         # Гарантируем наличие главного админа
         from app.infrastructure.repositories.user_use_repositories import UserUseRepositories
         user_repo = UserUseRepositories()
         await user_repo.add_admin(426391848)
 
-        # Ждем, пока база данных будет готова
-        for _ in range(30):  # 30 попыток
+        # Устанавливаем webhook на FastAPI маршрут (Bot API иногда отвечает ошибкой — повторяем)
+        webhook_url = f"{settings.webhook_url}/bot/webhook"
+        for attempt in range(1, 6):
             try:
-                # Устанавливаем новый webhook на FastAPI маршрут
-                webhook_url = f"{settings.webhook_url}/bot/webhook"
                 logger.info(f"Setting aiogram webhook to: {webhook_url}")
                 await aiogram_bot.delete_webhook(drop_pending_updates=True)
                 await aiogram_bot.set_webhook(url=webhook_url)
                 break
             except Exception as e:
-                logger.warning(f"Waiting for database... {str(e)}")
-                await asyncio.sleep(1)
+                logger.warning(f"set_webhook не удался ({attempt}/5): {str(e)}")
+                await asyncio.sleep(attempt)
         else:
-            raise Exception("Could not connect to database")
+            raise Exception("Could not set Telegram webhook")
             
         logger.info("Приложение запущено успешно")
     except Exception as e:
@@ -105,7 +156,12 @@ async def startup_event():
 async def shutdown_event():
     """Очистка при остановке"""
     try:
+        await bot_info.stop()
+        await plan_catalogue.stop()
+        await generation_registry.stop()
+        await db_router.stop()
         await aiogram_bot.delete_webhook(drop_pending_updates=False)
+        await outbound_dispatcher.close()
         await redis_client.disconnect()
         logger.info("Приложение остановлено")
     except Exception as e:
@@ -114,17 +170,35 @@ async def shutdown_event():
 
 @app.post("/bot/webhook")
 async def webhook(request: Request) -> dict:
-    try:
-        # Aiogram webhook handler
-        body = await request.json()
-        logger.info(f"Received webhook data: {json.dumps(body)}")
-        update = AiogramUpdate.model_validate(body)
-        await aiogram_dp.feed_update(aiogram_bot, update)
-        return {"status": "ok"}
-    except Exception as e:
-        logger.exception(f"Error in webhook: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    # Корневой span трассы: один на апдейт Telegram
+    with tracer.start_trace("telegram.update") as span:
+        try:
+            # Aiogram webhook handler
+            body = await request.json()
+            logger.info(f"Received webhook data: {json.dumps(body)}")
+            update = AiogramUpdate.model_validate(body)
+            span.set_attribute("update_id", update.update_id)
+            span.set_attribute("update_type", update.event_type)
+            await aiogram_dp.feed_update(aiogram_bot, update)
+            return {"status": "ok"}
+        except Exception as e:
+            logger.exception(f"Error in webhook: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Готовность принимать трафик: Postgres и Redis проверяются отдельно"""
+    checks = await readiness()
+    ready = all(result == "ok" for result in checks.values())
+    return JSONResponse(status_code=200 if ready else 503, content={"status": "ready" if ready else "not_ready", **checks})
+
+
+@app.get("/metrics")
+async def metrics():
+    """Метрики процесса в текстовом формате Prometheus"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,4 @@
+#!/bin/bash
+# Разрешает физическую репликацию для пользователя БД (выполняется при первой инициализации db)
+set -e
+echo "host replication ${POSTGRES_USER} all scram-sha-256" >> "$PGDATA/pg_hba.conf"
@@ -0,0 +1,36 @@
+"""Общие фикстуры тестов: обязательные переменные окружения и ORM на SQLite в памяти."""
+
+import asyncio
+import os
+
+import pytest
+
+# Settings требует эти переменные при импорте app.config
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "42:TEST")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("WEBHOOK_URL", "http://localhost")
+os.environ.setdefault("YOOMONEY_SHOP_ID", "1")
+os.environ.setdefault("YOOMONEY_SECRET_KEY", "test")
+
+from tortoise import Tortoise  # noqa: E402
+
+from app.infrastructure.database.setup_db import TORTOISE_ORM  # noqa: E402
+
+
+@pytest.fixture
+def run_db():
+    """Выполнить корутину с чистой схемой БД: ``run_db(lambda: check())``."""
+
+    def run(test):
+        async def wrapper():
+            config = dict(TORTOISE_ORM, connections={"default": "sqlite://:memory:"})
+            await Tortoise.init(config=config)
+            await Tortoise.generate_schemas()
+            try:
+                return await test()
+            finally:
+                await Tortoise.close_connections()
+
+        return asyncio.run(wrapper())
+
+    return run
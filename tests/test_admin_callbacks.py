@@ -0,0 +1,52 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.domain.entities.models.user import User
+from app.interfaces.telegram.aiogram_app import on_callback
+
+
+class FakeCallback:
+    def __init__(self, data: str):
+        self.data = data
+        self.from_user = SimpleNamespace(id=7)
+        self.alerts = []
+
+    async def answer(self, text=None, show_alert=False, **kwargs):
+        self.alerts.append(text)
+
+
+class RecordingAdminPanel:
+    def __init__(self):
+        self.calls = []
+
+    async def handle_callback(self, cq, user_data, data):
+        self.calls.append(data)
+
+
+def _user(is_admin: bool) -> User:
+    now = datetime.now()
+    return User(7, "u", "U", "", "free", now, now, is_admin=is_admin)
+
+
+def _press(data: str, user):
+    cq, panel = FakeCallback(data), RecordingAdminPanel()
+    asyncio.run(on_callback(cq, bot=None, user_data={}, cases={}, admin_panel=panel, user_menu=None, user=user))
+    return cq, panel
+
+
+def test_forged_admin_callback_is_rejected_for_regular_user():
+    for data in ("admin_broadcast_start:1", "admin_broadcast_cancel:1", "admin_usage"):
+        cq, panel = _press(data, _user(is_admin=False))
+        assert panel.calls == []
+        assert cq.alerts and cq.alerts[0].startswith("Доступ запрещён")
+
+
+def test_admin_callback_is_rejected_for_unknown_user():
+    _, panel = _press("admin_broadcast_start:1", None)
+    assert panel.calls == []
+
+
+def test_admin_callback_reaches_panel_for_admin():
+    _, panel = _press("admin_usage", _user(is_admin=True))
+    assert panel.calls == ["admin_usage"]
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from app.application.use_cases.message_use_case import MessageUseCase
+from app.infrastructure.database.models.user import UserModel
+from app.infrastructure.repositories.user_use_repositories import UserUseRepositories
+
+
+class FakeMessage:
+    def __init__(self, chat_id: int, text: str):
+        self.chat = SimpleNamespace(id=chat_id)
+        self.from_user = SimpleNamespace(id=chat_id)
+        self.text = text
+        self.answers = []
+
+    async def answer(self, text, **kwargs):
+        self.answers.append(text)
+
+
+def _use_case(user_repo: UserUseRepositories) -> MessageUseCase:
+    return MessageUseCase(user_repo, message_repo=None, subscription_repo=None, gpt_repo=None)
+
+
+async def _message_after_ban(until: datetime) -> FakeMessage:
+    user_repo = UserUseRepositories()
+    await UserModel.create(telegram_id=1001, username="flooder", first_name="F", last_name="")
+    await user_repo.ban_until(1001, until)
+    user = await user_repo.get_user_by_telegram_id(1001)
+    message = FakeMessage(1001, "привет")
+    await _use_case(user_repo).execute(message, bot=None, user=user)
+    return message
+
+
+def test_temporary_ban_survives_reload(run_db):
+    message = run_db(lambda: _message_after_ban(datetime.now(timezone.utc) + timedelta(minutes=30)))
+    assert len(message.answers) == 1
+    assert message.answers[0].startswith("Вы временно забанены до")
+
+
+def test_expired_ban_does_not_block(run_db):
+    async def check():
+        user_repo = UserUseRepositories()
+        await UserModel.create(telegram_id=1002, username="calm", first_name="C", last_name="")
+        await user_repo.ban_until(1002, datetime.now(timezone.utc) - timedelta(minutes=1))
+        user = await user_repo.get_user_by_telegram_id(1002)
+        now = datetime.now(timezone.utc)
+        return user.is_banned or bool(user.banned_until and user.banned_until > now)
+
+    assert run_db(check) is False
@@ -0,0 +1,105 @@
+import asyncio
+
+from app.infrastructure.database.models.broadcast import (
+    BroadcastDeliveryModel,
+    BroadcastModel,
+    BroadcastSegment,
+    DeliveryStatus,
+)
+from app.infrastructure.database.models.user import UserModel
+from app.interfaces.telegram.services.broadcast import BroadcastService
+
+
+class SlowBot:
+    """Первые ``fast`` сообщений уходят сразу, остальные зависают до отмены."""
+
+    def __init__(self, fast: int):
+        self.fast = fast
+        self.sent = []
+
+    async def send_message(self, chat_id, text):
+        if len(self.sent) >= self.fast:
+            await asyncio.sleep(3600)
+        self.sent.append(chat_id)
+
+
+def test_cancel_mid_page_keeps_outcomes_of_sent_messages(run_db):
+    async def scenario():
+        for telegram_id in range(1, 6):
+            await UserModel.create(telegram_id=telegram_id, username=f"u{telegram_id}", first_name="U", last_name="")
+        service = BroadcastService(workers=5, page_size=10)
+        broadcast = await service.create("Новости", BroadcastSegment.ALL, created_by=1)
+        bot = SlowBot(fast=3)
+        await service.start(bot, broadcast.id)
+        while len(bot.sent) < 3:
+            await asyncio.sleep(0.01)
+        await service.cancel(broadcast.id)
+        deliveries = await BroadcastDeliveryModel.filter(broadcast_id=broadcast.id).values_list("telegram_id", flat=True)
+        return bot.sent, sorted(deliveries), await BroadcastModel.get(id=broadcast.id)
+
+    sent, deliveries, broadcast = run_db(scenario)
+    assert deliveries == sorted(sent)
+    assert broadcast.sent == 3
+    assert broadcast.total == 5
+
+
+def test_resume_skips_recipients_with_recorded_outcome(run_db):
+    async def scenario():
+        for telegram_id in range(1, 6):
+            await UserModel.create(telegram_id=telegram_id, username=f"u{telegram_id}", first_name="U", last_name="")
+        service = BroadcastService(workers=5, page_size=10)
+        broadcast = await service.create("Новости", BroadcastSegment.ALL, created_by=1)
+        # Прерванный запуск успел доставить двоим, чекпоинта страницы нет
+        await BroadcastDeliveryModel.bulk_create([
+            BroadcastDeliveryModel(broadcast_id=broadcast.id, telegram_id=i, status=DeliveryStatus.SENT) for i in (1, 2)
+        ])
+        await BroadcastModel.filter(id=broadcast.id).update(sent=2)
+        bot = SlowBot(fast=100)
+        await service.start(bot, broadcast.id)
+        await service._tasks[broadcast.id]
+        return bot.sent, await BroadcastModel.get(id=broadcast.id)
+
+    sent, broadcast = run_db(scenario)
+    assert sorted(sent) == [3, 4, 5]
+    assert broadcast.sent == 5
+
+
+def test_restart_without_counters_skips_recipients_with_recorded_outcome(run_db):
+    async def scenario():
+        for telegram_id in range(1, 6):
+            await UserModel.create(telegram_id=telegram_id, username=f"u{telegram_id}", first_name="U", last_name="")
+        service = BroadcastService(workers=5, page_size=10)
+        broadcast = await service.create("Новости", BroadcastSegment.ALL, created_by=1)
+        # Процесс упал после записи строк доставки, но до сохранения счётчиков
+        await BroadcastDeliveryModel.bulk_create([
+            BroadcastDeliveryModel(broadcast_id=broadcast.id, telegram_id=i, status=DeliveryStatus.SENT) for i in (1, 2)
+        ])
+        bot = SlowBot(fast=100)
+        await service.start(bot, broadcast.id)
+        await service._tasks[broadcast.id]
+        return bot.sent, await BroadcastModel.get(id=broadcast.id)
+
+    sent, broadcast = run_db(scenario)
+    assert sorted(sent) == [3, 4, 5]
+    assert broadcast.sent == 3
+
+
+def test_outcomes_already_recorded_are_not_counted_again(run_db):
+    async def scenario():
+        service = BroadcastService(workers=5, page_size=10)
+        broadcast = await service.create("Новости", BroadcastSegment.ALL, created_by=1)
+        progress = service.snapshot(broadcast)
+
+        def outcomes():
+            return [
+                BroadcastDeliveryModel(broadcast_id=broadcast.id, telegram_id=i, status=DeliveryStatus.SENT)
+                for i in (1, 2)
+            ]
+
+        await service._save_outcomes(broadcast, progress, outcomes())
+        await service._save_outcomes(broadcast, progress, outcomes())
+        return progress, await BroadcastModel.get(id=broadcast.id)
+
+    progress, broadcast = run_db(scenario)
+    assert progress.counts[DeliveryStatus.SENT] == 2
+    assert broadcast.sent == 2
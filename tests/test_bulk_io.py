@@ -0,0 +1,56 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.cli.bulk_io import build_upsert_sql, load_spec
+
+
+@pytest.fixture(scope="module")
+def users_spec():
+    return load_spec("users")
+
+
+def test_users_spec_reflects_model(users_spec):
+    assert users_spec.table == "users"
+    assert users_spec.pk == "telegram_id"
+    assert {"telegram_id", "username", "is_banned", "invited_by_id"} <= set(users_spec.columns)
+    assert users_spec.deferred == {"invited_by_id": ("users", "telegram_id")}
+
+
+def test_to_record_converts_values_and_fills_defaults(users_spec):
+    record = dict(zip(users_spec.columns, users_spec.to_record({
+        "telegram_id": "42",
+        "username": "anna",
+        "is_banned": "true",
+        "banned_until": "2025-01-02T03:04:05",
+    })))
+    assert record["telegram_id"] == 42
+    assert record["is_banned"] is True
+    assert record["is_admin"] is False
+    assert record["banned_until"] == datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    assert record["created_at"].tzinfo is not None
+    assert record["invited_by_id"] is None
+
+
+def test_to_record_requires_primary_key(users_spec):
+    with pytest.raises(ValueError):
+        users_spec.to_record({"username": "anna"})
+
+
+def test_upsert_sql_updates_all_but_conflict_columns(users_spec):
+    sql = build_upsert_sql(users_spec, "stage_users", ["telegram_id"])
+    assert sql.startswith('INSERT INTO "users" (')
+    assert 'ON CONFLICT ("telegram_id") DO UPDATE SET ' in sql
+    assert '"telegram_id" = EXCLUDED' not in sql
+    assert '"username" = EXCLUDED."username"' in sql
+    # Ссылка на ещё не загруженного пригласившего обнуляется до конца импорта
+    assert 'CASE WHEN EXISTS (SELECT 1 FROM "users" r WHERE r."telegram_id" = s."invited_by_id")' in sql
+    assert "FROM stage_users r" in sql
+
+
+def test_messages_upsert_uses_composite_conflict_key():
+    spec = load_spec("messages")
+    sql = build_upsert_sql(spec, "stage_messages", ["id", "created_at"])
+    assert 'ON CONFLICT ("id", "created_at")' in sql
+    assert '"created_at" = EXCLUDED' not in sql
+    assert '"content" = EXCLUDED."content"' in sql
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from app.infrastructure.redis.redis_client import redis_client
+from app.infrastructure.services.generations import GenerationCancelled, GenerationRegistry
+
+
+class SlowRedis:
+    """Публикация отмены занимает время, как сетевой вызов."""
+
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, channel, data):
+        await asyncio.sleep(0.01)
+        self.published.append(data)
+
+
+def test_simultaneous_messages_leave_one_generation(monkeypatch):
+    monkeypatch.setattr(redis_client, "redis", SlowRedis())
+    registry = GenerationRegistry()
+
+    async def generate(text):
+        await asyncio.sleep(0.05)
+        return text
+
+    async def scenario():
+        first = asyncio.create_task(registry.run(1, generate("first")))
+        second = asyncio.create_task(registry.run(1, generate("second")))
+        results = await asyncio.gather(first, second, return_exceptions=True)
+        return results, dict(registry._tasks)
+
+    (first, second), left = asyncio.run(scenario())
+    assert isinstance(first, GenerationCancelled)
+    assert second == "second"
+    assert left == {}
+    assert len(redis_client.redis.published) == 2
+
+
+def test_stop_cancels_running_generation():
+    registry = GenerationRegistry()
+
+    async def scenario():
+        run = asyncio.create_task(registry.run(1, asyncio.sleep(1, "answer")))
+        await asyncio.sleep(0)
+        await registry.cancel(1)
+        return await run
+
+    with pytest.raises(GenerationCancelled):
+        asyncio.run(scenario())
@@ -0,0 +1,24 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+from app.infrastructure.repositories.message_use_repo import decode_history_cursor, encode_history_cursor
+
+
+def test_cursor_round_trip_is_exact_to_the_microsecond():
+    rng = random.Random(35)
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    for _ in range(10000):
+        created_at = start + timedelta(microseconds=rng.randrange(10**15))
+        message_id = rng.randrange(1, 10**12)
+        assert decode_history_cursor(encode_history_cursor(created_at, message_id)) == (created_at, message_id)
+
+
+def test_naive_datetime_is_treated_as_utc():
+    naive = datetime(2025, 6, 1, 12, 30, 45, 123457)
+    created_at, _ = decode_history_cursor(encode_history_cursor(naive, 1))
+    assert created_at == naive.replace(tzinfo=timezone.utc)
+
+
+def test_cursor_is_compact_for_callback_data():
+    cursor = encode_history_cursor(datetime(2030, 1, 1, tzinfo=timezone.utc), 10**12)
+    assert len(cursor) <= 20
@@ -0,0 +1,53 @@
+from app.domain.services.message_classifier import (
+    HARD_KEYWORDS,
+    REASON_CAPS,
+    REASON_EXCLAMATIONS,
+    REASON_HARD_KEYWORD,
+    REASON_SELF_BLAME,
+    REASON_SHORT_TEXT,
+    SELF_BLAME_KEYWORDS,
+    MessageClassifier,
+    build_mode_logic_prompt,
+    message_classifier,
+)
+
+LONG_NEUTRAL = "Расскажи, пожалуйста, как лучше планировать свой рабочий день"
+
+
+def test_neutral_long_text_is_soft_and_long():
+    result = message_classifier.classify(LONG_NEUTRAL)
+    assert (result.mode, result.reply_type) == ("soft", "long")
+    assert result.matched_keywords == [] and result.reasons == []
+
+
+def test_hard_keyword_switches_mode():
+    result = message_classifier.classify("Муж постоянно КРИЧИТ на меня, когда приходит домой с работы")
+    assert result.mode == "hard"
+    assert result.matched_keywords == ["кричит"]
+    assert result.reasons == [REASON_HARD_KEYWORD]
+
+
+def test_longest_phrase_wins_and_reasons_are_unique():
+    text = "Я сама виновата, он сказал что без него я никто, и он сказал что без него я никто снова"
+    result = message_classifier.classify(text)
+    assert result.matched_keywords == ["я сама виновата", "он сказал что без него я никто"]
+    assert result.reasons == [REASON_SELF_BLAME, REASON_HARD_KEYWORD]
+
+
+def test_brief_signals():
+    assert REASON_SHORT_TEXT in message_classifier.classify("Привет").reasons
+    assert REASON_EXCLAMATIONS in message_classifier.classify(LONG_NEUTRAL + "!!!").reasons
+    caps = message_classifier.classify(LONG_NEUTRAL.upper())
+    assert REASON_CAPS in caps.reasons and caps.reply_type == "brief"
+
+
+def test_empty_text():
+    result = message_classifier.classify(None)
+    assert (result.mode, result.reply_type) == ("soft", "brief")
+
+
+def test_custom_groups_and_prompt_share_keywords():
+    classifier = MessageClassifier({"custom": ("тест",)})
+    assert classifier.classify("Это длинный тест классификатора").reasons == ["custom"]
+    prompt = build_mode_logic_prompt()
+    assert all(f"'{kw}'" in prompt for kw in HARD_KEYWORDS + SELF_BLAME_KEYWORDS)
@@ -0,0 +1,64 @@
+from app.interfaces.telegram.services.message_splitter import (
+    TELEGRAM_MESSAGE_LIMIT,
+    StreamSplitter,
+    split_message,
+    split_once,
+)
+
+
+def test_short_text_is_not_split():
+    assert split_message("Привет") == ["Привет"]
+    assert split_once("Привет") == ("Привет", "")
+
+
+def test_chunks_fit_the_limit_and_keep_the_text():
+    paragraphs = [f"Абзац {i}. " + "слово " * 120 for i in range(40)]
+    text = "\n\n".join(paragraphs)
+    chunks = split_message(text)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= TELEGRAM_MESSAGE_LIMIT for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_prefers_paragraph_break():
+    text = "а" * 60 + "\n\n" + "б" * 30
+    head, tail = split_once(text, limit=80)
+    assert head == "а" * 60
+    assert tail == "б" * 30
+
+
+def test_falls_back_to_sentence_then_word_then_hard_cut():
+    head, _ = split_once("Первое предложение. Второе предложение тут", limit=30)
+    assert head == "Первое предложение."
+    head, _ = split_once("слово " * 10, limit=20)
+    assert head == "слово слово слово"
+    head, tail = split_once("я" * 50, limit=20)
+    assert (head, tail) == ("я" * 20, "я" * 30)
+
+
+def test_open_tags_are_closed_and_reopened():
+    text = "<b>" + "жирный текст " * 10 + "</b>"
+    chunks = split_message(text, limit=50)
+    assert all(len(chunk) <= 50 for chunk in chunks)
+    for chunk in chunks:
+        assert chunk.count("<b>") == chunk.count("</b>")
+
+
+def test_cut_never_lands_inside_tag_or_entity():
+    text = "x" * 18 + '<a href="https://example.com">ссылка</a>' + " хвост" * 5
+    for chunk in split_message(text, limit=40):
+        assert chunk.count("<") == chunk.count(">")
+    head, _ = split_once("y" * 17 + "&amp; дальше", limit=20)
+    assert not head.endswith("&") and "&am" not in head
+
+
+def test_stream_splitter_matches_split_message():
+    text = "\n\n".join(f"Абзац {i}. " + "слово " * 50 for i in range(10))
+    splitter = StreamSplitter(limit=500)
+    chunks = []
+    for start in range(0, len(text), 37):
+        chunks.extend(splitter.feed(text[start:start + 37]))
+    chunks.extend(splitter.flush())
+    assert all(len(chunk) <= 500 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+    assert splitter.flush() == []
@@ -0,0 +1,17 @@
+from app.infrastructure.database.models.subscribe import PlanName, SubscriptionPlanModel
+from app.infrastructure.services.plan_catalogue import PlanCatalogue
+
+
+def test_inactive_plan_is_not_offered(run_db):
+    async def load():
+        await SubscriptionPlanModel.create(id=1, name=PlanName.PRO, price_usd=10, duration_days=30)
+        await SubscriptionPlanModel.create(id=2, name=PlanName.VIP, price_usd=50, duration_days=30, is_active=False)
+        catalogue = PlanCatalogue()
+        await catalogue.load()
+        return catalogue
+
+    catalogue = run_db(load)
+    assert catalogue.get_active_by_name("pro").id == 1
+    assert catalogue.get_active_by_name("vip") is None
+    # Для уже оформленных подписок план по-прежнему находится
+    assert catalogue.get_by_name("vip").id == 2
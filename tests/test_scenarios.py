@@ -0,0 +1,28 @@
+import asyncio
+import json
+
+import pytest
+
+from app.infrastructure.scenarios.replay import REPLAYS_PATH, InMemoryStateStore, replay
+from app.infrastructure.scenarios.scenario_engine import ScenarioEngine, ScenarioValidationError, _parse_scenarios
+
+
+def test_recorded_dialogues_replay_without_mismatches():
+    with open(REPLAYS_PATH, "r", encoding="utf-8") as f:
+        conversations = json.load(f)
+    engine = ScenarioEngine(state_store=InMemoryStateStore())
+    assert asyncio.run(replay(engine, conversations)) == []
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        [{"name": "без id", "steps": [{"step": 1, "text": "x"}]}],
+        [{"id": 1, "steps": [{"step": 1}]}, {"id": 1, "steps": [{"step": 1}]}],
+        [{"id": 2, "steps": []}],
+        [{"id": 3, "steps": [{"step": 1}], "transitions": [{"from": 1, "to": 5}]}],
+    ],
+)
+def test_invalid_scenarios_are_rejected(raw):
+    with pytest.raises(ScenarioValidationError):
+        _parse_scenarios(raw)
@@ -0,0 +1,6 @@
+from app.main import app
+
+
+def test_background_writes_drain_before_orm_closes():
+    handlers = [handler.__name__ for handler in app.router.on_shutdown]
+    assert handlers.index("drain_background_writes") < handlers.index("close_orm")
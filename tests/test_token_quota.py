@@ -0,0 +1,58 @@
+import asyncio
+
+from app.infrastructure.redis.redis_client import redis_client
+from app.infrastructure.redis.token_quota import (
+    QuotaStatus,
+    QuotaWindow,
+    TokenQuota,
+    format_quota,
+    format_wait,
+    parse_windows,
+)
+
+
+def test_parse_windows_sorts_and_skips_blanks():
+    assert parse_windows("86400:30000, 3600:8000,") == [(3600, 8000), (86400, 30000)]
+    assert parse_windows("") == []
+
+
+def test_window_remaining_and_title():
+    assert QuotaWindow(3600, 1000, used=400).remaining == 600
+    assert QuotaWindow(3600, 1000, used=1500).remaining == 0
+    assert [QuotaWindow(s, 1).title for s in (3600, 7200, 86400, 172800, 900)] == [
+        "час", "2 ч", "сутки", "2 сут.", "15 мин",
+    ]
+
+
+def test_status_is_blocked_until_every_exhausted_window_frees_up():
+    status = QuotaStatus([
+        QuotaWindow(3600, 1000, used=1000, retry_after=120.0),
+        QuotaWindow(86400, 5000, used=5200, retry_after=3000.0),
+    ])
+    assert not status.allowed
+    assert status.retry_after == 3000.0
+    partial = QuotaStatus([QuotaWindow(3600, 1000, used=999, retry_after=0.0)])
+    assert partial.allowed and partial.retry_after == 0.0
+
+
+def test_unlimited_plan_and_unknown_plan():
+    quota = TokenQuota()
+    quota._windows["vip"] = []
+    assert asyncio.run(quota.check(1, "vip")).windows == []
+    assert quota.windows_for("unknown") == quota.windows_for("free")
+    assert quota.windows_for(None) == quota.windows_for("free")
+
+
+def test_quota_is_not_enforced_without_redis():
+    assert redis_client.redis is None
+    assert asyncio.run(TokenQuota().check(1, "free")) is None
+
+
+def test_format_wait_and_quota():
+    assert format_wait(1) == "1 мин"
+    assert format_wait(61) == "2 мин"
+    assert format_wait(3 * 3600 + 5 * 60) == "3 ч 5 мин"
+    assert format_quota(None) == ""
+    assert "без ограничений" in format_quota(QuotaStatus())
+    text = format_quota(QuotaStatus([QuotaWindow(3600, 1000, used=1000, retry_after=90.0)]))
+    assert "осталось 0 из 1000" in text and "обновится через 2 мин" in text
@@ -0,0 +1,33 @@
+from app.infrastructure.database.models.user import UserModel
+from app.infrastructure.repositories.user_use_repositories import UserUseRepositories
+
+
+def test_exact_username_is_not_pushed_out_by_prefix_matches(run_db):
+    async def search():
+        for i in range(12):
+            await UserModel.create(telegram_id=i + 1, username=f"anna_{i:02d}", first_name="A", last_name="")
+        await UserModel.create(telegram_id=100, username="Anna", first_name="A", last_name="")
+        return [u.username for u in await UserUseRepositories().search_user_models("@anna", limit=10)]
+
+    usernames = run_db(search)
+    assert usernames[0] == "Anna"
+    assert usernames[1:] == [f"anna_{i:02d}" for i in range(9)]
+
+
+def test_search_by_telegram_id(run_db):
+    async def search():
+        await UserModel.create(telegram_id=555, username="someone", first_name="S", last_name="")
+        return await UserUseRepositories().search_user_models("555")
+
+    assert [u.telegram_id for u in run_db(search)] == [555]
+
+
+def test_username_lookup_ignores_case_and_prefers_exact(run_db):
+    async def lookup():
+        await UserModel.create(telegram_id=1, username="Anna", first_name="A", last_name="")
+        await UserModel.create(telegram_id=2, username="ANNA", first_name="A", last_name="")
+        repo = UserUseRepositories()
+        found = [await repo.get_user_model_by_username(name) for name in ("@anna", "ANNA", "Anna", "bob")]
+        return [u.telegram_id if u else None for u in found]
+
+    assert run_db(lookup) == [1, 2, 1, None]